@@ -1,94 +1,164 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import RedirectResponse
 import os
 import shutil
+import logging
 from typing import List, Dict
-from .models.database import engine, Base, SessionLocal
-from .routers import resources, auth
+# 先配置日志，之后导入的模块输出的日志都经过日志队列
+from .utils.logging_config import setup_logging, RequestContextMiddleware
+setup_logging()
+from .models.database import engine, read_engine, Base, SessionLocal, BACKEND_DIR, READ_DATABASE_URL
+from .routers import resources, auth, uploads, admin, events
 from .models.models import Resource, ResourceStatus
-import glob
+from .utils.upload_utils import UploadSizeLimitMiddleware, MAX_IMAGE_SIZE, MAX_BATCH_FILES, MAX_CHUNK_SIZE, MULTIPART_OVERHEAD, UPLOAD_SESSION_CLEANUP_SECONDS
+from .utils.link_checker import link_check_loop
+from .utils.hot_ranking import hot_ranking_loop
+from .utils.like_filter import import_legacy_like_filter
+from .utils.serialization import CompressionMiddleware, COMPRESS_MIN_SIZE
+from .utils.process_lock import file_lock, LeaderLock
+from .utils.storage import storage
+from .utils.upload_gc import iter_asset_files
+from .utils.job_queue import job_workers, periodic_job_loop
+from .utils.job_handlers import JOB_UPLOAD_SESSION_CLEANUP, JOB_SEARCH_SNAPSHOT_RECONCILE, JOB_STATS_RECONCILE, JOB_PROMOTION_SWEEP, PROMOTION_SWEEP_SECONDS, JOB_EVENT_PRUNE
+from .utils.event_bus import EVENT_PRUNE_SECONDS
+from .utils.search_snapshot import SNAPSHOT_RECONCILE_SECONDS
+from .utils.profiling import ProfilingMiddleware
+from .utils.read_routing import ReadYourWritesMiddleware
+from .utils.admin_stats import ensure_stat_counters, STATS_RECONCILE_SECONDS
+from .utils.resource_types import ensure_resource_types
 import json
 
-# 仅创建不存在的表，保留已有数据
-# (原来的 Base.metadata.drop_all(bind=engine) 行被移除)
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-# 创建初始管理员账号
-db = SessionLocal()
-try:
-    auth.create_initial_admin(db)
+# 启动时的一次性工作：建表、创建初始管理员、检查图片路径。
+# 多个进程同时启动时通过文件锁依次执行，避免并发建表和写入冲突；
+# 生产环境由 serve.py 预加载应用，只在主进程中执行一次
+STARTUP_LOCK_PATH = os.path.join(BACKEND_DIR, "startup.lock")
+# 定期后台任务只在持有该锁的一个工作进程中运行；该进程退出后，其他进程每隔这么多秒尝试接手
+BACKGROUND_LOCK_PATH = os.path.join(BACKEND_DIR, "background.lock")
+BACKGROUND_LOCK_RETRY_SECONDS = 30
+
+def run_startup_tasks():
+    with file_lock(STARTUP_LOCK_PATH):
+        # 仅创建不存在的表，保留已有数据
+        # (原来的 Base.metadata.drop_all(bind=engine) 行被移除)
+        Base.metadata.create_all(bind=engine)
+
+        # 创建初始管理员账号
+        db = SessionLocal()
+        try:
+            auth.create_initial_admin(db)
+            # 统计表为空时（新数据库或刚执行迁移）全量统计一次
+            ensure_stat_counters(db)
+            # 类型关联表为空时（未经迁移、由 create_all 建表的数据库）从已审批资源补建
+            ensure_resource_types(db)
+            # 旧版本保存在文件中的喜欢去重记录导入数据库
+            import_legacy_like_filter(db)
     
-    # 检查并恢复图片路径
-    def check_and_restore_image_paths():
-        print("检查图片路径数据...")
-        resources_with_images = db.query(Resource).all()
+            # 检查并恢复图片路径
+            def check_and_restore_image_paths():
+                logger.info("检查图片路径数据...")
+                resources_with_images = db.query(Resource).all()
         
-        # 收集所有可能的图片路径
-        assets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets")
-        upload_patterns = os.path.join(assets_dir, "uploads", "*", "*.*")
-        approved_patterns = os.path.join(assets_dir, "imgs", "*", "*.*")
-        
-        all_images = {}
-        for image_path in glob.glob(upload_patterns):
-            relative_path = "/assets" + image_path.split("assets")[1]
-            filename = os.path.basename(image_path)
-            all_images[filename] = relative_path
-            
-        for image_path in glob.glob(approved_patterns):
-            relative_path = "/assets" + image_path.split("assets")[1]
-            filename = os.path.basename(image_path)
-            all_images[filename] = relative_path
+                # 收集所有可能的图片路径（uploads 下的图片会被 imgs 下的同名图片覆盖）
+                all_images = {}
+                for image_path, _, _, _ in iter_asset_files():
+                    filename = os.path.basename(image_path)
+                    all_images[filename] = image_path
             
-        print(f"找到 {len(all_images)} 个图片文件")
+                logger.info("找到 %d 个图片文件", len(all_images))
         
-        # 检查每个资源的图片
-        updated_count = 0
-        for resource in resources_with_images:
-            updated = False
+                # 检查每个资源的图片
+                updated_count = 0
+                for resource in resources_with_images:
+                    updated = False
             
-            # 检查并恢复图片列表
-            if resource.images:
-                new_images = []
-                for img_path in resource.images:
-                    if not img_path.startswith("/assets"):
-                        continue
+                    # 检查并恢复图片列表
+                    if resource.images:
+                        new_images = []
+                        for img_path in resource.images:
+                            if not img_path.startswith("/assets"):
+                                continue
                     
-                    filename = os.path.basename(img_path)
-                    if filename in all_images:
-                        new_path = all_images[filename]
-                        new_images.append(new_path)
-                        updated = True
-                    else:
-                        new_images.append(img_path)  # 保持原路径
+                            filename = os.path.basename(img_path)
+                            if filename in all_images:
+                                new_path = all_images[filename]
+                                new_images.append(new_path)
+                                updated = True
+                            else:
+                                new_images.append(img_path)  # 保持原路径
                 
-                if updated:
-                    resource.images = new_images
+                        if updated:
+                            resource.images = new_images
             
-            # 检查并恢复海报图片
-            if resource.poster_image:
-                poster_filename = os.path.basename(resource.poster_image)
-                if poster_filename in all_images:
-                    resource.poster_image = all_images[poster_filename]
-                    updated = True
+                    # 检查并恢复海报图片
+                    if resource.poster_image:
+                        poster_filename = os.path.basename(resource.poster_image)
+                        if poster_filename in all_images:
+                            resource.poster_image = all_images[poster_filename]
+                            updated = True
             
-            if updated:
-                updated_count += 1
+                    if updated:
+                        updated_count += 1
         
-        if updated_count > 0:
-            db.commit()
-            print(f"已恢复 {updated_count} 个资源的图片路径")
-        else:
-            print("无需恢复图片路径")
+                if updated_count > 0:
+                    db.commit()
+                    logger.info("已恢复 %d 个资源的图片路径", updated_count)
+                else:
+                    logger.info("无需恢复图片路径")
     
-    # 启动时执行检查
-    check_and_restore_image_paths()
+            # 启动时执行检查
+            check_and_restore_image_paths()
     
-finally:
-    db.close()
+        finally:
+            db.close()
+    # 预加载时主进程的数据库连接不能被fork出的工作进程共用
+    engine.dispose()
+    read_engine.dispose()
+
+run_startup_tasks()
+
+background_lock = LeaderLock(BACKGROUND_LOCK_PATH)
+
+async def run_background_loops():
+    # 多个工作进程时只有一个进程运行，避免重复请求外部链接和重复计算
+    while not background_lock.try_acquire():
+        await asyncio.sleep(BACKGROUND_LOCK_RETRY_SECONDS)
+    logger.info("本进程负责运行定期后台任务")
+    await asyncio.gather(
+        # 后台逐批检测资源链接是否失效
+        link_check_loop(),
+        # 定期增量更新资源热度
+        hot_ranking_loop(),
+        # 定期全量校正管理后台统计
+        periodic_job_loop(JOB_STATS_RECONCILE, STATS_RECONCILE_SECONDS),
+        # 定期清理过期的断点续传会话和残留的分片文件
+        periodic_job_loop(JOB_UPLOAD_SESSION_CLEANUP, UPLOAD_SESSION_CLEANUP_SECONDS),
+        # 定期比较搜索快照与资源表，公开的快照接口只读不写
+        periodic_job_loop(JOB_SEARCH_SNAPSHOT_RECONCILE, SNAPSHOT_RECONCILE_SECONDS),
+        # 定期为图片仍在 uploads 目录中的已审批资源（早期数据或复制失败）入队复制任务，读接口不再写入
+        periodic_job_loop(JOB_PROMOTION_SWEEP, PROMOTION_SWEEP_SECONDS),
+        # 定期删除已推送过的旧事件
+        periodic_job_loop(JOB_EVENT_PRUNE, EVENT_PRUNE_SECONDS),
+    )
+
+# 应用生命周期：启动后台任务，关闭时取消
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_task = asyncio.create_task(run_background_loops())
+    # 执行队列中的图片复制、清理、重建索引等任务，上次未完成的任务会继续执行（各工作进程都执行，任务按行认领）
+    job_workers.start()
+    yield
+    job_workers.stop()
+    background_task.cancel()
+    background_lock.release()
 
 # 创建FastAPI应用
-app = FastAPI(title="资源共建平台API")
+app = FastAPI(title="资源共建平台API", lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -99,13 +169,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 限制上传请求体大小，超出时在读取过程中直接中止
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/api/resources/upload-images/": MAX_IMAGE_SIZE + MULTIPART_OVERHEAD,
+        "/api/resources/upload-images/batch": MAX_BATCH_FILES * (MAX_IMAGE_SIZE + MULTIPART_OVERHEAD),
+        "/api/uploads/": MAX_CHUNK_SIZE,
+    },
+)
+
+# 按客户端的 Accept-Encoding 压缩较大的响应（brotli 优先，未安装时使用 gzip）
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
+# 使用只读副本时，客户端写入后短时间内的读请求改用主库
+if READ_DATABASE_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# 管理员可对单个请求进行采样性能分析（请求头 X-Profile: 1），也可按比例滚动采样，结果通过管理接口查看
+app.add_middleware(ProfilingMiddleware)
+
+# 为每个请求分配请求ID（响应头 X-Request-ID），请求处理中输出的日志都带有该ID
+# 最后添加的中间件最先执行，请求ID覆盖其他中间件中的日志
+app.add_middleware(RequestContextMiddleware)
+
 # 挂载静态文件目录
-assets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets")
-app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
+# 使用对象存储时图片不经过应用，重定向到存储的公开地址或预签名URL
+if storage.is_local:
+    app.mount("/assets", StaticFiles(directory=storage.root), name="assets")
+else:
+    @app.get("/assets/{key:path}", include_in_schema=False)
+    def redirect_asset(key: str):
+        return RedirectResponse(storage.url(key), status_code=307)
 
 # 包含路由
 app.include_router(resources.router)
 app.include_router(auth.router)
+app.include_router(uploads.router)
+app.include_router(admin.router)
+app.include_router(events.router)
 
 @app.get("/")
 def read_root():
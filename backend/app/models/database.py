@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
 import os
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
 
 # 获取backend目录路径
 # 当前文件位于 backend/app/models/database.py
@@ -11,20 +16,66 @@ BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__
 DB_PATH = os.path.join(BACKEND_DIR, "resource_hub.db")
 # 创建SQLite数据库引擎，使用绝对路径
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
-print(f"使用数据库: {DB_PATH}")
+# 只读请求使用的数据库，从环境变量 READ_DATABASE_URL 读取。未设置时使用同一SQLite文件的只读连接（WAL模式下读写互不阻塞）；
+# 也可以设为只读副本的地址，如 READ_DATABASE_URL=postgresql://reader@replica-host/resource_hub
+READ_DATABASE_URL = os.environ.get("READ_DATABASE_URL") or None
+# 配置了只读副本时，客户端写入后这段时间（秒）内的读请求仍使用主库，避免因复制延迟读不到刚写入的数据
+READ_YOUR_WRITES_SECONDS = 5
+READ_YOUR_WRITES_COOKIE = "rh_primary"
+logger.info("使用数据库: %s", DB_PATH)
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+@event.listens_for(engine, "connect")
+def _enable_wal(dbapi_connection, connection_record):
+    # WAL 模式下读连接不会被写事务阻塞，也不会阻塞写入
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL, pool_pre_ping=True)
+else:
+    # 以只读方式打开同一个文件，误写入时直接报错
+    read_engine = create_engine(
+        f"sqlite:///{Path(DB_PATH).as_uri()}?mode=ro&uri=true", connect_args={"check_same_thread": False}
+    )
+
 # 创建SessionLocal类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 只读会话，用于公开的查询接口
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # 创建Base类
 Base = declarative_base()
 
-# 依赖项，用于获取数据库会话
+def dialect_insert(db, model):
+    """
+    INSERT for the session's database with on_conflict_do_nothing and
+    on_conflict_do_update, which both SQLite and PostgreSQL support.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+# 依赖项，用于获取数据库会话（主库，读写）
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# 依赖项，用于只读请求：使用只读连接或只读副本
+# 配置了只读副本且客户端刚写入过数据（带有 READ_YOUR_WRITES_COOKIE）时使用主库
+def get_read_db(request: Request):
+    if READ_DATABASE_URL and request.cookies.get(READ_YOUR_WRITES_COOKIE):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocal()
     try:
         yield db
     finally:
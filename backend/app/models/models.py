@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, JSON, Enum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Boolean, JSON, Enum, ForeignKey, Index, Float, LargeBinary, text
+from sqlalchemy.sql import func, false
 from .database import Base
 import enum
 
@@ -20,12 +20,11 @@ class Resource(Base):
     resource_type = Column(String)  # 资源类型，存储多选值，以逗号分隔
     status = Column(Enum(ResourceStatus), default=ResourceStatus.PENDING)  # 审批状态
     hidden_from_admin = Column(Boolean, default=False)  # 是否从管理界面隐藏
-    links = Column(JSON, nullable=True)  # 存储各类网盘链接，JSON格式
+    links = Column(JSON, nullable=True)  # 旧版链接存储（JSON），已迁移到 resource_links 表，不再写入
     original_resource_id = Column(Integer, nullable=True)  # 补充资源关联的原始资源ID
     supplement = Column(JSON, nullable=True)  # 存储补充内容，包括待审批的图片和链接
-    approval_history = Column(JSON, nullable=True)  # 存储补充内容的审批历史记录
-    is_supplement_approval = Column(Boolean, default=False)  # 标记是否为补充资源审批记录
     likes_count = Column(Integer, default=0, nullable=False)  # 资源被喜欢的次数
+    hot_score = Column(Float, default=0, server_default="0", nullable=False, index=True)  # 按时间衰减的喜欢热度（相对 ranking_state 基准时间的值，只用于比较排序），由后台任务定期更新
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -36,4 +35,165 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=func.now()) 
\ No newline at end of file
+    created_at = Column(DateTime, default=func.now())
+
+class ImageAsset(Base):
+    __tablename__ = "image_assets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_hash = Column(String(64), index=True)  # 文件内容的SHA-256哈希
+    path = Column(String, unique=True, index=True)  # 图片访问路径，如 /assets/uploads/20230101/xxx.jpg
+    mime_type = Column(String)  # 由文件魔数识别出的MIME类型
+    file_size = Column(Integer)  # 文件字节数
+    width = Column(Integer, nullable=True)  # 从文件头读取的图片宽度
+    height = Column(Integer, nullable=True)  # 从文件头读取的图片高度
+    phash = Column(String(16), nullable=True, index=True)  # 64位感知哈希(dHash)的十六进制表示，用于查找近似重复图片
+    blurhash = Column(String(64), nullable=True)  # 列表加载原图前显示的模糊占位图（BlurHash），无法解码的图片为空字符串
+    dominant_color = Column(String(7), nullable=True)  # 图片主色，如 #a1b2c3，解码占位图前作为背景色
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # 最近修改时间，内存中的感知哈希索引按此增量更新
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)  # 会话ID（随机生成，同时作为上传凭据）
+    filename = Column(String, nullable=True)  # 客户端原始文件名，仅作记录
+    total_size = Column(Integer, nullable=False)  # 文件总字节数
+    file_hash = Column(String(64), nullable=False)  # 客户端声明的SHA-256哈希，完成时校验
+    received_size = Column(Integer, default=0, nullable=False)  # 已接收的字节数，即下一个分片的偏移量
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    expires_at = Column(DateTime, index=True)  # 过期时间，每次接收分片后顺延
+
+class ResourceTypeTag(Base):
+    __tablename__ = "resource_types"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)  # 类型名称，如“科幻”
+    approved_count = Column(Integer, default=0, nullable=False)  # 该类型下已审批资源的数量，随审批、更新、删除增量维护
+
+class ResourceTypeLink(Base):
+    __tablename__ = "resource_type_links"
+
+    # 只为已审批的公开资源建立关联，用于按类型筛选和统计
+    resource_id = Column(Integer, ForeignKey("resources.id", ondelete="CASCADE"), primary_key=True)
+    type_id = Column(Integer, ForeignKey("resource_types.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class ResourceLink(Base):
+    __tablename__ = "resource_links"
+    __table_args__ = (
+        Index("ix_resource_links_resource_category", "resource_id", "category"),
+        # 已审批资源的链接地址唯一，由数据库保证；待审批的提交可以重复
+        Index("ux_resource_links_url_approved", "url", unique=True,
+              sqlite_where=text("approved = 1"), postgresql_where=text("approved")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    resource_id = Column(Integer, ForeignKey("resources.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String, nullable=False, index=True)  # 链接类别，如 magnet、baidu、quark
+    url = Column(String, nullable=False, index=True)  # 链接地址，在已审批资源之间唯一；待审批的提交可以重复，审批通过时去掉已被占用的链接
+    approved = Column(Boolean, default=False, server_default=false(), nullable=False)  # 所属资源是否已审批，与资源状态同步，用于唯一索引
+    password = Column(String, default="")  # 提取码
+    note = Column(String, default="")  # 备注
+    status = Column(String, default="unknown", server_default="unknown", nullable=False, index=True)  # 链接检测结果：unknown、ok、dead、error
+    status_code = Column(Integer, nullable=True)  # 最近一次检测的HTTP状态码
+    last_checked_at = Column(DateTime, nullable=True, index=True)  # 最近一次检测时间，后台按此字段由旧到新逐批检测
+    check_failures = Column(Integer, default=0, server_default="0", nullable=False)  # 连续检测失败（dead/error）的次数
+    created_at = Column(DateTime, default=func.now())
+
+class ApprovalEvent(Base):
+    __tablename__ = "approval_events"
+    __table_args__ = (
+        Index("ix_approval_events_resource_created", "resource_id", "created_at"),
+    )
+
+    # 只追加不修改的审批记录表，每次初始审批或补充内容审批追加一条
+    id = Column(Integer, primary_key=True, index=True)
+    resource_id = Column(Integer, nullable=False)  # 被审批的资源ID，资源删除后记录仍保留
+    event_type = Column(String, nullable=False, default="initial")  # 审批类型：initial（初始审批）或 supplement（补充内容审批）
+    status = Column(Enum(ResourceStatus), nullable=False)  # 审批结果
+    title = Column(String)  # 审批时的资源标题快照
+    resource_type = Column(String)  # 审批时的资源类型快照
+    notes = Column(Text, nullable=True)  # 管理员审批备注
+    images = Column(JSON, nullable=True)  # 本次审批通过的图片
+    links = Column(JSON, nullable=True)  # 补充审批时提交的链接快照，按类别分组
+    admin_id = Column(Integer, nullable=True)  # 执行审批的管理员ID
+    hidden_from_admin = Column(Boolean, default=False)  # 是否从管理界面的审批记录中隐藏
+    created_at = Column(DateTime, default=func.now(), index=True)
+
+class LikeBucket(Base):
+    __tablename__ = "like_buckets"
+
+    # 按小时聚合的喜欢计数，用于计算随时间衰减的热度
+    resource_id = Column(Integer, ForeignKey("resources.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # 所在小时的开始时间
+    delta = Column(Integer, default=0, nullable=False)  # 该小时内喜欢数的净变化（喜欢+1，取消-1）
+    applied = Column(Integer, default=0, nullable=False)  # 已计入 hot_score 的部分
+
+class LikeFilterBucket(Base):
+    __tablename__ = "like_filter_buckets"
+
+    # 喜欢去重用的布谷鸟过滤器，每行一个桶，所有工作进程共用；用到的桶才建行，行数不超过桶数
+    bucket = Column(Integer, primary_key=True, autoincrement=False)  # 桶序号
+    fingerprints = Column(LargeBinary, nullable=False)  # 各槽的16位指纹（小端），0 表示空槽
+
+class SearchSnapshotItem(Base):
+    __tablename__ = "search_snapshot_items"
+
+    # 本地搜索快照的内容和版本，所有工作进程按此表计算同样的版本号、内容哈希和增量
+    resource_id = Column(Integer, primary_key=True, autoincrement=False)  # 资源ID，资源删除后保留为删除记录
+    version = Column(Integer, nullable=False, index=True)  # 最近一次变化的快照版本，同一批变化使用同一个版本
+    item = Column(JSON, nullable=True)  # 快照中的条目，为空表示资源已删除或不再公开
+
+class RankingState(Base):
+    __tablename__ = "ranking_state"
+
+    name = Column(String, primary_key=True)  # 排行名称，如 hot
+    computed_at = Column(DateTime, nullable=False)  # 上次计算的时间，多个进程按此抢占同一次计算
+    epoch = Column(DateTime, nullable=True)  # 热度分数的基准时间，分数按相对该时间的权重累加，衰减无需改写
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # 工作线程按此索引查找到期的排队任务
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    # 持久化的后台任务，由各进程的工作线程领取执行，进程重启后未完成的任务会继续执行
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False, index=True)  # 任务类型，对应注册的处理函数，如 promote_images
+    payload = Column(JSON, nullable=True)  # 任务参数
+    idempotency_key = Column(String, unique=True, nullable=True)  # 幂等键，相同键的任务只会创建一次
+    status = Column(String, default="queued", server_default="queued", nullable=False)  # queued、running、succeeded、failed
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)  # 已执行的次数
+    max_attempts = Column(Integer, default=5, server_default="5", nullable=False)  # 最多执行的次数，超过后标记为失败
+    run_after = Column(DateTime, nullable=False)  # 最早执行时间，失败重试时按退避时间推后
+    locked_by = Column(String, nullable=True)  # 正在执行该任务的工作线程
+    locked_at = Column(DateTime, nullable=True)  # 开始执行的时间，超时未完成的任务会重新排队
+    last_error = Column(Text, nullable=True)  # 最近一次失败的错误信息
+    result = Column(JSON, nullable=True)  # 处理函数的返回值
+    created_at = Column(DateTime, default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    # 进程内缓存（标题和前缀索引、资源列表缓存）对应数据的版本号，数据变化时在同一事务中加一，各工作进程发现版本号变化后重建或清空本进程的缓存
+    name = Column(String, primary_key=True)  # 如 search_index、public_list
+    version = Column(BigInteger, default=0, server_default="0", nullable=False)
+
+class Event(Base):
+    __tablename__ = "events"
+
+    # 实时推送的事件，与产生事件的修改在同一事务中写入；各工作进程按ID顺序读取新事件，推送给本进程的订阅连接
+    id = Column(Integer, primary_key=True)
+    channel = Column(String, nullable=False)  # 事件频道，likes 或 review
+    payload = Column(JSON, nullable=False)  # 推送给客户端的事件内容
+    created_at = Column(DateTime, default=func.now(), index=True)  # 超过保留时间的事件由后台任务删除
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)  # 统计项名称，如 resources_pending、likes_total
+    value = Column(BigInteger, default=0, server_default="0", nullable=False)  # 统计值，随资源提交、审批、补充、喜欢、删除增量维护，定期全量校正
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
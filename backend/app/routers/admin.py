@@ -0,0 +1,253 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+import os
+from datetime import timedelta
+from typing import List
+from ..models.database import get_db
+from ..models.models import User, Resource, ImageAsset, Job
+from ..schemas.schemas import Job as JobSchema
+from ..utils.auth import get_admin_user
+from ..utils.upload_gc import sweep_orphaned_uploads, get_gc_metrics, GC_GRACE_PERIOD, GC_BATCH_SIZE
+from ..utils.perceptual_hash import perceptual_index, backfill_perceptual_hashes, NEAR_DUPLICATE_DISTANCE
+from ..utils.hot_ranking import recompute_hot_scores
+from ..utils.link_checker import check_due_links, mark_links_due, get_link_health, LINK_CHECK_BATCH_SIZE
+from ..utils.job_queue import enqueue_job, retry_failed_job, get_job_counts, JOB_FAILED
+from ..utils.job_handlers import JOB_GC_SWEEP, JOB_PHASH_BACKFILL, JOB_REINDEX, JOB_PLACEHOLDER_BACKFILL, enqueue_stats_reconcile
+from ..utils.admin_stats import get_admin_stats
+from ..utils.profiling import list_profiles, load_profile
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"],
+)
+
+def _accepted(db, job):
+    # 任务随提交对工作线程可见，返回 202 和任务信息，可通过 /api/admin/jobs/{id} 查询进度
+    db.commit()
+    return JSONResponse(jsonable_encoder(JobSchema.model_validate(job)), status_code=202)
+
+# 管理后台统计：待审批、已通过、已拒绝的资源数，待审批的补充内容数，喜欢总数和图片占用空间
+# 读取增量维护的统计表，不扫描资源表
+@router.get("/stats")
+def admin_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return get_admin_stats(db)
+
+# 在后台按资源表和图片表重新统计，校正统计表（后台每小时自动执行一次）
+@router.post("/stats/reconcile")
+def reconcile_admin_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return _accepted(db, enqueue_stats_reconcile(db))
+
+# 预览未被引用的上传文件（不删除）
+@router.get("/gc")
+def preview_orphaned_uploads(
+    grace_hours: float = GC_GRACE_PERIOD.total_seconds() / 3600,
+    batch_size: int = GC_BATCH_SIZE,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return sweep_orphaned_uploads(db, dry_run=True, grace_period=timedelta(hours=grace_hours), batch_size=batch_size)
+
+# 清理未被引用的上传文件，每次最多删除 batch_size 个，has_more 为真时可再次调用
+# background=true 时交给后台任务执行并立即返回任务信息
+@router.post("/gc/sweep")
+def sweep_uploads(
+    grace_hours: float = GC_GRACE_PERIOD.total_seconds() / 3600,
+    batch_size: int = GC_BATCH_SIZE,
+    background: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    if background:
+        return _accepted(db, enqueue_job(db, JOB_GC_SWEEP, {"grace_hours": grace_hours, "batch_size": batch_size}))
+    return sweep_orphaned_uploads(db, dry_run=False, grace_period=timedelta(hours=grace_hours), batch_size=batch_size)
+
+# 清理统计：累计删除的文件数和回收的字节数
+@router.get("/gc/metrics")
+def gc_metrics(db: Session = Depends(get_db), current_user: User = Depends(get_admin_user)):
+    return get_gc_metrics(db)
+
+# 查找资源图片（含待审批的补充图片）的近似重复图片，供审批界面提示
+@router.get("/resources/{resource_id}/near-duplicates")
+def get_near_duplicate_images(
+    resource_id: int,
+    max_distance: int = NEAR_DUPLICATE_DISTANCE,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    resource = db.query(Resource).filter(Resource.id == resource_id).first()
+    if not resource:
+        raise HTTPException(status_code=404, detail="资源未找到")
+    
+    image_paths = list(resource.images or [])
+    if isinstance(resource.supplement, dict):
+        image_paths.extend(resource.supplement.get("images") or [])
+    
+    result = {}
+    for img_path in image_paths:
+        # 文件以内容哈希命名，审批后复制到 imgs 目录的图片也能按哈希找到记录
+        file_hash = os.path.splitext(os.path.basename(img_path))[0]
+        asset = db.query(ImageAsset).filter(ImageAsset.path == img_path).first() or \
+            db.query(ImageAsset).filter(ImageAsset.file_hash == file_hash).first()
+        if not asset or not asset.phash:
+            result[img_path] = []
+            continue
+        
+        # 排除内容完全相同的文件（同一图片在 uploads 和 imgs 中的副本）
+        result[img_path] = [
+            match for match in perceptual_index.find_similar(db, asset.phash, max_distance)
+            if os.path.splitext(os.path.basename(match["path"]))[0] != asset.file_hash
+        ]
+    
+    return {"resource_id": resource_id, "near_duplicates": result}
+
+# 为已有图片补充登记信息和感知哈希，每次处理一批；background=true 时交给后台任务执行
+@router.post("/images/phash-backfill")
+def backfill_image_hashes(
+    batch_size: int = 200,
+    background: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    if background:
+        return _accepted(db, enqueue_job(db, JOB_PHASH_BACKFILL, {"batch_size": batch_size}))
+    return {"processed": backfill_perceptual_hashes(db, batch_size)}
+
+# 在后台为已有图片补算列表占位图（BlurHash 和主色），每次处理一批
+@router.post("/images/placeholder-backfill")
+def backfill_image_placeholders(
+    batch_size: int = 200,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return _accepted(db, enqueue_job(db, JOB_PLACEHOLDER_BACKFILL, {"batch_size": batch_size}))
+
+# 在后台重建资源类型关联、类型计数和搜索索引
+@router.post("/reindex")
+def reindex_resources(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return _accepted(db, enqueue_job(db, JOB_REINDEX))
+
+# 后台任务列表，可按状态和类型筛选，最新的在前
+@router.get("/jobs", response_model=List[JobSchema])
+def list_jobs(
+    status: str = None,
+    kind: str = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    return query.order_by(Job.id.desc()).offset(skip).limit(min(limit, 200)).all()
+
+# 各状态、各类型的任务数量
+@router.get("/jobs/stats")
+def job_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return get_job_counts(db)
+
+# 查询单个任务的状态、重试次数、错误信息和结果
+@router.get("/jobs/{job_id}", response_model=JobSchema)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="任务未找到")
+    return job
+
+# 重新执行已失败的任务
+@router.post("/jobs/{job_id}/retry", response_model=JobSchema)
+def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="任务未找到")
+    if job.status != JOB_FAILED:
+        raise HTTPException(status_code=409, detail="只能重试已失败的任务")
+    return retry_failed_job(db, job)
+
+# 链接健康状况：各状态的链接数、待检测数量和最近发现的失效链接
+@router.get("/links/health")
+def link_health(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    return get_link_health(db)
+
+# 立即检测一批到期的链接；指定 resource_id 时优先检测该资源的链接
+@router.post("/links/check")
+async def check_links_now(
+    resource_id: int = None,
+    batch_size: int = LINK_CHECK_BATCH_SIZE,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    if resource_id is not None:
+        if not db.query(Resource.id).filter(Resource.id == resource_id).first():
+            raise HTTPException(status_code=404, detail="资源未找到")
+        mark_links_due(db, resource_id)
+        db.commit()
+    return await check_due_links(batch_size=max(1, min(batch_size, 200)))
+
+# 立即增量更新资源热度（后台任务每5分钟自动执行一次）
+@router.post("/ranking/hot/recompute")
+def recompute_hot_ranking(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    result = recompute_hot_scores(db)
+    if result is None:
+        raise HTTPException(status_code=409, detail="热度正在由其他进程计算，请稍后重试")
+    return result
+
+# 已保存的请求性能分析（最新的在前），不含调用栈和SQL明细
+@router.get("/profiles")
+def get_profiles(
+    limit: int = 50,
+    current_user: User = Depends(get_admin_user)
+):
+    return list_profiles(min(limit, 200))
+
+# 单个请求的性能分析：耗时、采样数、每条SQL的耗时和折叠格式的调用栈
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    current_user: User = Depends(get_admin_user)
+):
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="性能分析结果未找到")
+    return profile
+
+# 折叠格式的调用栈，可直接用 flamegraph.pl 或 speedscope 生成火焰图
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_folded(
+    profile_id: str,
+    current_user: User = Depends(get_admin_user)
+):
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="性能分析结果未找到")
+    return profile["folded"]
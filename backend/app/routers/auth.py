@@ -1,3 +1,4 @@
+import logging
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
@@ -16,6 +17,8 @@ router = APIRouter(
     tags=["auth"],
 )
 
+logger = logging.getLogger(__name__)
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
@@ -49,7 +52,7 @@ def create_initial_admin(db: Session):
     )
     db.add(db_user)
     db.commit()
-    print(f"已创建初始管理员账号: {default_username}，默认密码: {default_password}")
+    logger.warning("已创建初始管理员账号: %s，默认密码: %s，请登录后修改", default_username, default_password)
     return db_user
 
 @router.get("/me", response_model=UserSchema)
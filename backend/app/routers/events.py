@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from ..models.database import SessionLocal
+from ..models.models import User
+from ..utils.auth import get_admin_user, get_user_from_token, create_event_ticket, EVENT_TICKET_PURPOSE, EVENT_TICKET_EXPIRE_SECONDS
+from ..utils.event_bus import event_bus, stream_events, CHANNELS
+
+# 实时事件推送（Server-Sent Events），客户端收到事件后再按需刷新，无需轮询
+router = APIRouter(
+    prefix="/api/events",
+    tags=["events"],
+)
+
+# 获取事件流票据 - 仅管理员，票据只能用于订阅事件流，60秒内有效
+@router.post("/ticket")
+def create_stream_ticket(current_user: User = Depends(get_admin_user)):
+    return {"ticket": create_event_ticket(current_user), "expires_in": EVENT_TICKET_EXPIRE_SECONDS}
+
+# 订阅事件流：channels 以逗号分隔；review 频道需要管理员的事件流票据（EventSource 无法设置请求头，通过 ticket 参数传递）
+@router.get("/stream")
+async def subscribe_events(
+    request: Request,
+    channels: str = "likes",
+    resource_id: int = None,
+    ticket: str = None
+):
+    requested = {channel.strip() for channel in channels.split(",") if channel.strip()}
+    if not requested or not requested.issubset(CHANNELS):
+        raise HTTPException(status_code=400, detail=f"无效的频道，可选: {', '.join(CHANNELS)}")
+    
+    if "review" in requested:
+        # 只在建立连接时短暂使用数据库会话，长连接期间不占用连接
+        db = SessionLocal()
+        try:
+            user = get_user_from_token(db, ticket, purpose=EVENT_TICKET_PURPOSE) if ticket else None
+        finally:
+            db.close()
+        if not user or not user.is_admin:
+            raise HTTPException(status_code=403, detail="review 频道仅管理员可订阅")
+    
+    subscription = event_bus.subscribe(requested, resource_id)
+    return StreamingResponse(
+        stream_events(subscription, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,23 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import os
-import shutil
+import asyncio
+import logging
 from typing import List
 from datetime import datetime
-from ..models.database import get_db
-from ..models.models import Resource, User, ResourceStatus
-from ..schemas.schemas import ResourceCreate, ResourceUpdate, Resource as ResourceSchema, ResourceApproval
+from ..models.database import get_db, get_read_db
+from ..models.models import Resource, User, ResourceStatus, ResourceTypeTag, ResourceTypeLink, ApprovalEvent
+from ..schemas.schemas import (
+    ResourceCreate, ResourceUpdate, Resource as ResourceSchema, ResourceApproval,
+    ApprovalEvent as ApprovalEventSchema, ImageHashCheck
+)
 from ..utils.auth import get_current_active_user, get_admin_user
-from ..utils.image_utils import calculate_file_hash, move_approved_images, move_single_approved_image
+from ..utils.job_handlers import enqueue_image_promotion, enqueue_placeholder
+from ..utils.title_index import title_index, DUPLICATE_SCORE, SUGGEST_MIN_SCORE
+from ..utils.prefix_index import prefix_index
+from ..utils.resource_types import sync_resource_types, get_type_facets
+from ..utils.resource_links import (
+    links_from_dict, links_from_list, add_links, replace_links, find_existing_urls,
+    approve_resource_links, release_resource_links, delete_resource_links, get_links_map, links_from_map, get_resource_links
+)
+from ..utils.hot_ranking import record_like, delete_like_buckets
+from ..utils.admin_stats import resource_stats, apply_resource_change, adjust_stats, STAT_LIKES_TOTAL
+from ..utils.like_filter import like_filter, client_key
+from ..utils.event_bus import event_bus
+from ..utils.search_snapshot import search_snapshot
+from ..utils.image_placeholder import get_placeholders
+from ..utils.cache_versions import bump_versions, SEARCH_INDEX_VERSION, PUBLIC_LIST_VERSION
+from ..utils.serialization import JSONBytesResponse, CachedBody, dumps, resource_to_dict, public_list_cache
+from ..utils.upload_utils import (
+    save_upload_stream, get_daily_upload_prefix, register_upload, find_existing_assets,
+    MAX_BATCH_FILES, BATCH_UPLOAD_CONCURRENCY, MAX_HASH_CHECK, SHA256_PATTERN
+)
 
 router = APIRouter(
     prefix="/api/resources",
     tags=["resources"],
 )
 
+logger = logging.getLogger(__name__)
+
+def _sync_resource_indexes(db: Session, resource: Resource):
+    """
+    资源审批、更新后在同一事务中同步类型关联表和搜索快照，并让其他进程的索引和列表缓存失效（由调用方提交）
+    """
+    sync_resource_types(db, resource)
+    search_snapshot.record_resource(db, resource)
+    bump_versions(db, SEARCH_INDEX_VERSION, PUBLIC_LIST_VERSION)
+
+def _remove_resource_indexes(db: Session, resource: Resource):
+    """
+    删除资源前在同一事务中移除其类型关联和搜索快照条目，并让其他进程的索引和列表缓存失效（由调用方提交）
+    """
+    sync_resource_types(db, resource, remove=True)
+    search_snapshot.record_removed(db, resource.id)
+    bump_versions(db, SEARCH_INDEX_VERSION, PUBLIC_LIST_VERSION)
+
+def _link_conflict(db: Session):
+    """
+    同时审批的另一个资源刚占用了相同的链接（唯一索引冲突）：回滚本次修改，重试时会去掉这些链接
+    """
+    db.rollback()
+    return HTTPException(status_code=409, detail="部分链接刚被其他资源占用，请重试")
+
+def _refresh_memory_indexes(resource_id: int, resource: Resource = None):
+    """
+    提交后立即更新本进程内存中的搜索索引并清空列表缓存，resource 为空表示资源已删除
+    """
+    if resource is None:
+        title_index.remove_resource(resource_id)
+        prefix_index.remove_resource(resource_id)
+    else:
+        title_index.sync_resource(resource)
+        prefix_index.sync_resource(resource)
+    public_list_cache.invalidate()
+
 # 获取所有资源 - 普通用户只能看到已审批的资源
 @router.get("/", response_model=List[ResourceSchema])
-def get_resources(skip: int = 0, limit: int = 100, include_history: bool = False, db: Session = Depends(get_db), 
+def get_resources(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), 
                   current_user: User = Depends(get_current_active_user)):
     # 管理员可以看到所有资源，但不包括已被标记为隐藏的记录
     if current_user and current_user.is_admin:
@@ -28,59 +89,12 @@ def get_resources(skip: int = 0, limit: int = 100, include_history: bool = False
         resources = db.query(Resource).filter(Resource.status == ResourceStatus.APPROVED)\
             .offset(skip).limit(limit).all()
     
-    # 如果不需要包含历史记录，将 approval_history 设为 None
-    if not include_history:
-        for resource in resources:
-            resource.approval_history = None
-    
-    # 确保已审批资源的海报图片路径正确指向imgs目录
-    for resource in resources:
-        if resource.status == ResourceStatus.APPROVED and resource.poster_image and 'uploads' in resource.poster_image:
-            # 修正海报图片路径
-            base_assets_dir = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))), "assets")
-            filename = os.path.basename(resource.poster_image)
-            corrected_path = f"/assets/imgs/{resource.id}/{filename}"
-            dest_path = os.path.join(base_assets_dir, "imgs", str(resource.id), filename)
-            
-            # 验证目标文件是否存在
-            if os.path.exists(dest_path):
-                resource.poster_image = corrected_path
-                print(f"Corrected list poster image path to {resource.poster_image}")
-            else:
-                # 如果目标文件不存在，尝试从源文件复制
-                src_path = os.path.join(base_assets_dir, resource.poster_image.lstrip('/assets/'))
-                if os.path.exists(src_path):
-                    imgs_dir = os.path.join(base_assets_dir, "imgs", str(resource.id))
-                    os.makedirs(imgs_dir, exist_ok=True)
-                    try:
-                        print(f"Moving list poster image from {src_path} to {dest_path}")
-                        shutil.copy2(src_path, dest_path)
-                        resource.poster_image = corrected_path
-                    except Exception as e:
-                        print(f"Error moving list poster image: {e}")
-    
-    # 显式将SQLAlchemy模型列表转换为Pydantic模型列表
-    result = []
-    for resource in resources:
-        result.append(ResourceSchema(
-            id=resource.id,
-            title=resource.title,
-            title_en=resource.title_en,
-            description=resource.description,
-            resource_type=resource.resource_type,
-            images=resource.images,
-            poster_image=resource.poster_image,
-            links=resource.links,
-            status=resource.status,
-            supplement=resource.supplement,
-            original_resource_id=resource.original_resource_id,
-            is_supplement_approval=resource.is_supplement_approval,
-            likes_count=resource.likes_count,
-            created_at=resource.created_at,
-            updated_at=resource.updated_at
-        ))
-    
-    return result
+    # 一次查询加载本页所有资源的链接和海报占位图
+    links_map = get_links_map(db, [resource.id for resource in resources])
+    placeholders = get_placeholders(db, [resource.poster_image for resource in resources])
+    
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse([resource_to_dict(resource, links_from_map(resource, links_map), placeholders.get(resource.poster_image)) for resource in resources])
 
 # 获取待审批的资源 - 仅管理员可访问
 @router.get("/pending", response_model=List[ResourceSchema])
@@ -111,43 +125,40 @@ def get_pending_resources(skip: int = 0, limit: int = 100,
     # 将待审批的补充内容资源添加到结果中
     resources.extend(pending_supplements)
     
-    # 显式将SQLAlchemy模型列表转换为Pydantic模型列表
-    result = []
-    for resource in resources:
-        result.append(ResourceSchema(
-            id=resource.id,
-            title=resource.title,
-            title_en=resource.title_en,
-            description=resource.description,
-            resource_type=resource.resource_type,
-            images=resource.images,
-            poster_image=resource.poster_image,
-            links=resource.links,
-            status=resource.status,
-            supplement=resource.supplement,
-            original_resource_id=resource.original_resource_id,
-            is_supplement_approval=resource.is_supplement_approval,
-            likes_count=resource.likes_count,
-            created_at=resource.created_at,
-            updated_at=resource.updated_at
-        ))
-    
-    return result
+    # 一次查询加载本页所有资源的链接和海报占位图
+    links_map = get_links_map(db, [resource.id for resource in resources])
+    placeholders = get_placeholders(db, [resource.poster_image for resource in resources])
+    
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse([resource_to_dict(resource, links_from_map(resource, links_map), placeholders.get(resource.poster_image)) for resource in resources])
 
 # 公开API - 获取已审批的资源列表
 @router.get("/public", response_model=List[ResourceSchema])
 def get_public_resources(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     search: str = None, 
     sort_by: str = "created_at", 
     sort_order: str = "desc", 
-    db: Session = Depends(get_db)
+    resource_type: str = Query(None, alias="type"),
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Resource).filter(
-        Resource.status == ResourceStatus.APPROVED,
-        Resource.is_supplement_approval == False  # 排除补充审批记录
-    )
+    # 相同查询在缓存有效期内直接返回已编码、已压缩的响应
+    cache_key = (skip, limit, search, sort_by, sort_order.lower(), resource_type)
+    # 其他进程修改了资源时（版本号变化）先清空本进程的缓存
+    public_list_cache.refresh(db)
+    cached = public_list_cache.get(cache_key)
+    if cached is not None:
+        return cached.response(request)
+    
+    query = db.query(Resource).filter(Resource.status == ResourceStatus.APPROVED)
+    
+    # 按资源类型筛选，通过类型关联表走索引，而不是对逗号分隔的字符串做 LIKE 扫描
+    if resource_type:
+        query = query.join(ResourceTypeLink, ResourceTypeLink.resource_id == Resource.id)\
+            .join(ResourceTypeTag, ResourceTypeTag.id == ResourceTypeLink.type_id)\
+            .filter(ResourceTypeTag.name == resource_type)
     
     # 如果提供了搜索关键词，添加标题搜索过滤条件
     if search:
@@ -157,8 +168,10 @@ def get_public_resources(
             (Resource.title_en.ilike(search_term))  # 搜索英文标题
         )
     
-    # 添加排序条件
-    if sort_by == "likes_count":
+    # 添加排序条件，hot 按后台预先计算的热度排序
+    if sort_by == "hot":
+        query = query.order_by(Resource.hot_score.desc(), Resource.likes_count.desc(), Resource.created_at.desc())
+    elif sort_by == "likes_count":
         if sort_order.lower() == "asc":
             query = query.order_by(Resource.likes_count.asc())
         else:
@@ -171,234 +184,122 @@ def get_public_resources(
     
     resources = query.offset(skip).limit(limit).all()
     
-    # 确保已审批资源的海报图片路径正确指向imgs目录
-    base_assets_dir = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))), "assets")
+    # 一次查询加载本页所有资源的链接和海报占位图
+    links_map = get_links_map(db, [resource.id for resource in resources])
+    placeholders = get_placeholders(db, [resource.poster_image for resource in resources])
     
-    for resource in resources:
-        if resource.poster_image:
-            # 检查图片是否在 uploads 目录
-            if 'uploads' in resource.poster_image:
-                filename = os.path.basename(resource.poster_image)
-                corrected_path = f"/assets/imgs/{resource.id}/{filename}"
-                dest_path = os.path.join(base_assets_dir, "imgs", str(resource.id), filename)
-                
-                # 验证目标文件是否存在
-                if os.path.exists(dest_path):
-                    # 更新内存中的路径
-                    resource.poster_image = corrected_path
-                    # 同时更新数据库中的路径
-                    db_resource = db.query(Resource).filter(Resource.id == resource.id).first()
-                    if db_resource:
-                        db_resource.poster_image = corrected_path
-                        db.commit()
-                    print(f"已修正公开列表中海报图片路径为: {corrected_path}")
-                else:
-                    # 如果目标文件不存在，尝试从源文件复制
-                    src_path = os.path.join(base_assets_dir, resource.poster_image.lstrip('/assets/'))
-                    if os.path.exists(src_path):
-                        imgs_dir = os.path.join(base_assets_dir, "imgs", str(resource.id))
-                        os.makedirs(imgs_dir, exist_ok=True)
-                        try:
-                            print(f"正在从 {src_path} 移动海报图片到 {dest_path}")
-                            shutil.copy2(src_path, dest_path)
-                            # 更新内存中的路径
-                            resource.poster_image = corrected_path
-                            # 同时更新数据库中的路径
-                            db_resource = db.query(Resource).filter(Resource.id == resource.id).first()
-                            if db_resource:
-                                db_resource.poster_image = corrected_path
-                                db.commit()
-                        except Exception as e:
-                            print(f"移动海报图片时出错: {e}")
-        
-        # 同样处理资源的所有图片
-        if resource.images:
-            corrected_images = []
-            for img_path in resource.images:
-                # 检查图片路径是否包含"uploads"目录
-                if 'uploads' in img_path:
-                    filename = os.path.basename(img_path)
-                    corrected_path = f"/assets/imgs/{resource.id}/{filename}"
-                    dest_path = os.path.join(base_assets_dir, "imgs", str(resource.id), filename)
-                    
-                    # 验证目标文件是否存在
-                    if os.path.exists(dest_path):
-                        print(f"已修正图片路径: {img_path} -> {corrected_path}")
-                        corrected_images.append(corrected_path)
-                    else:
-                        # 如果目标文件不存在，尝试移动文件
-                        src_path = os.path.join(base_assets_dir, img_path.lstrip('/assets/'))
-                        if os.path.exists(src_path):
-                            imgs_dir = os.path.join(base_assets_dir, "imgs", str(resource.id))
-                            os.makedirs(imgs_dir, exist_ok=True)
-                            try:
-                                print(f"正在从 {src_path} 移动图片到 {dest_path}")
-                                shutil.copy2(src_path, dest_path)
-                                corrected_images.append(corrected_path)
-                            except Exception as e:
-                                print(f"移动图片时出错: {e}")
-                                corrected_images.append(img_path)  # 保留原路径
-                        else:
-                            print(f"源文件不存在: {src_path}")
-                            corrected_images.append(img_path)  # 保留原路径
-                else:
-                    corrected_images.append(img_path)
-            
-            # 只有当存在修改时才更新数据库
-            if any('uploads' in img for img in resource.images):
-                # 更新内存中的图片列表
-                resource.images = corrected_images
-                # 同时更新数据库中的图片列表
-                db_resource = db.query(Resource).filter(Resource.id == resource.id).first()
-                if db_resource:
-                    db_resource.images = corrected_images
-                    db.commit()
-    
-    # 显式将SQLAlchemy模型列表转换为Pydantic模型列表
-    result = []
-    for resource in resources:
-        result.append(ResourceSchema(
-            id=resource.id,
-            title=resource.title,
-            title_en=resource.title_en,
-            description=resource.description,
-            resource_type=resource.resource_type,
-            images=resource.images,
-            poster_image=resource.poster_image,
-            links=resource.links,
-            status=resource.status,
-            supplement=resource.supplement,
-            original_resource_id=resource.original_resource_id,
-            is_supplement_approval=resource.is_supplement_approval,
-            likes_count=resource.likes_count,
-            created_at=resource.created_at,
-            updated_at=resource.updated_at
-        ))
-    
-    return result
+    # 直接从ORM行编码JSON并预先压缩，缓存到资源变更或过期
+    entry = CachedBody(dumps([resource_to_dict(resource, links_from_map(resource, links_map), placeholders.get(resource.poster_image)) for resource in resources]))
+    public_list_cache.set(cache_key, entry)
+    return entry.response(request)
+
+# 查找标题相似的已审批资源，用于提交前提示可能的重复资源
+@router.get("/suggest")
+def suggest_similar_resources(
+    title: str = None,
+    title_en: str = None,
+    limit: int = 10,
+    min_score: float = SUGGEST_MIN_SCORE,
+    db: Session = Depends(get_read_db)
+):
+    if not title and not title_en:
+        raise HTTPException(status_code=400, detail="请提供中文标题或英文标题")
+    return title_index.search(db, title, title_en, limit=min(limit, 50), min_score=min_score)
+
+# 各资源类型下的已审批资源数量，读取预先维护的计数
+@router.get("/facets")
+def get_resource_type_facets(db: Session = Depends(get_read_db)):
+    return get_type_facets(db)
+
+# 标题自动补全 - 按中英文标题或拼音前缀匹配已审批资源，只返回精简字段
+@router.get("/autocomplete")
+def autocomplete_resources(q: str, limit: int = 8, db: Session = Depends(get_read_db)):
+    return prefix_index.search(db, q, limit=max(1, min(limit, 20)))
+
+# 本地搜索快照 - 返回当前版本号和内容哈希，客户端再按哈希下载快照
+@router.get("/search-snapshot")
+def get_search_snapshot_manifest(db: Session = Depends(get_read_db)):
+    return search_snapshot.manifest(db)
+
+# 本地搜索快照的增量 - 返回指定版本之后变化和删除的资源
+@router.get("/search-snapshot/delta")
+def get_search_snapshot_delta(since: int, generation: str, db: Session = Depends(get_read_db)):
+    return search_snapshot.delta(db, since, generation)
+
+# 按内容哈希下载完整快照，内容不变所以可以长期缓存
+@router.get("/search-snapshot/{content_hash}")
+def get_search_snapshot(content_hash: str, request: Request, db: Session = Depends(get_read_db)):
+    body = search_snapshot.body(db, content_hash)
+    if body is None:
+        raise HTTPException(status_code=404, detail="快照已更新，请重新获取快照版本")
+    response = body.response(request)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+# 审批记录列表 - 仅管理员可访问，按审批时间倒序
+@router.get("/approval-events", response_model=List[ApprovalEventSchema])
+def get_approval_events(
+    skip: int = 0,
+    limit: int = 100,
+    event_type: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    query = db.query(ApprovalEvent).filter(ApprovalEvent.hidden_from_admin == False)
+    if event_type:
+        query = query.filter(ApprovalEvent.event_type == event_type)
+    return query.order_by(ApprovalEvent.created_at.desc(), ApprovalEvent.id.desc())\
+        .offset(skip).limit(limit).all()
+
+# 获取单条审批记录 - 仅管理员可访问
+@router.get("/approval-events/{event_id}", response_model=ApprovalEventSchema)
+def get_approval_event(
+    event_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    event = db.query(ApprovalEvent).filter(ApprovalEvent.id == event_id).first()
+    if event is None:
+        raise HTTPException(status_code=404, detail="审批记录未找到")
+    return event
+
+# 从管理界面隐藏审批记录 - 审批记录只追加不删除，这里只做隐藏标记
+@router.delete("/approval-events/{event_id}", status_code=204)
+def hide_approval_event(
+    event_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    event = db.query(ApprovalEvent).filter(ApprovalEvent.id == event_id).first()
+    if event is None:
+        raise HTTPException(status_code=404, detail="审批记录未找到")
+    event.hidden_from_admin = True
+    db.commit()
 
 # 获取单个资源
 @router.get("/{resource_id}", response_model=ResourceSchema)
-def get_resource(resource_id: int, is_admin_view: bool = False, db: Session = Depends(get_db)):
+def get_resource(resource_id: int, db: Session = Depends(get_read_db)):
     resource = db.query(Resource).filter(Resource.id == resource_id).first()
     if resource is None:
         raise HTTPException(status_code=404, detail="资源未找到")
     
-    # 只有在公开页面访问时（非管理页面），才重定向补充审批记录到原始资源
-    if not is_admin_view and resource.is_supplement_approval and resource.original_resource_id:
-        original_resource = db.query(Resource).filter(Resource.id == resource.original_resource_id).first()
-        if original_resource:
-            print(f"公开页面请求补充资源审批记录 {resource_id}，重定向到原始资源 {resource.original_resource_id}")
-            resource = original_resource
-        else:
-            print(f"补充资源审批记录 {resource_id} 的原始资源 {resource.original_resource_id} 未找到")
+    # 从链接表加载资源链接
+    resource_links = get_resource_links(db, resource)
     
-    # 确保审批通过的资源不会显示被拒绝的链接
-    if resource.status == ResourceStatus.APPROVED and hasattr(resource, 'links') and resource.links:
-        # 创建一个只包含已批准链接的新字典
-        filtered_links = {}
-        
-        # 对每个类别的链接进行过滤
-        for category, links in resource.links.items():
-            if links:  # 确保该类别有链接
-                # 保留链接
-                filtered_links[category] = links
-        
-        # 替换原始的链接对象
-        resource.links = filtered_links
-        
-        print(f"Filtered links for resource {resource_id}: {resource.links}")
-    
-    # 确保图片路径指向imgs目录而不是uploads目录
-    if resource.status == ResourceStatus.APPROVED and hasattr(resource, 'images') and resource.images:
-        corrected_images = []
-        base_assets_dir = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))), "assets")
-        
-        for img_path in resource.images:
-            # 检查图片路径是否包含"uploads"目录
-            if 'uploads' in img_path:
-                # 创建正确的imgs目录路径
-                filename = os.path.basename(img_path)
-                corrected_path = f"/assets/imgs/{resource_id}/{filename}"
-                
-                # 验证目标文件是否存在
-                dest_path = os.path.join(base_assets_dir, "imgs", str(resource_id), filename)
-                if os.path.exists(dest_path):
-                    print(f"Corrected image path from {img_path} to {corrected_path}")
-                    corrected_images.append(corrected_path)
-                else:
-                    # 如果目标文件不存在，尝试移动文件
-                    src_path = os.path.join(base_assets_dir, img_path.lstrip('/assets/'))
-                    if os.path.exists(src_path):
-                        imgs_dir = os.path.join(base_assets_dir, "imgs", str(resource_id))
-                        os.makedirs(imgs_dir, exist_ok=True)
-                        try:
-                            print(f"Moving image from {src_path} to {dest_path}")
-                            shutil.copy2(src_path, dest_path)
-                            corrected_images.append(corrected_path)
-                        except Exception as e:
-                            print(f"Error moving image: {e}")
-                            corrected_images.append(img_path)  # 保留原路径
-                    else:
-                        print(f"Source file does not exist: {src_path}")
-                        corrected_images.append(img_path)  # 保留原路径
-            else:
-                corrected_images.append(img_path)
-        
-        # 更新资源图片路径
-        resource.images = corrected_images
-        
-        # 如果海报图片也是指向uploads目录，修正它
-        if resource.poster_image and 'uploads' in resource.poster_image:
-            filename = os.path.basename(resource.poster_image)
-            dest_path = os.path.join(base_assets_dir, "imgs", str(resource_id), filename)
-            corrected_poster_path = f"/assets/imgs/{resource_id}/{filename}"
-            
-            # 验证目标文件是否存在
-            if os.path.exists(dest_path):
-                resource.poster_image = corrected_poster_path
-                print(f"Corrected poster image path to {resource.poster_image}")
-            else:
-                # 如果目标文件不存在，尝试移动文件
-                src_path = os.path.join(base_assets_dir, resource.poster_image.lstrip('/assets/'))
-                if os.path.exists(src_path):
-                    try:
-                        print(f"Moving poster image from {src_path} to {dest_path}")
-                        shutil.copy2(src_path, dest_path)
-                        resource.poster_image = corrected_poster_path
-                    except Exception as e:
-                        print(f"Error moving poster image: {e}")
-                        # 保留原路径
-    
-    # 显式将SQLAlchemy模型转换为Pydantic模型
-    return ResourceSchema(
-        id=resource.id,
-        title=resource.title,
-        title_en=resource.title_en,
-        description=resource.description,
-        resource_type=resource.resource_type,
-        images=resource.images,
-        poster_image=resource.poster_image,
-        links=resource.links,
-        status=resource.status,
-        supplement=resource.supplement,
-        original_resource_id=resource.original_resource_id,
-        is_supplement_approval=resource.is_supplement_approval,
-        likes_count=resource.likes_count,
-        created_at=resource.created_at,
-        updated_at=resource.updated_at
-    )
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse(resource_to_dict(resource, resource_links))
 
 # 创建新资源 - 匿名用户可提交，状态默认为待审批
 @router.post("/", response_model=ResourceSchema)
-def create_resource(resource: ResourceCreate, db: Session = Depends(get_db)):
-    # 确保links字段格式正确
-    links = resource.links
-    if links:
-        print(f"Resource submitted with links: {links}")
-    else:
-        links = {}
-        print("No links provided in resource submission")
+def create_resource(resource: ResourceCreate, force: bool = False, db: Session = Depends(get_db)):
+    # 检查是否已存在标题相同或高度相似的已审批资源，force=true 时跳过检查
+    if not force:
+        duplicates = title_index.search(db, resource.title, resource.title_en, limit=5, min_score=DUPLICATE_SCORE)
+        if duplicates:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "已存在相似的资源，可以选择补充该资源", "duplicates": duplicates}
+            )
     
     db_resource = Resource(
         title=resource.title,
@@ -406,31 +307,26 @@ def create_resource(resource: ResourceCreate, db: Session = Depends(get_db)):
         description=resource.description,
         images=resource.images,
         resource_type=resource.resource_type,
-        status=ResourceStatus.PENDING,
-        links=links  # 显式设置links字段
+        status=ResourceStatus.PENDING
     )
     db.add(db_resource)
+    db.flush()
+    
+    # 链接逐条写入链接表，已属于已审批资源的链接会被跳过并返回给提交者
+    skipped = []
+    if resource.links:
+        added, skipped = add_links(db, db_resource.id, links_from_dict(resource.links))
+        logger.debug("Resource submitted with %d links, %d duplicate links skipped", len(added), len(skipped))
+    else:
+        logger.debug("No links provided in resource submission")
+    
+    apply_resource_change(db, {}, resource_stats(db_resource))
+    event_bus.publish(db, "review", "resource_submitted", resource_id=db_resource.id, title=db_resource.title)
     db.commit()
     db.refresh(db_resource)
     
-    # 显式将SQLAlchemy模型转换为Pydantic模型
-    return ResourceSchema(
-        id=db_resource.id,
-        title=db_resource.title,
-        title_en=db_resource.title_en,
-        description=db_resource.description,
-        resource_type=db_resource.resource_type,
-        images=db_resource.images,
-        poster_image=db_resource.poster_image,
-        links=db_resource.links,
-        status=db_resource.status,
-        supplement=db_resource.supplement,
-        original_resource_id=db_resource.original_resource_id,
-        is_supplement_approval=db_resource.is_supplement_approval,
-        likes_count=db_resource.likes_count,
-        created_at=db_resource.created_at,
-        updated_at=db_resource.updated_at
-    )
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse(resource_to_dict(db_resource, get_resource_links(db, db_resource), skipped_links=skipped))
 
 # 更新资源 - 仅管理员可更新
 @router.put("/{resource_id}", response_model=ResourceSchema)
@@ -447,87 +343,34 @@ def update_resource(
     # 更新非空字段
     update_data = resource_update.dict(exclude_unset=True)
     
-    # 特殊处理links字段，确保链接格式正确
+    # 特殊处理links字段：按URL增删改链接表中的记录，而不是重写整个JSON
+    skipped = []
     if 'links' in update_data:
-        links = update_data['links']
-        print(f"处理资源链接更新: {links}")
-        
-        # 验证链接格式
-        valid_categories = [
-            "magnet", "ed2k", "uc", "mobile", "tianyi", "quark", 
-            "115", "aliyun", "pikpak", "baidu", "123", "online", "others"
-        ]
-        
-        standardized_links = {}
-        
-        # 遍历每个链接类别
-        for category, category_links in links.items():
-            if category not in valid_categories:
-                print(f"警告: 忽略无效链接类别 '{category}'")
-                continue
-            
-            standardized_links[category] = []
-            
-            # 处理该类别下的所有链接
-            for link in category_links:
-                # 确保每个链接项都是完整的对象
-                if isinstance(link, str):
-                    # 如果是字符串，转换为对象格式
-                    standardized_links[category].append({
-                        "url": link,
-                        "password": "",
-                        "note": ""
-                    })
-                elif isinstance(link, dict):
-                    # 验证必要的URL字段
-                    if "url" not in link or not link["url"]:
-                        print(f"警告: 忽略缺少URL的链接项: {link}")
-                        continue
-                    
-                    # 创建标准化的链接对象
-                    standardized_links[category].append({
-                        "url": link["url"],
-                        "password": link.get("password", ""),
-                        "note": link.get("note", "")
-                    })
-        
-        # 更新links字段为标准格式
-        update_data["links"] = standardized_links
-        print(f"标准化后的链接: {standardized_links}")
+        links = update_data.pop('links') or {}
+        logger.debug("处理资源 %s 的链接更新: %d 个类别", resource_id, len(links))
+        skipped = replace_links(db, resource_id, links_from_dict(links))
+        if skipped:
+            logger.warning("以下链接已属于其他资源，已忽略: %s", skipped)
     
     # 应用所有更新
     for key, value in update_data.items():
         setattr(db_resource, key, value)
     
     try:
+        _sync_resource_indexes(db, db_resource)
         db.commit()
         db.refresh(db_resource)
-        print(f"资源 {resource_id} 更新成功")
+        logger.info("资源 %s 更新成功", resource_id)
+    except IntegrityError:
+        raise _link_conflict(db)
     except Exception as e:
         db.rollback()
-        print(f"更新资源时出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("更新资源 %s 时出错", resource_id)
         raise HTTPException(status_code=500, detail="服务器处理更新请求时出错")
+    _refresh_memory_indexes(resource_id, db_resource)
     
-    # 显式将SQLAlchemy模型转换为Pydantic模型
-    return ResourceSchema(
-        id=db_resource.id,
-        title=db_resource.title,
-        title_en=db_resource.title_en,
-        description=db_resource.description,
-        resource_type=db_resource.resource_type,
-        images=db_resource.images,
-        poster_image=db_resource.poster_image,
-        links=db_resource.links,
-        status=db_resource.status,
-        supplement=db_resource.supplement,
-        original_resource_id=db_resource.original_resource_id,
-        is_supplement_approval=db_resource.is_supplement_approval,
-        likes_count=db_resource.likes_count,
-        created_at=db_resource.created_at,
-        updated_at=db_resource.updated_at
-    )
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse(resource_to_dict(db_resource, get_resource_links(db, db_resource), skipped_links=skipped))
 
 # 审批资源 - 仅管理员可审批
 @router.put("/{resource_id}/approve", response_model=ResourceSchema)
@@ -540,15 +383,18 @@ async def approve_resource(
     db_resource = db.query(Resource).filter(Resource.id == resource_id).first()
     if not db_resource:
         raise HTTPException(status_code=404, detail="资源未找到")
+    stats_before = resource_stats(db_resource)
 
     # 检查是否为补充资源审批
     has_supplement = hasattr(db_resource, 'supplement') and db_resource.supplement
     is_supplement = False
+    supplement_links = None
+    add_images = []
     
     if has_supplement and db_resource.supplement.get('status') == ResourceStatus.PENDING:
         is_supplement = True
-        print(f"检测到补充资源审批，资源ID: {resource_id}")
-        print(f"补充内容: {db_resource.supplement}")
+        supplement_links = db_resource.supplement.get('links', {})
+        logger.debug("检测到补充资源审批，资源ID: %s", resource_id)
     
     # 检查是否为传统的补充资源（旧数据兼容）
     is_legacy_supplement = hasattr(db_resource, 'original_resource_id') and db_resource.original_resource_id is not None
@@ -566,6 +412,19 @@ async def approve_resource(
     # 更新状态（对于非补充内容审批）
     if not is_supplement:
         db_resource.status = approval.status
+        if approval.status == ResourceStatus.APPROVED:
+            # 待审批的提交之间可能有重复链接，通过时去掉已属于其他已审批资源的链接，其余链接开始占用其地址
+            try:
+                dropped = approve_resource_links(db, resource_id)
+            except IntegrityError:
+                raise _link_conflict(db)
+            if dropped:
+                logger.info("资源 %s 的 %d 个链接已属于其他资源，审批时已移除", resource_id, len(dropped))
+        elif approval.status == ResourceStatus.REJECTED:
+            # 被拒绝的提交不再保留链接记录
+            delete_resource_links(db, resource_id)
+        else:
+            release_resource_links(db, resource_id)
     
     # 记录审批笔记（如果有）
     if approval.notes:
@@ -580,30 +439,22 @@ async def approve_resource(
     if approval.status == ResourceStatus.APPROVED:        
         # 处理已批准的图片
         images = db_resource.images.copy() if db_resource.images else [] # 原始资源图片列表
-        add_images = []
         if approval.approved_images:
             if is_supplement:                
-                # 移动已批准的图片
+                # 批准的图片先保留 uploads 路径，审批完成后由后台任务复制到已批准目录
                 for img in approval.approved_images:
-                    # 移动该图片到已批准目录
-                    new_path = move_single_approved_image(resource_id, img)
-                    images.append(new_path)
-                    add_images.append(new_path)
-                    print(f"已移动批准的补充图片: {img} -> {new_path}")
+                    images.append(img)
+                    add_images.append(img)
 
-                print(f"最终批准的图片列表: {images}")
-                
                 # 将批准的图片添加到原资源的图片列表中                
                 # 确保不添加重复的图片
                 images = list(set(images))
                 db_resource.images = images
                 db.commit()
-                print(f"已将图片变更提交到数据库")
                 
                 # 如果没有设置海报图片，使用第一张批准的图片作为海报
-                if not db_resource.poster_image and new_images:
-                    db_resource.poster_image = new_images[0]
-                    print(f"自动设置第一张批准图片为海报: {db_resource.poster_image}")
+                if not db_resource.poster_image and add_images:
+                    db_resource.poster_image = add_images[0]
                     db.commit()
             else:
                 # 获取原始图片列表（非补充模式）
@@ -612,161 +463,84 @@ async def approve_resource(
                 # 创建新的图片路径列表
                 new_images = []
                 
-                # 移动已批准的图片
+                # 批准的图片先保留 uploads 路径，审批完成后由后台任务复制到已批准目录
                 for img in approval.approved_images:
                     if img in original_images:
-                        # 移动该图片到已批准目录
-                        try:
-                            new_path = move_single_approved_image(resource_id, img)
-                            new_images.append(new_path)
-                            print(f"Moved approved image from {img} to {new_path}")
-                        except Exception as e:
-                            print(f"Error moving approved image: {e}")
+                        new_images.append(img)
                 
                 # 更新资源的图片列表，仅包含已批准的图片
                 db_resource.images = new_images
                 
-                # 设置海报图片
-                if approval.poster_image:
-                    # 确保选择的海报图片在已批准的图片中
-                    if approval.poster_image in original_images:
-                        # 找到对应的新路径
-                        for old_path, new_path in zip(original_images, new_images):
-                            if old_path == approval.poster_image:
-                                db_resource.poster_image = new_path
-                                break
+                # 设置海报图片，确保选择的海报图片在已批准的图片中
+                if approval.poster_image and approval.poster_image in new_images:
+                    db_resource.poster_image = approval.poster_image
                 
                 # 如果没有设置海报图片或者设置的海报图片不在批准列表中，使用第一张批准的图片作为海报
                 if (not db_resource.poster_image or not approval.poster_image) and new_images:
                     db_resource.poster_image = new_images[0]
-                    print(f"Automatically setting first approved image as poster: {db_resource.poster_image}")
         
         # 处理已批准的链接
         if is_supplement:
             # 处理前端传递的批准链接 - 修改这部分代码以适应前端传递的数据格式
+            # 只插入新批准的链接记录，已存在的链接（按URL唯一）会被跳过
             if hasattr(approval, 'approved_links') and approval.approved_links:
-                links = db_resource.links.copy() if db_resource.links else {}
-                links = {
-                    "magnet": links.get('magnet', []),
-                    "ed2k": links.get('ed2k', []),
-                    "uc": links.get('uc', []),
-                    "mobile": links.get('mobile', []),
-                    "tianyi": links.get('tianyi', []),
-                    "quark": links.get('quark', []),
-                    "115": links.get('115', []),
-                    "aliyun": links.get('aliyun', []),
-                    "pikpak": links.get('pikpak', []),
-                    "baidu": links.get('baidu', []),
-                    "123": links.get('123', []),
-                    "online": links.get('online', []),
-                    "others": links.get('others', [])
-                }
-
-                for link_info in approval.approved_links:
-                    # {category: "xx", url: "xxx", password: "xx", note: "xx"}
-                    category = link_info.get('category')
-                    url = link_info.get('url')
-                    password = link_info.get('password', '')
-                    note = link_info.get('note', '')
-                    
-                    if not category or not url:
-                        print(f"警告: 链接信息不完整，跳过: {link_info}")
-                        continue
-                    
-                    print(f"处理批准的链接: 分类={category}, URL={url}")
-                    
-                    # 确保目标分类存在
-                    category_list = links.get(category, [])
-                    
-                    # 构建链接对象
-                    link_obj = {
-                        "url": url,
-                        "password": password if password else "",
-                        "note": note if note else ""
-                    }
-                    
-                    category_list.append(link_obj)
-                    links[category] = category_list
-
                 try:
-                    print(f"更新后的资源最终链接: {links}")
-                    db_resource.links = links
+                    added, skipped = add_links(db, resource_id, links_from_list(approval.approved_links))
                     db.commit()
-                    print(f"已将链接变更提交到数据库")
-                    db.refresh(db_resource)
+                    logger.debug("已添加 %d 个批准的链接，跳过 %d 个重复链接", len(added), len(skipped))
                 except Exception as e:
-                    print(f"处理批准链接时出错: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-            
-
-            # 创建一个新的独立资源记录来保存这次补充审批的结果
-            supplement_record = Resource(
-                title=db_resource.title,
-                title_en=db_resource.title_en,
-                resource_type=db_resource.resource_type,
-                status=approval.status,
-                hidden_from_admin=False,  # 确保可以在管理面板中看到
-                original_resource_id=db_resource.id,  # 关联原始资源
-                is_supplement_approval=True,  # 标记为补充资源审批
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            
-            # 添加审批备注
-            if approval.notes:
-                supplement_record.description = f"补充内容审批 - {approval.notes}"
-            else:
-                supplement_record.description = "补充内容审批"
-            
-            # 保存补充的图片和链接信息
-            supplement_record.images = add_images
-            supplement_record.links = db_resource.supplement.get('links', {})
-            
-            # 添加到数据库
-            db.add(supplement_record)
-            
-            # 确保补充审批记录被立即保存到数据库
-            db.commit()
-            print(f"已将补充审批记录 {supplement_record.id} 提交到数据库")
+                    db.rollback()
+                    logger.exception("处理资源 %s 的批准链接时出错", resource_id)
             
             # 如果审批通过，合并补充内容到原资源并清空supplement
             if approval.status == ResourceStatus.APPROVED:
                 # 清空当前的补充内容，表示已处理完毕
                 db_resource.supplement = None
-                print(f"补充内容已批准并合并到资源 {resource_id}，同时创建了审批记录")
             else:
                 # 如果拒绝，保留补充内容但更新状态
                 db_resource.supplement['status'] = approval.status
-                print(f"补充内容已被拒绝 {resource_id}，同时创建了审批记录")
                 db.commit()
-            print(f"已将更新后的资源信息提交到数据库: 图片数量={len(db_resource.images or [])}, 链接类别数量={len(db_resource.links or {})}")
-        else:
-            print("Resource has no approved images")
-
-    else:
-        print("Resource has no approved status")
     
-    db.commit()
-    db.refresh(db_resource)
-    # 显式将SQLAlchemy模型转换为Pydantic模型
-    return ResourceSchema(
-        id=db_resource.id,
-        title=db_resource.title,
-        title_en=db_resource.title_en,
-        description=db_resource.description,
+    # 审批状态和补充内容的变化计入管理后台统计
+    apply_resource_change(db, stats_before, resource_stats(db_resource))
+    # 追加一条审批记录，补充审批保存本次补充的图片和链接快照
+    db.add(ApprovalEvent(
+        resource_id=db_resource.id,
+        event_type="supplement" if is_supplement else "initial",
+        status=approval.status,
+        title=db_resource.title or db_resource.title_en,
         resource_type=db_resource.resource_type,
-        images=db_resource.images,
-        poster_image=db_resource.poster_image,
-        links=db_resource.links,
-        status=db_resource.status,
-        supplement=db_resource.supplement,
-        original_resource_id=db_resource.original_resource_id,
-        is_supplement_approval=db_resource.is_supplement_approval,
-        likes_count=db_resource.likes_count,
-        created_at=db_resource.created_at,
-        updated_at=db_resource.updated_at
+        notes=approval.notes,
+        images=add_images if is_supplement else db_resource.images,
+        links=supplement_links,
+        admin_id=current_user.id
+    ))
+    _sync_resource_indexes(db, db_resource)
+    # 复制图片到 imgs 目录交给后台任务，与审批结果在同一事务中提交，审批请求立即返回
+    enqueue_image_promotion(db, db_resource)
+    event_bus.publish(
+        db, "review", "resource_reviewed",
+        resource_id=db_resource.id,
+        approval_type="supplement" if is_supplement else "initial",
+        status=approval.status.value
     )
+    try:
+        db.commit()
+    except IntegrityError:
+        raise _link_conflict(db)
+    db.refresh(db_resource)
+    _refresh_memory_indexes(resource_id, db_resource)
+    logger.info(
+        "资源 %s 审批完成", db_resource.id,
+        extra={
+            "resource_id": db_resource.id,
+            "approval_type": "supplement" if is_supplement else "initial",
+            "status": approval.status.value,
+            "images": len(db_resource.images or []),
+        }
+    )
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse(resource_to_dict(db_resource, get_resource_links(db, db_resource)))
 
 # 删除资源 - 仅管理员可删除
 @router.delete("/{resource_id}", status_code=204)
@@ -779,8 +553,13 @@ def delete_resource(
     if not db_resource:
         raise HTTPException(status_code=404, detail="资源未找到")
     
+    _remove_resource_indexes(db, db_resource)
+    delete_resource_links(db, resource_id)
+    delete_like_buckets(db, resource_id)
+    apply_resource_change(db, resource_stats(db_resource), {})
     db.delete(db_resource)
     db.commit()
+    _refresh_memory_indexes(resource_id)
     return {"status": "success"}
 
 # 删除审批记录 - 仅管理员可删除记录，但保留资源
@@ -808,34 +587,115 @@ async def upload_images(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    # 获取当前日期，格式为YYYYMMDD
-    today = datetime.now().strftime("%Y%m%d")
-    
-    # 确保uploads目录和日期子目录存在
-    base_upload_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "assets", "uploads")
-    upload_dir = os.path.join(base_upload_dir, today)
-    
-    # 如果目录不存在，创建它
-    os.makedirs(upload_dir, exist_ok=True)
+    # 保存到 uploads/日期 下
+    upload_prefix = get_daily_upload_prefix()
     
-    # 计算文件的哈希值用于命名
-    file_hash = calculate_file_hash(file.file)
+    # 流式保存文件：校验文件魔数、限制大小，并以内容哈希命名
+    # 扩展名由文件内容决定，不信任客户端提供的文件名
+    info = await run_in_threadpool(save_upload_stream, file.file, upload_prefix)
     
-    # 获取文件扩展名
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    
-    # 创建以哈希值命名的文件名
-    file_name = f"{file_hash}{file_extension}"
-    file_path = os.path.join(upload_dir, file_name)
+    def register():
+        file_path, _ = register_upload(db, info)
+        # 列表占位图在后台计算，每张图片只计算一次
+        enqueue_placeholder(db, info["file_hash"])
+        db.commit()
+        return file_path
     
-    # 保存文件
-    with open(file_path, "wb") as buffer:
-        # 重置文件指针到开头
-        file.file.seek(0)
-        shutil.copyfileobj(file.file, buffer)
+    # 数据库操作是同步的，同样放到线程池中执行，不阻塞事件循环
+    file_path = await run_in_threadpool(register)
     
     # 返回相对路径，以便前端可以访问
-    return {"filename": f"/assets/uploads/{today}/{file_name}"}
+    return {
+        "filename": file_path,
+        "hash": info["file_hash"],
+        "size": info["file_size"],
+        "width": info["width"],
+        "height": info["height"],
+    }
+
+# 批量上传图片 - 一次请求提交多张图片，按输入顺序返回每张图片的结果
+@router.post("/upload-images/batch")
+async def upload_images_batch(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db)
+):
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"单次最多上传 {MAX_BATCH_FILES} 张图片")
+    
+    upload_prefix = get_daily_upload_prefix()
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    
+    # 并发保存文件（限制并发数），单个文件失败不影响其他文件
+    async def save_one(upload: UploadFile):
+        async with semaphore:
+            try:
+                return await run_in_threadpool(save_upload_stream, upload.file, upload_prefix)
+            except HTTPException as e:
+                return e
+    
+    saved = await asyncio.gather(*(save_one(upload) for upload in files))
+    
+    # 数据库操作在同一个会话中顺序执行，同批次内相同内容的文件只登记一次
+    def register_all():
+        results = []
+        seen_hashes = {}
+        for index, info in enumerate(saved):
+            if isinstance(info, HTTPException):
+                results.append({"index": index, "error": info.detail, "status_code": info.status_code})
+                continue
+            
+            if info["file_hash"] in seen_hashes:
+                first = seen_hashes[info["file_hash"]]
+                results.append({**first, "index": index, "duplicate": True})
+                continue
+            
+            file_path, duplicate = register_upload(db, info)
+            enqueue_placeholder(db, info["file_hash"])
+            db.commit()
+            result = {
+                "index": index,
+                "filename": file_path,
+                "hash": info["file_hash"],
+                "size": info["file_size"],
+                "width": info["width"],
+                "height": info["height"],
+                "duplicate": duplicate,
+            }
+            seen_hashes[info["file_hash"]] = result
+            results.append(result)
+        return results
+    
+    # 同步的数据库操作放到线程池中执行，不阻塞事件循环
+    results = await run_in_threadpool(register_all)
+    return {"results": results}
+
+# 上传前按内容哈希检查服务器已有的图片，已有的图片直接引用其路径，无需再上传文件
+@router.post("/upload-images/check")
+def check_image_hashes(check: ImageHashCheck, db: Session = Depends(get_db)):
+    if len(check.hashes) > MAX_HASH_CHECK:
+        raise HTTPException(status_code=400, detail=f"单次最多检查 {MAX_HASH_CHECK} 个哈希")
+    
+    hashes = []
+    for file_hash in check.hashes:
+        file_hash = file_hash.lower()
+        if not SHA256_PATTERN.match(file_hash):
+            raise HTTPException(status_code=400, detail="无效的SHA-256哈希")
+        if file_hash not in hashes:
+            hashes.append(file_hash)
+    
+    # 一次查询命中哈希索引，返回值与上传接口的结果字段一致
+    assets = find_existing_assets(db, hashes)
+    known = {
+        file_hash: {
+            "filename": asset.path,
+            "hash": file_hash,
+            "size": asset.file_size,
+            "width": asset.width,
+            "height": asset.height,
+        }
+        for file_hash, asset in assets.items()
+    }
+    return {"known": known, "missing": [file_hash for file_hash in hashes if file_hash not in known]}
 
 # 补充资源图片 - 匿名用户可提交
 @router.put("/{resource_id}/supplement", response_model=ResourceSchema)
@@ -857,12 +717,22 @@ async def supplement_resource(
     new_images = supplement.get('images', [])
     new_links = supplement.get('links', {})
     
-    # 确保links格式正确
+    # 确保links格式正确，并去掉已属于已审批资源（包括本资源）的链接，避免管理员重复审核
+    skipped = []
     if new_links:
-        print(f"Supplement submitted with links: {new_links}")
+        existing_urls = find_existing_urls(db, (link["url"] for _, link in links_from_dict(new_links)))
+        filtered_links = {}
+        for category, link in links_from_dict(new_links):
+            if link["url"] in existing_urls:
+                skipped.append(link["url"])
+            else:
+                filtered_links.setdefault(category, []).append(link)
+        new_links = filtered_links
+        logger.debug("Supplement submitted with %d link categories", len(new_links))
     else:
         new_links = {}
-        print("No links provided in supplement submission")
+    
+    stats_before = resource_stats(db_resource)
     
     # 在原资源上添加supplement字段，存储待审批的补充内容
     # 如果已经有supplement字段，合并新的补充内容
@@ -876,28 +746,14 @@ async def supplement_resource(
         'status': ResourceStatus.PENDING,  # 补充内容待审批
         'submission_date': datetime.now().isoformat()
     }
+    apply_resource_change(db, stats_before, resource_stats(db_resource))
+    event_bus.publish(db, "review", "supplement_submitted", resource_id=db_resource.id, title=db_resource.title)
     
     db.commit()
     db.refresh(db_resource)
     
-    # 显式将SQLAlchemy模型转换为Pydantic模型
-    return ResourceSchema(
-        id=db_resource.id,
-        title=db_resource.title,
-        title_en=db_resource.title_en,
-        description=db_resource.description,
-        resource_type=db_resource.resource_type,
-        images=db_resource.images,
-        poster_image=db_resource.poster_image,
-        links=db_resource.links,
-        status=db_resource.status,
-        supplement=db_resource.supplement,
-        original_resource_id=db_resource.original_resource_id,
-        is_supplement_approval=db_resource.is_supplement_approval,
-        likes_count=db_resource.likes_count,
-        created_at=db_resource.created_at,
-        updated_at=db_resource.updated_at
-    )
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse(resource_to_dict(db_resource, get_resource_links(db, db_resource), skipped_links=skipped))
 
 # 获取待审批的补充内容 - 用于审批界面
 @router.get("/{resource_id}/supplement", response_model=dict)
@@ -950,57 +806,53 @@ def get_pending_supplement_resources(
     end = skip + limit
     paginated_resources = pending_resources[start:end]
     
-    # 显式将SQLAlchemy模型列表转换为Pydantic模型列表
-    result = []
-    for resource in paginated_resources:
-        result.append(ResourceSchema(
-            id=resource.id,
-            title=resource.title,
-            title_en=resource.title_en,
-            description=resource.description,
-            resource_type=resource.resource_type,
-            images=resource.images,
-            poster_image=resource.poster_image,
-            links=resource.links,
-            status=resource.status,
-            supplement=resource.supplement,
-            original_resource_id=resource.original_resource_id,
-            is_supplement_approval=resource.is_supplement_approval,
-            likes_count=resource.likes_count,
-            created_at=resource.created_at,
-            updated_at=resource.updated_at
-        ))
-    
-    return result
+    # 一次查询加载本页所有资源的链接
+    links_map = get_links_map(db, [resource.id for resource in paginated_resources])
+    
+    # 直接从ORM行编码JSON，不再构造并校验Pydantic模型
+    return JSONBytesResponse([resource_to_dict(resource, links_from_map(resource, links_map)) for resource in paginated_resources])
 
 # 喜欢资源 API 端点
 @router.post("/{resource_id}/like")
-def like_resource(resource_id: int, db: Session = Depends(get_db)):
+def like_resource(resource_id: int, request: Request, db: Session = Depends(get_db)):
     """
-    增加资源的喜欢计数
+    增加资源的喜欢计数，同一客户端对同一资源只计一次
     """
     resource = db.query(Resource).filter(Resource.id == resource_id).first()
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
     
+    # 在数据库中的布谷鸟过滤器里以 O(1) 检查该客户端是否已喜欢过，与喜欢数在同一事务中提交
+    if not like_filter.add_if_absent(db, client_key(request, resource_id)):
+        return {"success": True, "likes_count": resource.likes_count, "already_liked": True}
+    
+    # 过滤器已取得写锁，重新读取喜欢数，避免覆盖其他进程刚提交的计数
+    db.refresh(resource)
     resource.likes_count += 1
+    record_like(db, resource_id, 1)
+    adjust_stats(db, {STAT_LIKES_TOTAL: 1})
+    event_bus.publish(db, "likes", "likes_changed", resource_id=resource_id, likes_count=resource.likes_count)
     db.commit()
     
     return {"success": True, "likes_count": resource.likes_count}
 
 # 取消喜欢资源 API 端点
 @router.post("/{resource_id}/unlike")
-def unlike_resource(resource_id: int, db: Session = Depends(get_db)):
+def unlike_resource(resource_id: int, request: Request, db: Session = Depends(get_db)):
     """
-    减少资源的喜欢计数
+    减少资源的喜欢计数，只有该客户端之前喜欢过才会减少
     """
     resource = db.query(Resource).filter(Resource.id == resource_id).first()
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
     
-    if resource.likes_count > 0:
-        resource.likes_count -= 1
-    
-    db.commit()
+    if like_filter.remove_if_present(db, client_key(request, resource_id)):
+        db.refresh(resource)
+        if resource.likes_count > 0:
+            resource.likes_count -= 1
+            record_like(db, resource_id, -1)
+            adjust_stats(db, {STAT_LIKES_TOTAL: -1})
+        event_bus.publish(db, "likes", "likes_changed", resource_id=resource_id, likes_count=resource.likes_count)
+        db.commit()
     
     return {"success": True, "likes_count": resource.likes_count} 
\ No newline at end of file
@@ -0,0 +1,167 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+import os
+import uuid
+from datetime import datetime
+from ..models.database import get_db
+from ..models.models import UploadSession
+from ..schemas.schemas import UploadSessionCreate, UploadSessionStatus
+from ..utils.image_utils import calculate_file_hash
+from ..utils.job_handlers import enqueue_placeholder
+from ..utils.upload_utils import (
+    save_upload_stream, get_daily_upload_prefix, register_upload,
+    get_upload_session_file, expire_upload_sessions,
+    MAX_IMAGE_SIZE, MAX_CHUNK_SIZE, UPLOAD_SESSION_TTL, UPLOAD_SESSION_DIR, SHA256_PATTERN
+)
+
+# 断点续传：创建会话 -> 按偏移量上传分片 -> 完成并校验哈希
+router = APIRouter(
+    prefix="/api/uploads",
+    tags=["uploads"],
+)
+
+def _get_active_session(db: Session, upload_id: str):
+    upload_session = db.query(UploadSession).filter(UploadSession.id == upload_id).first()
+    if not upload_session or upload_session.expires_at < datetime.now():
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return upload_session
+
+def _session_status(upload_session: UploadSession):
+    return UploadSessionStatus(
+        upload_id=upload_session.id,
+        offset=upload_session.received_size,
+        size=upload_session.total_size,
+        chunk_size=MAX_CHUNK_SIZE,
+        expires_at=upload_session.expires_at
+    )
+
+# 创建上传会话
+@router.post("/", response_model=UploadSessionStatus)
+def create_upload_session(upload: UploadSessionCreate, db: Session = Depends(get_db)):
+    if upload.size <= 0:
+        raise HTTPException(status_code=400, detail="文件大小无效")
+    if upload.size > MAX_IMAGE_SIZE:
+        raise HTTPException(status_code=413, detail=f"图片大小不能超过 {MAX_IMAGE_SIZE // (1024 * 1024)}MB")
+    file_hash = upload.sha256.lower()
+    if not SHA256_PATTERN.match(file_hash):
+        raise HTTPException(status_code=400, detail="无效的SHA-256哈希")
+    
+    # 顺便清理已过期的会话
+    expire_upload_sessions(db)
+    
+    upload_session = UploadSession(
+        id=uuid.uuid4().hex,
+        filename=upload.filename,
+        total_size=upload.size,
+        file_hash=file_hash,
+        received_size=0,
+        expires_at=datetime.now() + UPLOAD_SESSION_TTL
+    )
+    os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+    open(get_upload_session_file(upload_session.id), "wb").close()
+    
+    db.add(upload_session)
+    db.commit()
+    db.refresh(upload_session)
+    return _session_status(upload_session)
+
+# 查询上传进度，断线重连后客户端据此从正确的偏移量继续上传
+@router.get("/{upload_id}", response_model=UploadSessionStatus)
+def get_upload_session(upload_id: str, db: Session = Depends(get_db)):
+    return _session_status(_get_active_session(db, upload_id))
+
+# 上传分片 - 请求体为分片的原始字节，offset 必须等于已接收的字节数
+@router.put("/{upload_id}", response_model=UploadSessionStatus)
+async def upload_chunk(upload_id: str, offset: int, request: Request, db: Session = Depends(get_db)):
+    upload_session = _get_active_session(db, upload_id)
+    if offset != upload_session.received_size:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "分片偏移量不匹配", "offset": upload_session.received_size}
+        )
+    
+    partial_file = get_upload_session_file(upload_id)
+    remaining = upload_session.total_size - offset
+    received = 0
+    try:
+        with open(partial_file, "r+b") as buffer:
+            # 丢弃上一次中断时可能残留的未确认数据
+            buffer.seek(offset)
+            buffer.truncate()
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MAX_CHUNK_SIZE or received > remaining:
+                    raise HTTPException(status_code=413, detail="分片超出允许的大小")
+                buffer.write(chunk)
+    except HTTPException:
+        # 超出大小的分片整体作废，偏移量保持不变
+        with open(partial_file, "r+b") as buffer:
+            buffer.truncate(offset)
+        raise
+    
+    # 只有完整写入的分片才推进偏移量；连接中断时客户端重新发送该分片即可
+    upload_session.received_size = offset + received
+    upload_session.expires_at = datetime.now() + UPLOAD_SESSION_TTL
+    db.commit()
+    db.refresh(upload_session)
+    return _session_status(upload_session)
+
+# 完成上传 - 校验SHA-256后按普通上传的方式保存图片
+@router.post("/{upload_id}/complete")
+async def complete_upload(upload_id: str, db: Session = Depends(get_db)):
+    upload_session = _get_active_session(db, upload_id)
+    if upload_session.received_size != upload_session.total_size:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "文件尚未上传完整", "offset": upload_session.received_size}
+        )
+    
+    partial_file = get_upload_session_file(upload_id)
+    
+    def verify_and_save():
+        # 与普通上传使用相同的哈希算法（calculate_file_hash），哈希一致才保存
+        with open(partial_file, "rb") as source:
+            file_hash = calculate_file_hash(source)
+            if file_hash != upload_session.file_hash:
+                return None
+            return save_upload_stream(source, get_daily_upload_prefix())
+    
+    try:
+        info = await run_in_threadpool(verify_and_save)
+    finally:
+        # 无论成功与否，会话都已结束
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+        db.delete(upload_session)
+        db.commit()
+    
+    if info is None:
+        raise HTTPException(status_code=422, detail="文件哈希校验失败，请重新上传")
+    
+    def register():
+        file_path, _ = register_upload(db, info)
+        # 列表占位图在后台计算，每张图片只计算一次
+        enqueue_placeholder(db, info["file_hash"])
+        db.commit()
+        return file_path
+    
+    # 同步的数据库操作放到线程池中执行，不阻塞事件循环
+    file_path = await run_in_threadpool(register)
+    return {
+        "filename": file_path,
+        "hash": info["file_hash"],
+        "size": info["file_size"],
+        "width": info["width"],
+        "height": info["height"],
+    }
+
+# 取消上传会话
+@router.delete("/{upload_id}", status_code=204)
+def abort_upload(upload_id: str, db: Session = Depends(get_db)):
+    upload_session = _get_active_session(db, upload_id)
+    partial_file = get_upload_session_file(upload_id)
+    if os.path.exists(partial_file):
+        os.remove(partial_file)
+    db.delete(upload_session)
+    db.commit()
@@ -29,14 +29,31 @@ class Resource(ResourceBase):
     status: ResourceStatus
     supplement: Optional[Dict] = None  # 补充内容，包含图片和链接
     original_resource_id: Optional[int] = None  # 原始资源ID
-    is_supplement_approval: Optional[bool] = False  # 标记是否为补充资源审批记录
     likes_count: int = 0  # 资源被喜欢的次数
+    hot_score: float = 0  # 按时间衰减的喜欢热度，只用于资源之间比较排序
+    skipped_links: List[str] = []  # 提交或更新时因已属于其他已审批资源而被忽略的链接
+    poster_placeholder: Optional[Dict[str, Any]] = None  # 列表接口返回的海报占位图：blurhash、color、width、height
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class ApprovalEvent(BaseModel):
+    id: int
+    resource_id: int
+    event_type: str  # initial（初始审批）或 supplement（补充内容审批）
+    status: ResourceStatus
+    title: Optional[str] = None  # 审批时的资源标题
+    resource_type: Optional[str] = None  # 审批时的资源类型
+    notes: Optional[str] = None  # 管理员审批备注
+    images: Optional[List[str]] = None  # 本次审批通过的图片
+    links: Optional[Dict] = None  # 补充审批时提交的链接
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class ResourceApproval(BaseModel):
     status: ResourceStatus
     field_approvals: Optional[Dict[str, bool]] = None
@@ -96,4 +113,36 @@ class SupplementSchema(BaseModel):
     approval_notes: Optional[str] = None  # 审批备注
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class UploadSessionCreate(BaseModel):
+    filename: Optional[str] = None  # 原始文件名，仅作记录
+    size: int  # 文件总字节数
+    sha256: str  # 文件内容的SHA-256哈希（十六进制）
+
+class ImageHashCheck(BaseModel):
+    hashes: List[str]  # 客户端计算的图片SHA-256哈希（十六进制）
+
+class UploadSessionStatus(BaseModel):
+    upload_id: str
+    offset: int  # 已接收的字节数，客户端应从该偏移量继续上传
+    size: int
+    chunk_size: int  # 单个分片的最大字节数
+    expires_at: datetime
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    payload: Optional[Dict[str, Any]] = None
+    idempotency_key: Optional[str] = None
+    status: str  # queued、running、succeeded、failed
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,142 @@
+import logging
+from datetime import datetime
+from sqlalchemy import func
+from ..models.models import Resource, ResourceStatus, ImageAsset, StatCounter
+
+logger = logging.getLogger(__name__)
+
+# 定期任务全量校正统计值的间隔（秒），多进程部署时每个周期只执行一次
+STATS_RECONCILE_SECONDS = 3600
+
+STAT_RESOURCES_PENDING = "resources_pending"
+STAT_RESOURCES_APPROVED = "resources_approved"
+STAT_RESOURCES_REJECTED = "resources_rejected"
+STAT_SUPPLEMENTS_PENDING = "supplements_pending"
+STAT_LIKES_TOTAL = "likes_total"
+STAT_STORAGE_BYTES = "storage_bytes"
+
+STAT_NAMES = (
+    STAT_RESOURCES_PENDING, STAT_RESOURCES_APPROVED, STAT_RESOURCES_REJECTED,
+    STAT_SUPPLEMENTS_PENDING, STAT_LIKES_TOTAL, STAT_STORAGE_BYTES,
+)
+
+_STATUS_STATS = {
+    ResourceStatus.PENDING: STAT_RESOURCES_PENDING,
+    ResourceStatus.APPROVED: STAT_RESOURCES_APPROVED,
+    ResourceStatus.REJECTED: STAT_RESOURCES_REJECTED,
+}
+
+
+def _has_pending_supplement(supplement):
+    return isinstance(supplement, dict) and supplement.get("status") == ResourceStatus.PENDING
+
+
+def resource_stats(resource):
+    """
+    What one resource contributes to the counters in its current state.
+    Take it before and after a change and pass both to
+    apply_resource_change.
+    """
+    stats = {STAT_LIKES_TOTAL: resource.likes_count or 0}
+    if resource.status in _STATUS_STATS:
+        stats[_STATUS_STATS[resource.status]] = 1
+    if _has_pending_supplement(resource.supplement):
+        stats[STAT_SUPPLEMENTS_PENDING] = 1
+    return stats
+
+
+def adjust_stats(db, deltas):
+    """
+    Add deltas ({name: amount}) to the counters with in-place updates, in the
+    caller's transaction. The caller commits.
+    """
+    for name, delta in deltas.items():
+        if delta:
+            db.query(StatCounter).filter(StatCounter.name == name).update(
+                {StatCounter.value: StatCounter.value + delta, StatCounter.updated_at: datetime.now()},
+                synchronize_session=False
+            )
+
+
+def apply_resource_change(db, before, after):
+    """
+    Adjust the counters by the difference between two resource_stats
+    snapshots; pass {} as before for a new resource or as after for a
+    deleted one. The caller commits.
+    """
+    adjust_stats(db, {name: after.get(name, 0) - before.get(name, 0) for name in set(before) | set(after)})
+
+
+def compute_stats(db):
+    """
+    Count everything from the source tables (full scans).
+    """
+    stats = dict.fromkeys(STAT_NAMES, 0)
+    for status, count in db.query(Resource.status, func.count(Resource.id)).group_by(Resource.status):
+        if status in _STATUS_STATS:
+            stats[_STATUS_STATS[status]] = count
+    stats[STAT_SUPPLEMENTS_PENDING] = sum(
+        1 for (supplement,) in db.query(Resource.supplement).filter(Resource.supplement.isnot(None))
+        if _has_pending_supplement(supplement)
+    )
+    stats[STAT_LIKES_TOTAL] = db.query(func.coalesce(func.sum(Resource.likes_count), 0)).scalar()
+    stats[STAT_STORAGE_BYTES] = db.query(func.coalesce(func.sum(ImageAsset.file_size), 0)).scalar()
+    return stats
+
+
+def reconcile_stats(db):
+    """
+    Recompute every counter from the source tables and overwrite the stored
+    values, creating missing rows. Returns {name: stored - actual} for the
+    counters that had drifted.
+    """
+    now = datetime.now()
+    # 先写统计表取得写锁，统计期间其他请求的增量更新会等待本事务提交，不会丢失
+    counters = db.query(StatCounter).filter(StatCounter.name.in_(STAT_NAMES))
+    counters.update({StatCounter.updated_at: now}, synchronize_session=False)
+    stored = {counter.name: counter for counter in counters.all()}
+    actual = compute_stats(db)
+
+    drift = {}
+    for name, value in actual.items():
+        counter = stored.get(name)
+        if counter is None:
+            db.add(StatCounter(name=name, value=value, updated_at=now))
+            continue
+        if counter.value != value:
+            drift[name] = counter.value - value
+            counter.value = value
+    db.commit()
+    if drift:
+        logger.warning("统计值与实际数据不一致，已校正", extra={"drift": drift})
+    return drift
+
+
+def ensure_stat_counters(db):
+    """
+    Create and fill the counters on a database that has none yet (new
+    database or right after the migration).
+    """
+    if db.query(StatCounter).filter(StatCounter.name.in_(STAT_NAMES)).count() < len(STAT_NAMES):
+        reconcile_stats(db)
+
+
+def get_admin_stats(db):
+    """
+    Read the dashboard counters: a primary-key scan of a handful of rows.
+    """
+    counters = db.query(StatCounter).filter(StatCounter.name.in_(STAT_NAMES)).all()
+    values = {counter.name: counter.value for counter in counters}
+    updated = [counter.updated_at for counter in counters if counter.updated_at]
+    return {
+        "resources": {
+            "pending": values.get(STAT_RESOURCES_PENDING, 0),
+            "approved": values.get(STAT_RESOURCES_APPROVED, 0),
+            "rejected": values.get(STAT_RESOURCES_REJECTED, 0),
+        },
+        "pending_supplements": values.get(STAT_SUPPLEMENTS_PENDING, 0),
+        "likes_total": values.get(STAT_LIKES_TOTAL, 0),
+        "storage_bytes": values.get(STAT_STORAGE_BYTES, 0),
+        "updated_at": max(updated) if updated else None,
+    }
+
@@ -13,6 +13,10 @@ from ..schemas.schemas import TokenData
 SECRET_KEY = "your-secret-key-replace-in-production"  # 生产环境应该是安全的密钥
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 一周
+# 事件流票据：EventSource 无法设置请求头，凭据只能放在地址中（会出现在访问日志里），
+# 因此不传登录令牌，而是换取只能订阅事件流、60秒后过期的票据
+EVENT_TICKET_PURPOSE = "event_stream"
+EVENT_TICKET_EXPIRE_SECONDS = 60
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -44,6 +48,25 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_event_ticket(user: User):
+    return create_access_token(
+        {"sub": user.username, "purpose": EVENT_TICKET_PURPOSE},
+        expires_delta=timedelta(seconds=EVENT_TICKET_EXPIRE_SECONDS)
+    )
+
+def get_user_from_token(db: Session, token: str, purpose: Optional[str] = None):
+    """
+    解析令牌并返回对应用户，令牌无效时返回 None。purpose 为空时只接受登录令牌，否则只接受该用途的票据
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None or payload.get("purpose") != purpose:
+        return None
+    return db.query(User).filter(User.username == username).first()
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -53,7 +76,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        # 票据只能用于其用途，不能当作登录令牌
+        if username is None or payload.get("purpose") is not None:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
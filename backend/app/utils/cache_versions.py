@@ -0,0 +1,54 @@
+import threading
+import time
+from ..models.database import dialect_insert
+from ..models.models import CacheVersion
+
+# 各进程最多每隔这么多秒读取一次版本号，其他进程提交的修改最多延迟这么久反映到本进程的缓存
+VERSION_CHECK_SECONDS = 1.0
+
+# 已审批资源的标题、类型变化，对应标题索引和前缀索引
+SEARCH_INDEX_VERSION = "search_index"
+# 公开资源列表中任何字段的变化（审批、修改、删除、图片路径、占位图），对应资源列表缓存
+PUBLIC_LIST_VERSION = "public_list"
+
+
+def bump_versions(db, *names):
+    """
+    Increment the named versions in the caller's transaction, so every
+    process drops its cached copy once the change is committed. The caller
+    commits.
+    """
+    for name in names:
+        statement = dialect_insert(db, CacheVersion).values(name=name, version=1)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[CacheVersion.name],
+            set_={"version": CacheVersion.version + 1}
+        ))
+
+
+class VersionWatch:
+    """
+    Follows one named version for a per-process cache. changed() reads the
+    version at most every VERSION_CHECK_SECONDS and reports whether it has
+    moved since the previous read, i.e. some process committed a change the
+    cache does not reflect. Read the version before the data it guards, so
+    a change committed in between is caught on the next check.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._seen = None
+        self._checked_at = None
+
+    def changed(self, db):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < VERSION_CHECK_SECONDS:
+                return False
+            self._checked_at = now
+        version = db.query(CacheVersion.version).filter(CacheVersion.name == self.name).scalar() or 0
+        with self._lock:
+            changed = self._seen is not None and version != self._seen
+            self._seen = version
+        return changed
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from ..models.database import SessionLocal
+from ..models.models import Event
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多缓存的未发送事件数，客户端读取过慢时丢弃新事件
+SUBSCRIBER_QUEUE_SIZE = 100
+# 没有事件时发送注释行的间隔（秒），防止代理因空闲断开连接
+KEEPALIVE_SECONDS = 15
+# 有订阅连接时读取新事件的间隔（秒），事件最多延迟这么久送达
+EVENT_POLL_SECONDS = 1.0
+# 一次最多读取的事件数
+EVENT_POLL_BATCH = 500
+# 事件保留时间，之后由 event_prune 任务删除
+EVENT_RETENTION = timedelta(minutes=10)
+EVENT_PRUNE_SECONDS = 600
+
+# 事件频道：likes 为公开的喜欢数变化，review 为仅管理员可见的审批队列变化
+CHANNELS = ("likes", "review")
+
+
+class Subscription:
+    def __init__(self, channels, resource_id=None):
+        self.channels = set(channels)
+        self.resource_id = resource_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def wants(self, event):
+        return self.resource_id is None or event.get("resource_id") == self.resource_id
+
+
+class EventBus:
+    """
+    Pub/sub for SSE connections across worker processes. publish() adds
+    the event to the events table in the caller's transaction; while a
+    process has subscribers it polls the table by id and fans new events
+    out on its event loop with put_nowait, so an idle connection costs one
+    queue and one waiting task.
+    """
+
+    def __init__(self):
+        self._subscribers = {channel: set() for channel in CHANNELS}
+        self._lock = threading.Lock()
+        self._poller = None
+        self._last_id = None
+
+    def subscribe(self, channels, resource_id=None):
+        subscription = Subscription(channels, resource_id)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+            loop = asyncio.get_running_loop()
+            if self._poller is None or self._poller.done() or self._poller.get_loop() is not loop:
+                self._last_id = None
+                self._poller = loop.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._subscribers.values()))
+
+    def publish(self, db, channel, event_type, **data):
+        """
+        Add a compact event for every subscriber of channel to the caller's
+        transaction. It is delivered, by every process, once the caller
+        commits, and dropped with a rollback.
+        """
+        now = datetime.now()
+        event = {"type": event_type, "time": now.isoformat(timespec="seconds"), **data}
+        db.add(Event(channel=channel, payload=event, created_at=now))
+
+    def _fetch(self):
+        db = SessionLocal()
+        try:
+            if self._last_id is None:
+                # 只推送订阅之后产生的事件
+                self._last_id = db.query(Event.id).order_by(Event.id.desc()).limit(1).scalar() or 0
+                return []
+            rows = db.query(Event.id, Event.channel, Event.payload).filter(Event.id > self._last_id)\
+                .order_by(Event.id.asc()).limit(EVENT_POLL_BATCH).all()
+            if rows:
+                self._last_id = rows[-1].id
+            return rows
+        finally:
+            db.close()
+
+    async def _poll(self):
+        while True:
+            with self._lock:
+                if not any(self._subscribers.values()):
+                    # 没有订阅连接时停止读取，下次订阅时从最新的事件开始
+                    self._poller = None
+                    self._last_id = None
+                    return
+            try:
+                for row in await asyncio.to_thread(self._fetch):
+                    self._dispatch(row.channel, row.payload)
+            except Exception:
+                logger.exception("读取推送事件出错")
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    def _dispatch(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.dropped += 1
+
+
+def prune_events(db, now=None):
+    """
+    Delete events older than EVENT_RETENTION. Returns the number deleted.
+    """
+    now = now or datetime.now()
+    deleted = db.query(Event).filter(Event.created_at < now - EVENT_RETENTION).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+async def stream_events(subscription, request):
+    """
+    Yield SSE frames for a subscription until the client disconnects.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    finally:
+        event_bus.unsubscribe(subscription)
+
+
+event_bus = EventBus()
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from ..models.database import SessionLocal, dialect_insert
+from ..models.models import Resource, LikeBucket, RankingState
+
+logger = logging.getLogger(__name__)
+
+# 热度半衰期：一次喜欢对热度的贡献每过这么久减半
+HOT_HALF_LIFE = timedelta(hours=48)
+# 超过该时间且已计入热度的计数桶会被删除，其贡献已不足最初的1%
+HOT_BUCKET_RETENTION = timedelta(days=14)
+# 后台重新计算热度的间隔（秒）
+HOT_RECOMPUTE_SECONDS = 300
+HOT_STATE_NAME = "hot"
+# 热度按基准时间存储，基准时间落后这么多个半衰期时前移一次，避免数值溢出
+HOT_EPOCH_REBASE_HALF_LIVES = 64
+
+
+def bucket_start(moment):
+    # 喜欢事件按小时聚合到计数桶中
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def decay_factor(elapsed):
+    return 0.5 ** (elapsed / HOT_HALF_LIFE)
+
+
+def record_like(db, resource_id, delta):
+    """
+    Add delta (+1 like / -1 unlike) to the resource's current hourly
+    bucket with a single upsert. The caller commits.
+    """
+    statement = dialect_insert(db, LikeBucket).values(
+        resource_id=resource_id,
+        bucket_start=bucket_start(datetime.now()),
+        delta=delta,
+        applied=0
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[LikeBucket.resource_id, LikeBucket.bucket_start],
+        set_={"delta": LikeBucket.delta + delta}
+    ))
+
+
+def delete_like_buckets(db, resource_id):
+    db.query(LikeBucket).filter(LikeBucket.resource_id == resource_id).delete(synchronize_session=False)
+
+
+def _update_scores(query, score):
+    # 热度不是资源内容的修改，保留 updated_at
+    query.update({Resource.hot_score: score, Resource.updated_at: Resource.updated_at}, synchronize_session=False)
+
+
+def recompute_hot_scores(db, now=None):
+    """
+    Bring resources.hot_score up to date. hot_score is stored relative to a
+    fixed epoch: each like bucket adds delta * 2^((bucket_start - epoch) /
+    HOT_HALF_LIFE). Decay is the same factor for every resource, so the
+    ordering is the one of the decayed scores and a run only writes the
+    resources with like buckets not yet applied (buckets keep filling during
+    their hour). Every HOT_EPOCH_REBASE_HALF_LIVES half-lives the epoch moves
+    forward by a whole number of half-lives and the scores are scaled down
+    once, by an exact power of two. The first run rebuilds all scores from
+    the retained buckets.
+
+    The state row is advanced with a compare-and-set before anything else,
+    so when several workers run the job only one of them applies a given
+    interval. Returns {"mode", "updated"} or None when another worker won.
+    """
+    now = now or datetime.now()
+    state = db.query(RankingState).filter(RankingState.name == HOT_STATE_NAME).first()
+    if state is None:
+        epoch = bucket_start(now)
+        db.add(RankingState(name=HOT_STATE_NAME, computed_at=now, epoch=epoch))
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return None
+        _update_scores(db.query(Resource).filter(Resource.hot_score != 0), 0)
+        db.query(LikeBucket).update({LikeBucket.applied: 0}, synchronize_session=False)
+        mode = "rebuild"
+    else:
+        previous = state.computed_at
+        # 旧版本的热度是上次计算时的衰减值，相当于以上次计算时间为基准
+        epoch = state.epoch or previous
+        half_lives = int((now - epoch) / HOT_HALF_LIFE)
+        mode = "incremental"
+        if half_lives >= HOT_EPOCH_REBASE_HALF_LIVES:
+            epoch = epoch + HOT_HALF_LIFE * half_lives
+            mode = "rebase"
+        claimed = db.query(RankingState).filter(
+            RankingState.name == HOT_STATE_NAME,
+            RankingState.computed_at == previous
+        ).update({RankingState.computed_at: now, RankingState.epoch: epoch}, synchronize_session=False)
+        if not claimed:
+            db.rollback()
+            return None
+        if mode == "rebase":
+            _update_scores(db.query(Resource).filter(Resource.hot_score != 0), Resource.hot_score * 0.5 ** half_lives)
+
+    pending = db.query(LikeBucket).filter(LikeBucket.delta != LikeBucket.applied).all()
+    increments = {}
+    for bucket in pending:
+        weight = decay_factor(epoch - bucket.bucket_start)
+        increments[bucket.resource_id] = increments.get(bucket.resource_id, 0.0) + (bucket.delta - bucket.applied) * weight
+        bucket.applied = bucket.delta
+    for resource_id, increment in increments.items():
+        _update_scores(db.query(Resource).filter(Resource.id == resource_id), Resource.hot_score + increment)
+
+    db.query(LikeBucket).filter(
+        LikeBucket.bucket_start < now - HOT_BUCKET_RETENTION,
+        LikeBucket.delta == LikeBucket.applied
+    ).delete(synchronize_session=False)
+    db.commit()
+    return {"mode": mode, "updated": len(increments)}
+
+
+def _run_recompute():
+    db = SessionLocal()
+    try:
+        return recompute_hot_scores(db)
+    finally:
+        db.close()
+
+
+async def hot_ranking_loop():
+    """
+    Background task: recompute hot scores every HOT_RECOMPUTE_SECONDS.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(_run_recompute)
+        except Exception:
+            logger.exception("热度计算出错")
+        await asyncio.sleep(HOT_RECOMPUTE_SECONDS)
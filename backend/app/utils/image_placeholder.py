@@ -0,0 +1,181 @@
+import math
+import os
+from ..models.models import ImageAsset
+from .storage import storage, asset_key
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未安装时不生成占位图
+    Image = None
+
+# BlurHash 长边方向的分量数（短边按比例减少，最少3个），分量越多越清晰、字符串越长
+BLURHASH_COMPONENTS = 4
+# 计算前先缩小到该尺寸以内，占位图本身只有几个分量，无需原图精度
+PLACEHOLDER_SAMPLE_SIZE = 32
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _encode83(value, length):
+    return "".join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode_blurhash(pixels, width, height, x_components, y_components):
+    """
+    Encode RGB pixels (row-major list of (r, g, b)) as a BlurHash string,
+    following the reference implementation (github.com/woltapp/blurhash).
+    """
+    linear = [(_srgb_to_linear(r), _srgb_to_linear(g), _srgb_to_linear(b)) for r, g, b in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row_basis = cos_y[j][y]
+                offset = y * width
+                for x in range(width):
+                    basis = row_basis * cos_x[i][x]
+                    pr, pg, pb = linear[offset + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        maximum_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        maximum_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        quantised = [
+            max(0, min(18, int(_sign_pow(value / maximum_value, 0.5) * 9 + 9.5)))
+            for value in factor
+        ]
+        result += _encode83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+    return result
+
+
+def compute_placeholder(file_path):
+    """
+    Return (blurhash, dominant_color) for an image file, the colour as
+    #rrggbb, or None if the file cannot be decoded.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(file_path) as img:
+            img.draft("RGB", (PLACEHOLDER_SAMPLE_SIZE * 4, PLACEHOLDER_SAMPLE_SIZE * 4))
+            sample = img.convert("RGB")
+            sample.thumbnail((PLACEHOLDER_SAMPLE_SIZE, PLACEHOLDER_SAMPLE_SIZE), Image.BILINEAR)
+    except Exception:
+        return None
+
+    width, height = sample.size
+    # 分量数随宽高比分配，横图横向分量多，竖图纵向分量多
+    if width >= height:
+        x_components = BLURHASH_COMPONENTS
+        y_components = max(3, min(BLURHASH_COMPONENTS, round(BLURHASH_COMPONENTS * height / width)))
+    else:
+        y_components = BLURHASH_COMPONENTS
+        x_components = max(3, min(BLURHASH_COMPONENTS, round(BLURHASH_COMPONENTS * width / height)))
+    blurhash = encode_blurhash(list(sample.getdata()), width, height, x_components, y_components)
+
+    # 主色取量化为少数几种颜色后占比最大的一种
+    quantized = sample.quantize(colors=5)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return blurhash, f"#{r:02x}{g:02x}{b:02x}"
+
+
+def fill_placeholders(db, file_hash):
+    """
+    Make sure every image_assets row with this content hash has a
+    placeholder, decoding the image only when none of them has one yet.
+    Returns True if a placeholder is available (False for undecodable
+    images or an unknown hash).
+    """
+    assets = db.query(ImageAsset).filter(ImageAsset.file_hash == file_hash)\
+        .order_by(ImageAsset.id.asc()).all()
+    done = next((asset for asset in assets if asset.blurhash is not None), None)
+    if done:
+        placeholder = (done.blurhash, done.dominant_color)
+    else:
+        placeholder = None
+        for asset in assets:
+            with storage.open_local(asset_key(asset.path)) as file_path:
+                placeholder = compute_placeholder(file_path) if file_path else None
+            if placeholder:
+                break
+        # 无法解码的图片记为空字符串，避免反复重试
+        placeholder = placeholder or ("", None)
+
+    for asset in assets:
+        asset.blurhash, asset.dominant_color = placeholder
+    db.commit()
+    return bool(placeholder[0])
+
+
+def backfill_placeholders(db, batch_size=200):
+    """
+    Compute placeholders for images recorded before placeholders existed,
+    at most batch_size distinct images per call. Returns the number
+    processed.
+    """
+    hashes = [file_hash for (file_hash,) in db.query(ImageAsset.file_hash)
+              .filter(ImageAsset.blurhash.is_(None), ImageAsset.file_hash.isnot(None))
+              .distinct().limit(batch_size).all()]
+    for file_hash in hashes:
+        fill_placeholders(db, file_hash)
+    return len(hashes)
+
+
+def get_placeholders(db, paths):
+    """
+    Map image paths to {"blurhash", "color", "width", "height"} in one
+    query. Images are matched by the content hash in their file name, so
+    copies under imgs/ use the record made at upload.
+    """
+    hashes = {}
+    for path in paths:
+        if path:
+            hashes.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+    if not hashes:
+        return {}
+
+    rows = db.query(ImageAsset.file_hash, ImageAsset.blurhash, ImageAsset.dominant_color,
+                    ImageAsset.width, ImageAsset.height)\
+        .filter(ImageAsset.file_hash.in_(list(hashes)), ImageAsset.blurhash.isnot(None), ImageAsset.blurhash != "").all()
+    placeholders = {}
+    for file_hash, blurhash, color, width, height in rows:
+        for path in hashes[file_hash]:
+            placeholders[path] = {"blurhash": blurhash, "color": color, "width": width, "height": height}
+    return placeholders
@@ -0,0 +1,216 @@
+import hashlib
+import os
+from datetime import timedelta
+from sqlalchemy import func, or_, cast, String
+from ..models.models import Resource, ResourceStatus, ApprovalEvent, ResourceTypeTag, ResourceTypeLink
+from .job_queue import job_handler, enqueue_job
+from .image_utils import ensure_approved_image
+from .upload_gc import sweep_orphaned_uploads, GC_GRACE_PERIOD, GC_BATCH_SIZE
+from .upload_utils import expire_upload_sessions, register_asset_copy
+from .perceptual_hash import backfill_perceptual_hashes
+from .image_placeholder import fill_placeholders, backfill_placeholders
+from .resource_types import sync_resource_types
+from .title_index import title_index
+from .prefix_index import prefix_index
+from .search_snapshot import search_snapshot
+from .serialization import public_list_cache
+from .cache_versions import bump_versions, SEARCH_INDEX_VERSION, PUBLIC_LIST_VERSION
+from .admin_stats import reconcile_stats
+from .event_bus import prune_events
+
+JOB_PROMOTE_IMAGES = "promote_images"
+JOB_GC_SWEEP = "gc_sweep"
+JOB_PHASH_BACKFILL = "phash_backfill"
+JOB_REINDEX = "reindex"
+JOB_IMAGE_PLACEHOLDER = "image_placeholder"
+JOB_PLACEHOLDER_BACKFILL = "placeholder_backfill"
+JOB_STATS_RECONCILE = "stats_reconcile"
+JOB_UPLOAD_SESSION_CLEANUP = "upload_session_cleanup"
+JOB_SEARCH_SNAPSHOT_RECONCILE = "search_snapshot_reconcile"
+JOB_PROMOTION_SWEEP = "promotion_sweep"
+JOB_EVENT_PRUNE = "event_prune"
+
+# 查找图片仍在 uploads 目录中的已审批资源并为其入队复制任务的间隔（秒）
+PROMOTION_SWEEP_SECONDS = 3600
+
+
+def _pending_upload_images(resource):
+    paths = [img for img in (resource.images or []) if isinstance(img, str) and "uploads" in img]
+    if resource.poster_image and "uploads" in resource.poster_image:
+        paths.append(resource.poster_image)
+    return sorted(set(paths))
+
+
+def enqueue_image_promotion(db, resource):
+    """
+    Queue copying an approved resource's images out of the uploads area
+    into imgs/<resource_id>. The idempotency key covers the set of paths,
+    so repeated requests for the same images share one job. Returns the
+    job, or None when nothing is left in uploads.
+    """
+    if resource.status != ResourceStatus.APPROVED:
+        return None
+    paths = _pending_upload_images(resource)
+    if not paths:
+        return None
+    fingerprint = hashlib.sha1("\n".join(paths).encode("utf-8")).hexdigest()[:16]
+    return enqueue_job(
+        db, JOB_PROMOTE_IMAGES, {"resource_id": resource.id},
+        idempotency_key=f"{JOB_PROMOTE_IMAGES}:{resource.id}:{fingerprint}"
+    )
+
+
+def enqueue_placeholder(db, file_hash):
+    """
+    Queue computing the placeholder of an image. Keyed by content hash, so
+    each image is decoded once however often it is uploaded or approved.
+    """
+    return enqueue_job(
+        db, JOB_IMAGE_PLACEHOLDER, {"file_hash": file_hash},
+        idempotency_key=f"{JOB_IMAGE_PLACEHOLDER}:{file_hash}"
+    )
+
+
+def enqueue_stats_reconcile(db):
+    """
+    Queue a full recount of the admin dashboard counters.
+    """
+    return enqueue_job(db, JOB_STATS_RECONCILE)
+
+
+@job_handler(JOB_PROMOTE_IMAGES)
+def promote_images(db, resource_id):
+    """
+    Copy the resource's images that still point at the uploads area to
+    imgs/<resource_id> and rewrite the paths on the resource and its
+    approval events. Images whose file no longer exists keep their path.
+    """
+    resource = db.query(Resource).filter(Resource.id == resource_id).first()
+    if resource is None or resource.status != ResourceStatus.APPROVED:
+        return {"promoted": 0, "missing": []}
+
+    moved = {}
+    missing = []
+    for img_path in _pending_upload_images(resource):
+        new_path = ensure_approved_image(resource_id, img_path)
+        if new_path:
+            moved[img_path] = new_path
+        else:
+            missing.append(img_path)
+
+    if moved:
+        # 副本单独登记，uploads 中的原文件被清理后仍能按哈希找到图片信息
+        for img_path, new_path in moved.items():
+            register_asset_copy(db, img_path, new_path)
+        resource.images = [moved.get(img, img) for img in (resource.images or [])]
+        resource.poster_image = moved.get(resource.poster_image, resource.poster_image)
+        # 审批记录中的图片快照同样指向新路径，uploads 中的副本之后会被清理
+        for event in db.query(ApprovalEvent).filter(ApprovalEvent.resource_id == resource_id):
+            if event.images and any(img in moved for img in event.images):
+                event.images = [moved.get(img, img) for img in event.images]
+        search_snapshot.record_resource(db, resource)
+        bump_versions(db, PUBLIC_LIST_VERSION)
+        db.commit()
+        public_list_cache.invalidate()
+
+    # 早于占位图功能上传的图片在审批时补算
+    for img_path in moved:
+        enqueue_placeholder(db, os.path.splitext(os.path.basename(img_path))[0])
+    return {"promoted": len(moved), "missing": missing}
+
+
+@job_handler(JOB_PROMOTION_SWEEP)
+def promotion_sweep(db):
+    """
+    Queue promotion for approved resources whose images still point at the
+    uploads area: ones approved before promotion ran as a job, and ones whose
+    promotion job failed (enqueue_job queues a failed key again).
+    """
+    resources = db.query(Resource).filter(
+        Resource.status == ResourceStatus.APPROVED,
+        or_(cast(Resource.images, String).like("%uploads%"), Resource.poster_image.like("%uploads%"))
+    ).all()
+    for resource in resources:
+        enqueue_image_promotion(db, resource)
+    return {"resources": len(resources)}
+
+
+@job_handler(JOB_IMAGE_PLACEHOLDER)
+def image_placeholder(db, file_hash):
+    ready = fill_placeholders(db, file_hash)
+    if ready:
+        # 列表缓存中的占位图字段随之更新（占位图已提交，其他进程看到新版本号时能读到）
+        bump_versions(db, PUBLIC_LIST_VERSION)
+        db.commit()
+        public_list_cache.invalidate()
+    return {"ready": ready}
+
+
+@job_handler(JOB_PLACEHOLDER_BACKFILL)
+def placeholder_backfill(db, batch_size=200):
+    processed = backfill_placeholders(db, batch_size)
+    if processed:
+        bump_versions(db, PUBLIC_LIST_VERSION)
+        db.commit()
+        public_list_cache.invalidate()
+    return {"processed": processed}
+
+
+@job_handler(JOB_GC_SWEEP)
+def gc_sweep(db, grace_hours=GC_GRACE_PERIOD.total_seconds() / 3600, batch_size=GC_BATCH_SIZE):
+    report = sweep_orphaned_uploads(db, dry_run=False, grace_period=timedelta(hours=grace_hours), batch_size=batch_size)
+    # 结果中只保留统计数字
+    report.pop("files", None)
+    return report
+
+
+@job_handler(JOB_UPLOAD_SESSION_CLEANUP)
+def upload_session_cleanup(db):
+    return {"expired": expire_upload_sessions(db)}
+
+
+@job_handler(JOB_EVENT_PRUNE)
+def event_prune(db):
+    return {"deleted": prune_events(db)}
+
+
+@job_handler(JOB_PHASH_BACKFILL)
+def phash_backfill(db, batch_size=200):
+    return {"processed": backfill_perceptual_hashes(db, batch_size)}
+
+
+@job_handler(JOB_REINDEX)
+def reindex(db):
+    """
+    Rebuild the resource type links, counters and stored search snapshot
+    from the resources table, then the in-memory search indexes of the
+    process running the job (the other processes rebuild theirs when they
+    see the bumped versions).
+    """
+    resources = db.query(Resource).all()
+    for resource in resources:
+        sync_resource_types(db, resource)
+    db.flush()
+    # 计数按关联表重新统计，修正增量维护中可能出现的偏差
+    counts = dict(db.query(ResourceTypeLink.type_id, func.count()).group_by(ResourceTypeLink.type_id).all())
+    for tag in db.query(ResourceTypeTag).all():
+        tag.approved_count = counts.get(tag.id, 0)
+    bump_versions(db, SEARCH_INDEX_VERSION, PUBLIC_LIST_VERSION)
+    db.commit()
+    title_index.rebuild(db)
+    prefix_index.rebuild(db)
+    search_snapshot.rebuild(db)
+    public_list_cache.invalidate()
+    # 顺带校正管理后台统计
+    drift = reconcile_stats(db)
+    return {"resources": len(resources), "stats_drift": drift}
+
+
+@job_handler(JOB_SEARCH_SNAPSHOT_RECONCILE)
+def search_snapshot_reconcile(db):
+    return {"changed": search_snapshot.rebuild(db)}
+
+
+@job_handler(JOB_STATS_RECONCILE)
+def stats_reconcile(db):
+    return {"drift": reconcile_stats(db)}
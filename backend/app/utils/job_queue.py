@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+from ..models.database import SessionLocal, dialect_insert
+from ..models.models import Job
+from .logging_config import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# 每个进程的工作线程数（多进程部署时每个工作进程各自启动）
+JOB_WORKERS = 2
+# 没有可执行任务时的轮询间隔（秒），本进程入队的任务会立即唤醒工作线程
+JOB_POLL_SECONDS = 2.0
+# 默认最多执行次数
+JOB_MAX_ATTEMPTS = 5
+# 失败重试的退避时间：第n次失败后等待 JOB_RETRY_BASE_SECONDS * 2^(n-1) 秒，最长 JOB_RETRY_MAX_SECONDS
+JOB_RETRY_BASE_SECONDS = 10
+JOB_RETRY_MAX_SECONDS = 3600
+# 执行超过该时间仍未完成的任务视为工作进程已退出，重新排队
+JOB_LOCK_TIMEOUT = timedelta(minutes=30)
+# 已完成的任务保留多久，之后删除（相同幂等键的任务可以再次创建）
+JOB_RETENTION = timedelta(days=7)
+# 检查超时任务、清理旧任务的间隔（秒）
+JOB_MAINTENANCE_SECONDS = 60
+# 关闭时等待执行中任务完成的最长秒数，未完成的任务会在超时后由其他进程重新执行
+JOB_SHUTDOWN_TIMEOUT = 10
+# 一次查找的候选任务数，其中已被其他工作线程领取的会被跳过
+JOB_CLAIM_CANDIDATES = 5
+# 错误信息最多保存的字符数
+JOB_ERROR_MAX_LENGTH = 4000
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """
+    Register func(db, **payload) as the handler for jobs of this kind. Its
+    return value must be JSON-serializable and is stored as the result.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue_job(db, kind, payload=None, idempotency_key=None, max_attempts=JOB_MAX_ATTEMPTS, delay=None):
+    """
+    Add a job to the caller's transaction. Nothing is committed here: the
+    job becomes visible when the caller commits, which also wakes the local
+    workers, and disappears with the caller's rollback. When a job with the
+    same idempotency_key exists that job is returned instead; a failed one
+    is queued again with a fresh attempt budget.
+    """
+    values = {
+        "kind": kind,
+        "payload": payload or {},
+        "idempotency_key": idempotency_key,
+        "status": JOB_QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_after": datetime.now() + (delay or timedelta()),
+    }
+    if idempotency_key is None:
+        job = Job(**values)
+        db.add(job)
+        db.flush()
+    else:
+        # 相同幂等键的任务已存在（包括其他请求同时创建的）时不插入，不会引发唯一约束错误打断调用方的事务
+        db.execute(
+            dialect_insert(db, Job).values(**values)
+            .on_conflict_do_nothing(index_elements=[Job.idempotency_key])
+        )
+        job = db.query(Job).filter(Job.idempotency_key == idempotency_key).one()
+        if job.status == JOB_FAILED:
+            _requeue(job)
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("jobs_enqueued", False):
+        job_workers.wake()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+def retry_delay(attempts):
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    # 加入随机抖动，避免同时失败的任务同时重试
+    return timedelta(seconds=delay * random.uniform(0.75, 1.0))
+
+
+def claim_next_job(db, worker_id, now=None):
+    """
+    Take the oldest due job this process has a handler for. The status is
+    switched with a compare-and-set update, so when several workers or
+    processes race for the same row exactly one of them gets it.
+    """
+    if not _handlers:
+        return None
+    now = now or datetime.now()
+    candidates = db.query(Job.id).filter(
+        Job.status == JOB_QUEUED,
+        Job.run_after <= now,
+        Job.kind.in_(list(_handlers))
+    ).order_by(Job.run_after.asc(), Job.id.asc()).limit(JOB_CLAIM_CANDIDATES).all()
+
+    for (job_id,) in candidates:
+        claimed = db.query(Job).filter(Job.id == job_id, Job.status == JOB_QUEUED).update({
+            Job.status: JOB_RUNNING,
+            Job.locked_by: worker_id,
+            Job.locked_at: now,
+            Job.attempts: Job.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return db.query(Job).filter(Job.id == job_id).first()
+    return None
+
+
+def run_job(db, job, worker_id):
+    """
+    Run a claimed job. On failure it is queued again with exponential
+    backoff until max_attempts is reached, then marked failed.
+    """
+    job_id, kind, payload, attempts, max_attempts = job.id, job.kind, job.payload or {}, job.attempts, job.max_attempts
+    started = time.perf_counter()
+    # 处理函数输出的日志以任务ID关联
+    token = request_id_var.set(f"job-{job_id}")
+    try:
+        result = _handlers[kind](db, **payload)
+    except Exception as e:
+        db.rollback()
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"[:JOB_ERROR_MAX_LENGTH]
+        if attempts >= max_attempts:
+            values = {Job.status: JOB_FAILED, Job.finished_at: datetime.now()}
+            logger.error("任务 %s(%s) 第%d次执行失败，不再重试: %s", job_id, kind, attempts, e, extra={"job_id": job_id, "kind": kind})
+        else:
+            values = {Job.status: JOB_QUEUED, Job.run_after: datetime.now() + retry_delay(attempts)}
+            logger.warning("任务 %s(%s) 第%d次执行失败，稍后重试: %s", job_id, kind, attempts, e, extra={"job_id": job_id, "kind": kind})
+        values.update({Job.last_error: error, Job.locked_by: None, Job.locked_at: None})
+    else:
+        values = {
+            Job.status: JOB_SUCCEEDED,
+            Job.result: result,
+            Job.finished_at: datetime.now(),
+            Job.locked_by: None,
+            Job.locked_at: None,
+        }
+        logger.info(
+            "任务 %s(%s) 执行完成", job_id, kind,
+            extra={"job_id": job_id, "kind": kind, "duration": round(time.perf_counter() - started, 3)}
+        )
+
+    # 任务超时被重新排队后又被其他线程领取时，不覆盖对方的状态
+    db.query(Job).filter(Job.id == job_id, Job.status == JOB_RUNNING, Job.locked_by == worker_id)\
+        .update(values, synchronize_session=False)
+    db.commit()
+    request_id_var.reset(token)
+
+
+def recover_stale_jobs(db, now=None):
+    """
+    Requeue jobs whose worker stopped without finishing them (process
+    killed or restarted) and delete finished jobs past the retention
+    period. Returns (requeued, pruned).
+    """
+    now = now or datetime.now()
+    stale = db.query(Job).filter(Job.status == JOB_RUNNING, Job.locked_at < now - JOB_LOCK_TIMEOUT)
+    requeued = stale.filter(Job.attempts < Job.max_attempts).update({
+        Job.status: JOB_QUEUED, Job.run_after: now, Job.locked_by: None, Job.locked_at: None,
+        Job.last_error: "执行超时，工作进程可能已退出",
+    }, synchronize_session=False)
+    stale.update({
+        Job.status: JOB_FAILED, Job.finished_at: now, Job.locked_by: None, Job.locked_at: None,
+        Job.last_error: "执行超时，工作进程可能已退出",
+    }, synchronize_session=False)
+    pruned = db.query(Job).filter(
+        Job.status.in_([JOB_SUCCEEDED, JOB_FAILED]),
+        Job.finished_at < now - JOB_RETENTION
+    ).delete(synchronize_session=False)
+    db.commit()
+    return requeued, pruned
+
+
+def retry_failed_job(db, job):
+    """
+    Queue a failed job again with a fresh attempt budget. The caller checks
+    that the job has failed.
+    """
+    _requeue(job)
+    db.commit()
+    job_workers.wake()
+    return job
+
+
+def _requeue(job):
+    job.status = JOB_QUEUED
+    job.attempts = 0
+    job.run_after = datetime.now()
+    job.finished_at = None
+
+
+def get_job_counts(db):
+    """
+    {"by_status": {status: count}, "by_kind": {kind: {status: count}}}
+    """
+    by_status = {}
+    by_kind = {}
+    for kind, status, count in db.query(Job.kind, Job.status, func.count(Job.id)).group_by(Job.kind, Job.status):
+        by_status[status] = by_status.get(status, 0) + count
+        by_kind.setdefault(kind, {})[status] = count
+    return {"by_status": by_status, "by_kind": by_kind}
+
+
+def _enqueue_periodic(kind, interval):
+    db = SessionLocal()
+    try:
+        enqueue_job(db, kind, idempotency_key=f"{kind}:period:{int(time.time() // interval)}")
+        db.commit()
+    finally:
+        db.close()
+
+
+async def periodic_job_loop(kind, interval):
+    """
+    Background task: queue a job of this kind every interval seconds. The
+    idempotency key is derived from the period, so however many processes
+    run the loop only one job per period is created.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(_enqueue_periodic, kind, interval)
+        except Exception:
+            logger.exception("定期任务 %s 入队出错", kind)
+        await asyncio.sleep(interval)
+
+
+class JobWorkerPool:
+    """
+    Threads that claim and run jobs from the jobs table. Every process runs
+    its own pool; the compare-and-set claim keeps them from running the same
+    job twice.
+    """
+
+    def __init__(self, size=JOB_WORKERS):
+        self.size = size
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._next_maintenance = 0
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for index in range(self.size):
+            thread = threading.Thread(
+                target=self._run, args=(f"{prefix}:{index}",), name=f"job-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=JOB_SHUTDOWN_TIMEOUT):
+        self._stop.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self._threads = []
+
+    def _maintenance_due(self):
+        now = time.monotonic()
+        if now < self._next_maintenance:
+            return False
+        self._next_maintenance = now + JOB_MAINTENANCE_SECONDS
+        return True
+
+    def _run(self, worker_id):
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                if self._maintenance_due():
+                    requeued, pruned = recover_stale_jobs(db)
+                    if requeued or pruned:
+                        logger.info("任务队列维护: 重新排队 %d 个超时任务，删除 %d 个旧任务", requeued, pruned)
+                job = claim_next_job(db, worker_id)
+                if job is not None:
+                    run_job(db, job, worker_id)
+                    continue
+            except Exception:
+                db.rollback()
+                logger.exception("任务工作线程出错")
+            finally:
+                db.close()
+            self._wakeup.wait(JOB_POLL_SECONDS)
+            self._wakeup.clear()
+
+
+job_workers = JobWorkerPool()
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import random
+import struct
+from array import array
+from ..models.database import BACKEND_DIR, dialect_insert
+from ..models.models import LikeFilterBucket
+
+logger = logging.getLogger(__name__)
+
+# 桶数（2的幂）和每个桶的槽数，表中最多 桶数 行、每行 槽数 × 2 字节的指纹（默认约可容纳100万条记录）
+LIKE_FILTER_BUCKETS = 1 << 18
+LIKE_FILTER_SLOTS = 4
+# 插入时最多踢出的次数，超过即认为过滤器已满
+LIKE_FILTER_MAX_KICKS = 500
+# 旧版本保存在文件中的过滤器，启动时导入数据库
+LEGACY_LIKE_FILTER_PATH = os.path.join(BACKEND_DIR, "like_filter.bin")
+
+_FILE_MAGIC = b"CKF1"
+_HEADER = struct.Struct("<4sIII")
+
+
+class CuckooFilter:
+    """
+    Cuckoo filter over 16-bit fingerprints in fixed-size buckets, stored in
+    the like_filter_buckets table so that every worker process shares it.
+    Membership checks read at most two rows by primary key, the table never
+    holds more than num_buckets rows, and unlike a Bloom filter entries can
+    be removed (needed for unlike). A lookup may report a key that was never
+    added with probability about 2 * slots / 65536 (~0.012% with 4 slots).
+
+    Changes run in the caller's transaction, so they commit or roll back
+    together with the like count.
+    """
+
+    def __init__(self, num_buckets=LIKE_FILTER_BUCKETS, slots=LIKE_FILTER_SLOTS):
+        self.num_buckets = num_buckets
+        self.slots = slots
+
+    def _locate(self, key):
+        value = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+        fingerprint = (value >> 32) & 0xFFFF or 1  # 0 表示空槽
+        return fingerprint, value & (self.num_buckets - 1)
+
+    def _alt_index(self, index, fingerprint):
+        return (index ^ (fingerprint * 0x5BD1E995)) & (self.num_buckets - 1)
+
+    def _lock(self, db, index):
+        # 先执行一条写语句取得数据库写锁，其他进程对过滤器的修改会等待本事务提交，
+        # 避免两个进程读到同一个桶后互相覆盖
+        db.execute(dialect_insert(db, LikeFilterBucket).values(
+            bucket=index, fingerprints=bytes(self.slots * 2)
+        ).on_conflict_do_nothing(index_elements=[LikeFilterBucket.bucket]))
+
+    def _load(self, db, buckets, index):
+        if index not in buckets:
+            row = db.query(LikeFilterBucket.fingerprints).filter(LikeFilterBucket.bucket == index).first()
+            fingerprints = array("H")
+            if row is not None and len(row[0]) == self.slots * 2:
+                fingerprints.frombytes(row[0])
+            else:
+                fingerprints.extend([0] * self.slots)
+            buckets[index] = fingerprints
+        return buckets[index]
+
+    def _save(self, db, buckets, changed):
+        for index in changed:
+            data = buckets[index].tobytes()
+            db.execute(dialect_insert(db, LikeFilterBucket).values(bucket=index, fingerprints=data).on_conflict_do_update(
+                index_elements=[LikeFilterBucket.bucket], set_={"fingerprints": data}
+            ))
+
+    def _contains(self, db, buckets, fingerprint, index):
+        return fingerprint in self._load(db, buckets, index) or \
+            fingerprint in self._load(db, buckets, self._alt_index(index, fingerprint))
+
+    def _insert(self, db, buckets, changed, fingerprint, index):
+        for candidate in (index, self._alt_index(index, fingerprint)):
+            fingerprints = self._load(db, buckets, candidate)
+            if 0 in fingerprints:
+                fingerprints[fingerprints.index(0)] = fingerprint
+                changed.add(candidate)
+                return True
+        # 两个候选桶都满时，随机踢出一个指纹，把它搬到它的另一个桶
+        for _ in range(LIKE_FILTER_MAX_KICKS):
+            fingerprints = self._load(db, buckets, index)
+            slot = random.randrange(self.slots)
+            fingerprint, fingerprints[slot] = fingerprints[slot], fingerprint
+            changed.add(index)
+            index = self._alt_index(index, fingerprint)
+            fingerprints = self._load(db, buckets, index)
+            if 0 in fingerprints:
+                fingerprints[fingerprints.index(0)] = fingerprint
+                changed.add(index)
+                return True
+        return False
+
+    def add_if_absent(self, db, key):
+        """
+        Add key unless it is (probably) present. Returns True when the key
+        was added. If the filter is full the key is treated as new but not
+        stored. The caller commits.
+        """
+        fingerprint, index = self._locate(key)
+        self._lock(db, index)
+        buckets, changed = {}, set()
+        if self._contains(db, buckets, fingerprint, index):
+            return False
+        if self._insert(db, buckets, changed, fingerprint, index):
+            self._save(db, buckets, changed)
+        else:
+            # 过滤器满后每次喜欢都会走到这里，只抽样记录；踢出过程中的修改不保存，已有指纹不会丢失
+            logger.warning("喜欢去重过滤器已满，新记录未保存", extra={"sample_rate": 0.01})
+        return True
+
+    def remove_if_present(self, db, key):
+        """
+        Remove key if it is (probably) present. Returns True when it was
+        found. The caller commits.
+        """
+        fingerprint, index = self._locate(key)
+        self._lock(db, index)
+        buckets = {}
+        for candidate in (index, self._alt_index(index, fingerprint)):
+            fingerprints = self._load(db, buckets, candidate)
+            if fingerprint in fingerprints:
+                fingerprints[fingerprints.index(fingerprint)] = 0
+                self._save(db, buckets, [candidate])
+                return True
+        return False
+
+    def contains(self, db, key):
+        fingerprint, index = self._locate(key)
+        return self._contains(db, {}, fingerprint, index)
+
+
+def client_key(request, resource_id):
+    """
+    Key of one client liking one resource. Behind the nginx proxy the
+    server trusts X-Forwarded-For only from the proxy (serve.py sets
+    forwarded_allow_ips), so request.client is already the real client.
+    """
+    client = request.client.host if request.client else ""
+    return f"{client}|{resource_id}".encode()
+
+
+def import_legacy_like_filter(db, path=LEGACY_LIKE_FILTER_PATH):
+    """
+    Copy a filter saved by the old file-based version into the table, once:
+    only when the table is empty, and the file is renamed afterwards.
+    Returns the number of buckets imported.
+    """
+    if not os.path.exists(path):
+        return 0
+    imported = 0
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, saved_buckets, saved_slots, _ = _HEADER.unpack_from(data)
+        table = array("H")
+        table.frombytes(data[_HEADER.size:])
+    except (OSError, struct.error, ValueError):
+        logger.warning("旧的喜欢去重过滤器文件无法读取，已忽略")
+    else:
+        if magic != _FILE_MAGIC or (saved_buckets, saved_slots) != (like_filter.num_buckets, like_filter.slots) \
+                or len(table) != saved_buckets * saved_slots:
+            logger.warning("旧的喜欢去重过滤器文件与当前配置不符，已忽略")
+        elif db.query(LikeFilterBucket).first() is None:
+            for index in range(saved_buckets):
+                fingerprints = table[index * saved_slots:(index + 1) * saved_slots]
+                if any(fingerprints):
+                    db.add(LikeFilterBucket(bucket=index, fingerprints=fingerprints.tobytes()))
+                    imported += 1
+            db.commit()
+            logger.info("已将旧的喜欢去重过滤器导入数据库", extra={"buckets": imported})
+    os.replace(path, f"{path}.imported")
+    return imported
+
+
+like_filter = CuckooFilter()
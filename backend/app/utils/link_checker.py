@@ -0,0 +1,326 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from sqlalchemy import func, or_
+from ..models.database import SessionLocal
+from ..models.models import ResourceLink
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+except ImportError:  # 未安装 httpx 时不启用链接检测
+    httpx = None
+
+# 同一链接两次检测的最小间隔，超过该时间的链接会被重新检测
+LINK_CHECK_INTERVAL = timedelta(hours=24)
+# 每批检测的链接数，批次之间会暂停，避免集中请求
+LINK_CHECK_BATCH_SIZE = 50
+LINK_CHECK_BATCH_PAUSE = 5
+# 没有到期链接时的等待时间（秒）
+LINK_CHECK_IDLE_SECONDS = 60
+# 同时进行的请求数，也是连接池的大小
+LINK_CHECK_CONCURRENCY = 8
+# 对同一主机的两次请求至少间隔这么多秒
+LINK_CHECK_HOST_INTERVAL = 2.0
+LINK_CHECK_TIMEOUT = 10.0
+# 判断失效只需要页面开头部分
+LINK_CHECK_MAX_BODY = 256 * 1024
+LINK_CHECK_USER_AGENT = "Mozilla/5.0 (compatible; ResourceHubLinkChecker/1.0)"
+# 最多跟随的重定向次数，每一跳都会重新检查目标地址
+LINK_CHECK_MAX_REDIRECTS = 5
+# 允许检测的非公网主机名或IP（如测试用的本地服务 "127.0.0.1"），默认为空，只检测公网地址
+LINK_CHECK_ALLOWED_HOSTS = set()
+
+# 网盘分享失效时通常仍返回 200，需要根据页面内容判断
+DEAD_LINK_MARKERS = (
+    "分享的文件已经被取消",
+    "啊哦，你所访问的页面不存在了",
+    "分享者已取消分享",
+    "文件已被分享者删除",
+    "分享已失效",
+    "链接已失效",
+    "分享已过期",
+    "分享地址已失效",
+    "share_expired",
+)
+
+
+class HostRateLimiter:
+    """
+    Space out requests to the same host by at least `interval` seconds.
+    Each caller reserves the next free slot for its host and sleeps until it;
+    the reservation has no await in it, so no lock is needed.
+    """
+
+    def __init__(self, interval=LINK_CHECK_HOST_INTERVAL):
+        self.interval = interval
+        self._next_slot = {}
+        self._pruned_at = time.monotonic()
+
+    def _prune(self, now):
+        # 时间已过的预约与没有预约等价，定期删除，避免每个检测过的主机都永久占用一项
+        if now - self._pruned_at < self.interval:
+            return
+        self._pruned_at = now
+        for host in [host for host, slot in self._next_slot.items() if slot <= now]:
+            del self._next_slot[host]
+
+    async def wait(self, host):
+        now = time.monotonic()
+        self._prune(now)
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class BlockedAddress(Exception):
+    """
+    The link points at (or redirects to) an address the checker must not
+    reach: loopback, private, link-local (cloud metadata), reserved or
+    otherwise non-public, unless the host is in LINK_CHECK_ALLOWED_HOSTS.
+    """
+
+
+def is_public_address(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def ensure_public_host(url):
+    """
+    Resolve the host of url and raise BlockedAddress unless every address
+    it resolves to is public or the host is in LINK_CHECK_ALLOWED_HOSTS.
+    Raises socket.gaierror when it does not resolve.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise BlockedAddress(url)
+    if parts.hostname in LINK_CHECK_ALLOWED_HOSTS:
+        return
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    if not infos or not all(is_public_address(info[4][0]) for info in infos):
+        raise BlockedAddress(url)
+
+
+def _ensure_public_peer(response):
+    # 解析后到连接前DNS记录可能被替换，再检查实际连接的地址
+    if response.url.host in LINK_CHECK_ALLOWED_HOSTS:
+        return
+    stream = response.extensions.get("network_stream")
+    server_addr = stream.get_extra_info("server_addr") if stream is not None else None
+    if server_addr and not is_public_address(server_addr[0]):
+        raise BlockedAddress(str(response.url))
+
+
+def create_client():
+    """
+    Shared AsyncClient with a bounded connection pool, so consecutive
+    batches reuse keep-alive connections. Redirects are followed by
+    check_url, which vets every hop.
+    """
+    return httpx.AsyncClient(
+        timeout=LINK_CHECK_TIMEOUT,
+        follow_redirects=False,
+        limits=httpx.Limits(max_connections=LINK_CHECK_CONCURRENCY, max_keepalive_connections=LINK_CHECK_CONCURRENCY),
+        headers={"User-Agent": LINK_CHECK_USER_AGENT},
+    )
+
+
+async def _fetch(client, limiter, url):
+    """
+    GET url, following up to LINK_CHECK_MAX_REDIRECTS redirects, each hop
+    only after its host has been checked. Returns (response, text); text is
+    None for error responses.
+    """
+    for _ in range(LINK_CHECK_MAX_REDIRECTS + 1):
+        await ensure_public_host(url)
+        await limiter.wait(urlsplit(url).hostname)
+        async with client.stream("GET", url) as response:
+            _ensure_public_peer(response)
+            if response.next_request is not None:
+                url = str(response.next_request.url)
+                continue
+            if response.status_code >= 400:
+                return response, None
+            body = b""
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) >= LINK_CHECK_MAX_BODY:
+                    break
+            return response, body.decode(response.encoding or "utf-8", errors="ignore")
+    raise httpx.TooManyRedirects("重定向次数过多", request=response.request)
+
+
+async def check_url(client, limiter, url):
+    """
+    Fetch url and classify it. Returns (status, status_code) where status
+    is "ok", "dead" (404/410 or a known "share expired" page) or "error"
+    (network failure, invalid or non-public address, or other HTTP error;
+    retried on the next round).
+    """
+    try:
+        response, text = await _fetch(client, limiter, url)
+    except BlockedAddress as e:
+        logger.warning("链接指向非公网地址，已跳过检测 %s", e)
+        return "error", None
+    except (httpx.HTTPError, httpx.InvalidURL, socket.gaierror, ValueError) as e:
+        logger.debug("检测链接失败 %s: %s", url, e)
+        return "error", None
+    if response.status_code in (404, 410):
+        return "dead", response.status_code
+    if text is None:
+        return "error", response.status_code
+    if any(marker in text for marker in DEAD_LINK_MARKERS):
+        return "dead", response.status_code
+    return "ok", response.status_code
+
+
+def _claim_due_links(batch_size):
+    """
+    Pick the links checked longest ago (never-checked first) and stamp
+    last_checked_at right away, so other workers do not pick them again.
+    Only http(s) links can be checked; magnet/ed2k stay "unknown".
+    """
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now() - LINK_CHECK_INTERVAL
+        links = db.query(ResourceLink).filter(
+            or_(ResourceLink.url.like("http://%"), ResourceLink.url.like("https://%")),
+            or_(ResourceLink.last_checked_at.is_(None), ResourceLink.last_checked_at < cutoff)
+        ).order_by(ResourceLink.last_checked_at.asc().nullsfirst(), ResourceLink.id).limit(batch_size).all()
+        now = datetime.now()
+        claimed = []
+        for link in links:
+            link.last_checked_at = now
+            claimed.append((link.id, link.url))
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _save_results(results):
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        for link in db.query(ResourceLink).filter(ResourceLink.id.in_(list(results))).all():
+            status, status_code = results[link.id]
+            link.status = status
+            link.status_code = status_code
+            link.last_checked_at = now
+            link.check_failures = 0 if status == "ok" else (link.check_failures or 0) + 1
+        db.commit()
+    finally:
+        db.close()
+
+
+async def check_due_links(batch_size=LINK_CHECK_BATCH_SIZE, client=None, limiter=None):
+    """
+    Check one batch of due links with bounded concurrency and store the
+    results. Returns {"checked", "ok", "dead", "error"} counts.
+    """
+    report = {"checked": 0, "ok": 0, "dead": 0, "error": 0}
+    if httpx is None:
+        return report
+    links = await asyncio.to_thread(_claim_due_links, batch_size)
+    if not links:
+        return report
+
+    own_client = client is None
+    if own_client:
+        client = create_client()
+    limiter = limiter or host_limiter
+    semaphore = asyncio.Semaphore(LINK_CHECK_CONCURRENCY)
+
+    async def run(link_id, url):
+        async with semaphore:
+            try:
+                return link_id, await check_url(client, limiter, url)
+            except Exception:
+                # 单条链接的意外错误不能让整批结果丢失
+                logger.exception("检测链接出错 %s", url)
+                return link_id, ("error", None)
+
+    try:
+        results = dict(await asyncio.gather(*(run(link_id, url) for link_id, url in links)))
+    finally:
+        if own_client:
+            await client.aclose()
+
+    await asyncio.to_thread(_save_results, results)
+    for status, _ in results.values():
+        report["checked"] += 1
+        report[status] += 1
+    return report
+
+
+async def link_check_loop():
+    """
+    Background task: check due links batch by batch, pausing between
+    batches and idling when nothing is due, so the whole catalog is
+    covered every LINK_CHECK_INTERVAL without bursts.
+    """
+    if httpx is None:
+        logger.warning("未安装 httpx，链接检测已禁用")
+        return
+    async with create_client() as client:
+        while True:
+            try:
+                report = await check_due_links(client=client)
+            except Exception:
+                logger.exception("链接检测出错")
+                report = {"checked": 0}
+            if report["checked"]:
+                logger.info("链接检测完成 %d 个", report["checked"], extra={"report": report})
+            await asyncio.sleep(LINK_CHECK_BATCH_PAUSE if report["checked"] >= LINK_CHECK_BATCH_SIZE else LINK_CHECK_IDLE_SECONDS)
+
+
+def mark_links_due(db, resource_id):
+    """
+    Reset a resource's links so the next batch checks them first. The
+    caller commits.
+    """
+    db.query(ResourceLink).filter(ResourceLink.resource_id == resource_id)\
+        .update({ResourceLink.last_checked_at: None}, synchronize_session=False)
+
+
+def get_link_health(db, sample_size=100):
+    """
+    Link counts per status, the number of links due for checking and the
+    most recently detected dead links.
+    """
+    cutoff = datetime.now() - LINK_CHECK_INTERVAL
+    counts = dict(db.query(ResourceLink.status, func.count(ResourceLink.id)).group_by(ResourceLink.status).all())
+    due = db.query(func.count(ResourceLink.id)).filter(
+        or_(ResourceLink.url.like("http://%"), ResourceLink.url.like("https://%")),
+        or_(ResourceLink.last_checked_at.is_(None), ResourceLink.last_checked_at < cutoff)
+    ).scalar()
+    dead_links = db.query(ResourceLink).filter(ResourceLink.status == "dead")\
+        .order_by(ResourceLink.last_checked_at.desc()).limit(sample_size).all()
+    return {
+        "counts": counts,
+        "due": due,
+        "dead_links": [
+            {
+                "id": link.id,
+                "resource_id": link.resource_id,
+                "category": link.category,
+                "url": link.url,
+                "status_code": link.status_code,
+                "last_checked_at": link.last_checked_at,
+            }
+            for link in dead_links
+        ],
+    }
+
+
+host_limiter = HostRateLimiter()
@@ -0,0 +1,200 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# 日志级别
+LOG_LEVEL = "INFO"
+# 单独设置级别的模块，如 {"app.routers.resources": "DEBUG"}
+LOG_LEVELS = {}
+# 每行输出一个JSON对象，便于日志收集系统解析；设为 False 时输出便于阅读的文本
+LOG_JSON = True
+# 日志队列的容量，写出跟不上时丢弃新日志而不是阻塞请求
+LOG_QUEUE_SIZE = 10000
+# 请求ID的请求头/响应头，客户端或 nginx 传入的值会被沿用
+REQUEST_ID_HEADER = "x-request-id"
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# LogRecord 自带的属性，其余属性（通过 extra 传入）作为结构化字段输出
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample_rate"}
+
+request_id_var = ContextVar("request_id", default="-")
+
+
+class ContextFilter(logging.Filter):
+    """
+    Stamp records with the current request id. Runs in the calling thread
+    before the record is queued; the writer thread cannot see the request's
+    context.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of high-volume records, logged with
+    extra={"sample_rate": 0.01}. Kept records carry the rate so counts can
+    be scaled back up.
+    """
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the writer thread through a bounded queue. The calling
+    thread only merges the message arguments; when the queue is full the
+    record is dropped (and the number of drops reported later) instead of
+    waiting for stdout.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # 异常对象不能跨线程保留，先格式化为文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self._dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"日志队列已满，丢弃了 {self._dropped} 条日志",
+                }))
+                self._dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        if getattr(record, "sample_rate", None):
+            entry["sample_rate"] = record.sample_rate
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_handler = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_JSON:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    _listener = QueueListener(_handler.queue, output)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # fork 出的工作进程中没有父进程的写日志线程，换一个新队列并重新启动
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _start_listener()
+
+
+def stop_logging():
+    """
+    Write out the records still queued. Registered to run at exit.
+    """
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def setup_logging():
+    """
+    Route all app loggers through the queue handler. Safe to call more
+    than once; only the first call configures anything.
+    """
+    global _handler
+    if _handler is not None:
+        return
+    _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(SamplingFilter())
+    _handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    _start_listener()
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(stop_logging)
+
+
+class RequestContextMiddleware:
+    """
+    Give every HTTP request an id (taken from the X-Request-ID header when
+    it looks valid, generated otherwise), expose it to log records through
+    request_id_var and echo it in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex[:16]
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,188 @@
+import threading
+from datetime import timedelta
+from ..models.models import ImageAsset
+from .storage import storage, asset_key
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未安装时不计算感知哈希
+    Image = None
+
+# 汉明距离不超过该值即视为近似重复（64位dHash）
+NEAR_DUPLICATE_DISTANCE = 8
+
+
+def compute_dhash(file_path):
+    """
+    Compute a 64-bit difference hash (dHash) of an image file.
+    Returns the hash as a 16-character hex string, or None if the file
+    cannot be decoded.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(file_path) as img:
+            # 缩放为 9x8 灰度图，比较每行相邻像素的明暗
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return f"{value:016x}"
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes with Hamming distance.
+    Lookups within a small radius only visit a fraction of the nodes.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value):
+        if self.root is None:
+            self.root = (value, {})
+            self.size = 1
+            return
+        node_value, children = self.root
+        while True:
+            distance = hamming_distance(value, node_value)
+            if distance == 0:
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (value, {})
+                self.size += 1
+                return
+            node_value, children = child
+
+    def search(self, value, max_distance):
+        """
+        Return [(distance, value)] for all stored values within max_distance.
+        """
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node_value, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                results.append((distance, node_value))
+            # 三角不等式：只有距离在 [d-r, d+r] 内的子树可能包含结果
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+
+class PerceptualIndex:
+    """
+    In-memory BK-tree over image_assets.phash. The tree is loaded lazily and
+    caught up incrementally from rows modified since the last refresh, so
+    uploads handled by other workers, hashes written by the backfill and
+    rows moved to another copy by GC become visible on the next lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self._paths_by_hash = {}
+        self._assets = {}  # asset id -> (hash value, path)
+        self._watermark = None
+
+    def _set(self, asset_id, phash, path):
+        previous = self._assets.pop(asset_id, None)
+        if previous:
+            paths = self._paths_by_hash.get(previous[0])
+            if paths:
+                paths.discard(previous[1])
+        if not phash:
+            return
+        value = int(phash, 16)
+        # BK树不支持删除，旧的哈希值没有对应路径后不会再出现在结果中
+        self._tree.add(value)
+        self._paths_by_hash.setdefault(value, set()).add(path)
+        self._assets[asset_id] = (value, path)
+
+    def refresh(self, db):
+        with self._lock:
+            query = db.query(ImageAsset.id, ImageAsset.phash, ImageAsset.path, ImageAsset.updated_at)
+            if self._watermark is not None:
+                # 数据库生成的时间戳只精确到秒，回退1秒，重新读取与上次刷新同一秒内修改的行
+                query = query.filter(ImageAsset.updated_at >= self._watermark - timedelta(seconds=1))
+            for asset_id, phash, path, updated_at in query.order_by(ImageAsset.updated_at.asc()).all():
+                self._set(asset_id, phash, path)
+                if updated_at and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+
+    def find_similar(self, db, phash, max_distance=NEAR_DUPLICATE_DISTANCE):
+        """
+        Return [{"path", "distance"}] for stored images whose hash is within
+        max_distance of phash, nearest first.
+        """
+        self.refresh(db)
+        with self._lock:
+            matches = self._tree.search(int(phash, 16), max_distance)
+            candidates = [
+                (distance, path)
+                for distance, value in matches
+                for path in self._paths_by_hash.get(value, ())
+            ]
+        if not candidates:
+            return []
+        # 过滤掉已被清理的图片
+        existing = {
+            path for (path,) in db.query(ImageAsset.path)
+            .filter(ImageAsset.path.in_([path for _, path in candidates])).all()
+        }
+        return [
+            {"path": path, "distance": distance}
+            for distance, path in sorted(candidates)
+            if path in existing
+        ]
+
+
+perceptual_index = PerceptualIndex()
+
+
+def backfill_perceptual_hashes(db, batch_size=200):
+    """
+    Register stored images that predate image_assets and compute missing
+    perceptual hashes, at most batch_size of each per call.
+    Returns the number of images processed.
+    """
+    from .upload_gc import iter_asset_files
+    from .upload_utils import describe_image_file, register_image_asset
+
+    known = {path for (path,) in db.query(ImageAsset.path).all()}
+    registered = 0
+    for asset_path, key, _, _ in iter_asset_files():
+        if registered >= batch_size:
+            break
+        if asset_path in known:
+            continue
+        with storage.open_local(key) as file_path:
+            info = describe_image_file(file_path, asset_path) if file_path else None
+        if info:
+            register_image_asset(db, asset_path, info)
+            registered += 1
+
+    assets = db.query(ImageAsset).filter(ImageAsset.phash.is_(None))\
+        .order_by(ImageAsset.id.asc()).limit(batch_size).all()
+    for asset in assets:
+        with storage.open_local(asset_key(asset.path)) as file_path:
+            # 无法解码的文件记为空字符串，避免反复重试
+            asset.phash = (compute_dhash(file_path) if file_path else None) or ""
+    db.commit()
+    return registered + len(assets)
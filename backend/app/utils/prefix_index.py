@@ -0,0 +1,167 @@
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from ..models.models import Resource, ResourceStatus
+from .title_index import normalize_title
+from .cache_versions import VersionWatch, SEARCH_INDEX_VERSION
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pypinyin 未安装时不提供拼音匹配
+    lazy_pinyin = None
+
+# 每种匹配方式最多收集的候选资源数为结果数的倍数，用于截断范围查询
+CANDIDATE_FACTOR = 4
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# 键的类型，数值越小排序越靠前
+KEY_TITLE = 0  # 标题开头
+KEY_PINYIN = 1  # 拼音全拼或首字母
+KEY_INNER = 2  # 标题中间的位置
+KEY_KINDS = (KEY_TITLE, KEY_PINYIN, KEY_INNER)
+
+
+def title_prefix_keys(title, title_en):
+    """
+    Build the (key, kind) pairs a resource is reachable by: the normalized
+    titles, every later starting position of the Chinese title, every word of
+    the English title, and the full pinyin and initials of the Chinese title.
+    """
+    keys = set()
+    normalized = normalize_title(title)
+    if normalized:
+        keys.add((normalized, KEY_TITLE))
+        # 中文标题没有分词，每个位置都作为可匹配的起点
+        for i in range(1, len(normalized)):
+            keys.add((normalized[i:], KEY_INNER))
+
+    normalized_en = normalize_title(title_en)
+    if normalized_en:
+        keys.add((normalized_en, KEY_TITLE))
+        words = _WORD.findall(unicodedata.normalize("NFKC", title_en).lower())
+        for i in range(1, len(words)):
+            keys.add(("".join(words[i:]), KEY_INNER))
+
+    if lazy_pinyin and normalized:
+        syllables = lazy_pinyin(normalized)
+        keys.add(("".join(syllables), KEY_PINYIN))
+        initials = lazy_pinyin(normalized, style=Style.FIRST_LETTER)
+        keys.add(("".join(initials), KEY_PINYIN))
+
+    return [(key, kind) for key, kind in keys if key]
+
+
+class PrefixIndex:
+    """
+    One sorted array of (key, resource_id) per key kind over approved
+    resources. A prefix lookup is a bisect to the first key >= prefix in each
+    array followed by a short forward scan, so it stays well under a
+    millisecond.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = VersionWatch(SEARCH_INDEX_VERSION)
+        self._keys = {kind: [] for kind in KEY_KINDS}
+        self._entries = {}  # resource_id -> (title, title_en, resource_type, keys)
+        self._built_at = None
+
+    def _add(self, resource_id, title, title_en, resource_type):
+        keys = [(key, kind, resource_id) for key, kind in title_prefix_keys(title, title_en)]
+        self._entries[resource_id] = (title, title_en, resource_type, keys)
+        for key, kind, _ in keys:
+            bisect.insort(self._keys[kind], (key, resource_id))
+
+    def _remove(self, resource_id):
+        entry = self._entries.pop(resource_id, None)
+        if not entry:
+            return
+        for key, kind, _ in entry[3]:
+            keys = self._keys[kind]
+            position = bisect.bisect_left(keys, (key, resource_id))
+            if position < len(keys) and keys[position] == (key, resource_id):
+                del keys[position]
+
+    def rebuild(self, db):
+        rows = db.query(Resource.id, Resource.title, Resource.title_en, Resource.resource_type).filter(
+            Resource.status == ResourceStatus.APPROVED
+        ).all()
+        entries = {}
+        keys = {kind: [] for kind in KEY_KINDS}
+        for resource_id, title, title_en, resource_type in rows:
+            resource_keys = [(key, kind, resource_id) for key, kind in title_prefix_keys(title, title_en)]
+            entries[resource_id] = (title, title_en, resource_type, resource_keys)
+            for key, kind, _ in resource_keys:
+                keys[kind].append((key, resource_id))
+        for kind_keys in keys.values():
+            kind_keys.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self, db):
+        # 其他进程修改了已审批资源的标题时重建
+        if self._version.changed(db) or self._built_at is None:
+            self.rebuild(db)
+
+    def sync_resource(self, resource):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(resource.id)
+            if resource.status == ResourceStatus.APPROVED:
+                self._add(resource.id, resource.title, resource.title_en, resource.resource_type)
+
+    def remove_resource(self, resource_id):
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(resource_id)
+
+    def search(self, db, query, limit=8):
+        """
+        Return up to limit [{"id", "title", "title_en", "resource_type"}]
+        whose titles or pinyin start with query. Title-start matches rank
+        first, then shorter titles.
+        """
+        self.ensure_fresh(db)
+        prefix = normalize_title(query)
+        if not prefix:
+            return []
+
+        best = {}
+        with self._lock:
+            # 按排序优先级依次扫描每种键，前面的类型已凑满结果时后面的不会进入前 limit 名
+            for kind in KEY_KINDS:
+                if len(best) >= limit:
+                    break
+                keys = self._keys[kind]
+                position = bisect.bisect_left(keys, (prefix,))
+                found = set()
+                while position < len(keys) and len(found) < limit * CANDIDATE_FACTOR:
+                    key, resource_id = keys[position]
+                    if not key.startswith(prefix):
+                        break
+                    found.add(resource_id)
+                    best.setdefault(resource_id, kind)
+                    position += 1
+
+            ranked = sorted(
+                best.items(),
+                key=lambda item: (item[1], len(self._entries[item[0]][0] or self._entries[item[0]][1] or ""))
+            )[:limit]
+            return [
+                {
+                    "id": resource_id,
+                    "title": self._entries[resource_id][0],
+                    "title_en": self._entries[resource_id][1],
+                    "resource_type": self._entries[resource_id][2],
+                }
+                for resource_id, _ in ranked
+            ]
+
+
+prefix_index = PrefixIndex()
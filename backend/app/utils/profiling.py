@@ -0,0 +1,307 @@
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from ..models.database import SessionLocal, BACKEND_DIR
+from .auth import get_user_from_token
+
+logger = logging.getLogger(__name__)
+
+# 管理员在请求头 X-Profile: 1 或查询参数 _profile=1 中开启单个请求的性能分析
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "_profile"
+# 采样间隔（秒）
+PROFILE_INTERVAL = 0.005
+# 滚动采样：每 N 个请求分析一个（无需管理员），0 表示关闭
+PROFILE_SAMPLE_EVERY = 0
+# 分析结果保存目录和最多保留的文件数，超出时删除最旧的
+PROFILE_DIR = os.path.join(BACKEND_DIR, "profiles")
+PROFILE_RING_SIZE = 200
+# 每个请求最多记录的SQL语句数，SQL在火焰图中显示的最大长度
+PROFILE_MAX_SQL = 500
+PROFILE_SQL_FRAME_LENGTH = 120
+
+current_profile = ContextVar("current_profile", default=None)
+
+_request_counter = itertools.count(1)
+
+
+def _frame_name(code):
+    filename = code.co_filename
+    # 项目内的文件显示相对路径，第三方库只显示文件名
+    if filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+def _is_idle(frame):
+    # 事件循环线程在等待IO，不计入
+    return frame.f_code.co_filename.endswith("selectors.py")
+
+
+class RequestProfile:
+    """
+    Sampling profiler for one request. A background thread records the stacks
+    of the threads attached to the profile every PROFILE_INTERVAL seconds and
+    folds them into "frame;frame;frame count" lines (the collapsed format read
+    by flamegraph.pl and speedscope). SQL statements executed on the attached
+    threads are timed exactly and also appear as the leaf frame of the samples
+    taken while they run.
+
+    The thread that starts the profile (the event loop) is attached
+    immediately; worker threads running sync endpoints attach themselves on
+    their first SQL statement. Samples from the event loop thread can include
+    other requests handled concurrently.
+    """
+
+    def __init__(self, method, path, reason):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.now()
+        self.stacks = Counter()
+        self.samples = 0
+        self.sql = []
+        self.sql_dropped = 0
+        self._threads = {threading.get_ident()}
+        self._active_sql = {}
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+        self.duration = None
+
+    def attach_current_thread(self):
+        self._threads.add(threading.get_ident())
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample_loop(self):
+        while not self._stop.wait(PROFILE_INTERVAL):
+            frames = sys._current_frames()
+            for thread_id in list(self._threads):
+                frame = frames.get(thread_id)
+                if frame is None or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                statement = self._active_sql.get(thread_id)
+                if statement:
+                    stack.append(f"SQL: {statement}")
+                self.stacks[";".join(stack)] += 1
+                self.samples += 1
+
+    def sql_started(self, statement):
+        thread_id = threading.get_ident()
+        self._threads.add(thread_id)
+        # 火焰图中按语句合并，折叠空白并截断
+        self._active_sql[thread_id] = " ".join(statement.split())[:PROFILE_SQL_FRAME_LENGTH].replace(";", ",")
+
+    def sql_finished(self, statement, parameters, duration):
+        self._active_sql.pop(threading.get_ident(), None)
+        if len(self.sql) >= PROFILE_MAX_SQL:
+            self.sql_dropped += 1
+            return
+        self.sql.append({
+            "statement": statement,
+            "parameters": repr(parameters)[:200],
+            "duration_ms": round(duration * 1000, 3),
+        })
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def to_dict(self, status_code=None):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status_code": status_code,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": PROFILE_INTERVAL * 1000,
+            "samples": self.samples,
+            "sql_count": len(self.sql) + self.sql_dropped,
+            "sql_total_ms": round(sum(item["duration_ms"] for item in self.sql), 3),
+            "sql": self.sql,
+            "folded": self.folded(),
+        }
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+        profile.sql_started(statement)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None and conn.info.get("profile_started"):
+        started = conn.info["profile_started"].pop()
+        profile.sql_finished(statement, parameters, time.perf_counter() - started)
+
+
+def save_profile(data):
+    """
+    Write a profile to PROFILE_DIR and delete the oldest files beyond
+    PROFILE_RING_SIZE.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # 文件名以时间开头，按名称排序即按时间排序
+    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{data['id']}.json"
+    tmp_path = os.path.join(PROFILE_DIR, f".{filename}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(PROFILE_DIR, filename))
+
+    files = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for name in files[:-PROFILE_RING_SIZE]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except FileNotFoundError:
+            # 其他进程已删除
+            pass
+
+
+def _profile_path(profile_id):
+    if not os.path.isdir(PROFILE_DIR):
+        return None
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(f"-{profile_id}.json"):
+            return os.path.join(PROFILE_DIR, name)
+    return None
+
+
+def list_profiles(limit=50):
+    """
+    Summaries of the stored profiles, newest first.
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith(".json")), reverse=True)
+    summaries = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summaries.append({key: value for key, value in data.items() if key not in ("sql", "folded")})
+    return summaries
+
+
+def load_profile(profile_id):
+    path = _profile_path(profile_id)
+    if path is None:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_admin_token(token):
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(db, token)
+        return bool(user and user.is_admin)
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when an admin asks for it (X-Profile header or
+    _profile query parameter, with a valid admin bearer token) or when it
+    is picked by the 1-in-PROFILE_SAMPLE_EVERY rolling capture. The profile
+    is saved to the on-disk ring buffer and its id returned in the
+    X-Profile-Id response header. Requests asking for a profile without
+    admin rights are served normally, unprofiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def _requested_by_admin(self, scope):
+        headers = dict(scope["headers"])
+        flag = headers.get(PROFILE_HEADER.encode(), b"").decode("latin-1")
+        if not flag:
+            query = scope.get("query_string", b"").decode("latin-1")
+            flag = next((part.partition("=")[2] or "1" for part in query.split("&")
+                         if part.partition("=")[0] == PROFILE_QUERY_PARAM), "")
+        if flag.lower() not in ("1", "true", "yes"):
+            return False
+        scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        return await run_in_threadpool(_is_admin_token, token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if await self._requested_by_admin(scope):
+            reason = "admin"
+        elif PROFILE_SAMPLE_EVERY and next(_request_counter) % PROFILE_SAMPLE_EVERY == 0:
+            reason = "sampled"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+        status_code = None
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            try:
+                await run_in_threadpool(save_profile, profile.to_dict(status_code))
+            except OSError:
+                logger.exception("保存性能分析结果失败")
+            else:
+                logger.info(
+                    "已保存请求性能分析 %s %s", profile.method, profile.path,
+                    extra={"profile_id": profile.id, "duration": round(profile.duration, 3), "reason": reason}
+                )
@@ -0,0 +1,212 @@
+import logging
+from ..models.models import Resource, ResourceStatus, ResourceLink
+
+logger = logging.getLogger(__name__)
+
+# 支持的链接类别，返回给前端时按此顺序排列
+LINK_CATEGORIES = [
+    "magnet", "ed2k", "uc", "mobile", "tianyi", "quark",
+    "115", "aliyun", "pikpak", "baidu", "123", "online", "others"
+]
+
+
+def normalize_link(link):
+    """
+    Convert a submitted link (plain URL string or dict) into
+    {"url", "password", "note"}, or None when it has no URL.
+    """
+    if isinstance(link, str):
+        url, password, note = link, "", ""
+    elif isinstance(link, dict):
+        url, password, note = link.get("url"), link.get("password"), link.get("note")
+    else:
+        return None
+    url = (url or "").strip()
+    if not url:
+        return None
+    return {"url": url, "password": password or "", "note": note or ""}
+
+
+def links_from_dict(links):
+    """
+    Yield (category, link) from the {category: [link, ...]} format used by the
+    API, skipping unknown categories and links without a URL.
+    """
+    for category, category_links in (links or {}).items():
+        if category not in LINK_CATEGORIES:
+            logger.warning("忽略无效链接类别 '%s'", category)
+            continue
+        for link in category_links or []:
+            normalized = normalize_link(link)
+            if normalized:
+                yield category, normalized
+
+
+def links_from_list(links):
+    """
+    Yield (category, link) from a list of {"category", "url", "password", "note"}
+    as sent in ResourceApproval.approved_links.
+    """
+    for link_info in links or []:
+        category = link_info.get("category")
+        normalized = normalize_link(link_info)
+        if category not in LINK_CATEGORIES or not normalized:
+            logger.warning("链接信息不完整，跳过: %s", link_info)
+            continue
+        yield category, normalized
+
+
+def find_existing_urls(db, urls, exclude_resource_id=None):
+    """
+    Return the subset of urls that already belong to approved resources
+    (other than exclude_resource_id), using the unique index on approved
+    links. Pending and rejected submissions do not reserve their URLs.
+    """
+    urls = list(urls)
+    if not urls:
+        return set()
+    query = db.query(ResourceLink.url).filter(
+        ResourceLink.url.in_(urls),
+        ResourceLink.approved == True
+    )
+    if exclude_resource_id is not None:
+        query = query.filter(ResourceLink.resource_id != exclude_resource_id)
+    return {url for (url,) in query.all()}
+
+
+def add_links(db, resource_id, items):
+    """
+    Insert (category, link) pairs for a resource. Links whose URL already
+    belongs to an approved resource, to this resource, or appears earlier in
+    items are skipped. The caller commits; when the resource is approved, an
+    approval committed meanwhile may still take one of the URLs, and the
+    unique index then raises IntegrityError. Returns (added, skipped) lists
+    of URLs.
+    """
+    items = list(items)
+    approved = db.query(Resource.status).filter(Resource.id == resource_id).scalar() == ResourceStatus.APPROVED
+    urls = [link["url"] for _, link in items]
+    existing = find_existing_urls(db, urls, exclude_resource_id=resource_id)
+    if urls:
+        existing |= {url for (url,) in db.query(ResourceLink.url).filter(
+            ResourceLink.resource_id == resource_id, ResourceLink.url.in_(urls)
+        ).all()}
+    added, skipped = [], []
+    for category, link in items:
+        if link["url"] in existing:
+            skipped.append(link["url"])
+            continue
+        db.add(ResourceLink(
+            resource_id=resource_id,
+            category=category,
+            url=link["url"],
+            password=link["password"],
+            note=link["note"],
+            approved=approved
+        ))
+        existing.add(link["url"])
+        added.append(link["url"])
+    return added, skipped
+
+
+def replace_links(db, resource_id, items):
+    """
+    Make the resource's links exactly items: rows no longer present are
+    deleted, kept rows get their category/password/note updated, and new
+    URLs are inserted. The caller commits. Returns the skipped URLs that
+    already belong to other approved resources.
+    """
+    items = list(items)
+    current = {link.url: link for link in db.query(ResourceLink).filter(ResourceLink.resource_id == resource_id).all()}
+    wanted = {link["url"] for _, link in items}
+
+    for url, row in current.items():
+        if url not in wanted:
+            db.delete(row)
+
+    new_items = []
+    for category, link in items:
+        row = current.get(link["url"])
+        if row is None:
+            new_items.append((category, link))
+            continue
+        row.category = category
+        row.password = link["password"]
+        row.note = link["note"]
+    db.flush()
+    _, skipped = add_links(db, resource_id, new_items)
+    return skipped
+
+
+def approve_resource_links(db, resource_id):
+    """
+    Mark the resource's links approved when the submission is approved,
+    first deleting those whose URL another approved resource already has
+    (pending submissions may share URLs). The caller commits; an approval
+    of the same URL committed meanwhile makes the unique index raise
+    IntegrityError. Returns the dropped URLs.
+    """
+    rows = db.query(ResourceLink.id, ResourceLink.url).filter(ResourceLink.resource_id == resource_id).all()
+    taken = find_existing_urls(db, (url for _, url in rows), exclude_resource_id=resource_id)
+    dropped = [url for _, url in rows if url in taken]
+    if dropped:
+        db.query(ResourceLink).filter(ResourceLink.id.in_([link_id for link_id, url in rows if url in taken]))\
+            .delete(synchronize_session=False)
+    db.query(ResourceLink).filter(ResourceLink.resource_id == resource_id)\
+        .update({ResourceLink.approved: True}, synchronize_session=False)
+    return dropped
+
+
+def release_resource_links(db, resource_id):
+    """
+    Stop the resource's links from reserving their URLs (the resource is
+    no longer approved). The caller commits.
+    """
+    db.query(ResourceLink).filter(ResourceLink.resource_id == resource_id)\
+        .update({ResourceLink.approved: False}, synchronize_session=False)
+
+
+def delete_resource_links(db, resource_id):
+    db.query(ResourceLink).filter(ResourceLink.resource_id == resource_id).delete(synchronize_session=False)
+
+
+def get_links_map(db, resource_ids):
+    """
+    Load links for several resources in one query and group them into the
+    {resource_id: {category: [{"url", "password", "note", "status", "last_checked_at"}]}}
+    format of the API. Only non-empty categories are included, in
+    LINK_CATEGORIES order.
+    """
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return {}
+    rows = db.query(ResourceLink).filter(ResourceLink.resource_id.in_(resource_ids))\
+        .order_by(ResourceLink.resource_id, ResourceLink.id).all()
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.resource_id, {}).setdefault(row.category, []).append({
+            "url": row.url,
+            "password": row.password or "",
+            "note": row.note or "",
+            "status": row.status or "unknown",
+            "last_checked_at": row.last_checked_at,
+        })
+    order = {category: index for index, category in enumerate(LINK_CATEGORIES)}
+    return {
+        resource_id: dict(sorted(categories.items(), key=lambda item: order.get(item[0], len(order))))
+        for resource_id, categories in grouped.items()
+    }
+
+
+def links_from_map(resource, links_map):
+    """
+    Pick a resource's links out of a get_links_map result.
+    """
+    return links_map.get(resource.id, {})
+
+
+def get_resource_links(db, resource):
+    """
+    Links of a single resource in the API format.
+    """
+    return get_links_map(db, [resource.id]).get(resource.id, {})
@@ -0,0 +1,84 @@
+from ..models.models import Resource, ResourceStatus, ResourceTypeTag, ResourceTypeLink
+
+
+def parse_resource_types(value):
+    """
+    Split the comma-separated resource_type string into unique type names,
+    keeping their original order.
+    """
+    if not value:
+        return []
+    names = []
+    for name in value.replace("，", ",").split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _get_or_create_tag(db, name):
+    tag = db.query(ResourceTypeTag).filter(ResourceTypeTag.name == name).first()
+    if tag is None:
+        tag = ResourceTypeTag(name=name, approved_count=0)
+        db.add(tag)
+        db.flush()
+    return tag
+
+
+def sync_resource_types(db, resource, remove=False):
+    """
+    Bring resource_type_links in line with the resource's current state and
+    adjust the per-type approved_count by the difference. Only approved public
+    resources are linked; with remove=True all links are dropped (used before
+    deleting the resource). The caller commits.
+    """
+    if remove or resource.status != ResourceStatus.APPROVED:
+        desired = set()
+    else:
+        desired = set(parse_resource_types(resource.resource_type))
+
+    current = {
+        name: type_id for type_id, name in
+        db.query(ResourceTypeLink.type_id, ResourceTypeTag.name)
+        .join(ResourceTypeTag, ResourceTypeTag.id == ResourceTypeLink.type_id)
+        .filter(ResourceTypeLink.resource_id == resource.id).all()
+    }
+
+    for name in desired - set(current):
+        tag = _get_or_create_tag(db, name)
+        db.add(ResourceTypeLink(resource_id=resource.id, type_id=tag.id))
+        db.query(ResourceTypeTag).filter(ResourceTypeTag.id == tag.id)\
+            .update({ResourceTypeTag.approved_count: ResourceTypeTag.approved_count + 1}, synchronize_session=False)
+
+    for name in set(current) - desired:
+        type_id = current[name]
+        db.query(ResourceTypeLink).filter(
+            ResourceTypeLink.resource_id == resource.id,
+            ResourceTypeLink.type_id == type_id
+        ).delete(synchronize_session=False)
+        db.query(ResourceTypeTag).filter(ResourceTypeTag.id == type_id)\
+            .update({ResourceTypeTag.approved_count: ResourceTypeTag.approved_count - 1}, synchronize_session=False)
+
+
+def ensure_resource_types(db):
+    """
+    Fill the type tables from the approved resources when they are empty
+    (database created by create_all rather than the migration).
+    """
+    if db.query(ResourceTypeLink).first() is not None:
+        return 0
+    resources = db.query(Resource).filter(Resource.status == ResourceStatus.APPROVED).all()
+    for resource in resources:
+        sync_resource_types(db, resource)
+    db.commit()
+    return len(resources)
+
+
+def get_type_facets(db):
+    """
+    Return [{"type", "count"}] for every type with approved resources,
+    read from the precomputed counters.
+    """
+    tags = db.query(ResourceTypeTag).filter(ResourceTypeTag.approved_count > 0)\
+        .order_by(ResourceTypeTag.approved_count.desc(), ResourceTypeTag.name.asc()).all()
+    return [{"type": tag.name, "count": tag.approved_count} for tag in tags]
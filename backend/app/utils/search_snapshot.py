@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import threading
+from sqlalchemy import func
+from ..models.database import dialect_insert
+from ..models.models import Resource, ResourceStatus, SearchSnapshotItem
+from .title_index import normalize_title
+from .serialization import CachedBody, dumps
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pypinyin 未安装时快照中不包含拼音键
+    lazy_pinyin = None
+
+# 快照代号，随快照格式或版本的来源改变；客户端持有其他代号的快照时重新下载完整快照
+SNAPSHOT_GENERATION = "db1"
+# 后台任务将快照与资源表全量比较的间隔（秒），补上在其他地方修改的资源
+SNAPSHOT_RECONCILE_SECONDS = 300
+
+
+def search_keys(title, title_en):
+    """
+    Normalized titles plus full pinyin and initials of the Chinese title,
+    the strings the client matches search input against.
+    """
+    keys = [normalize_title(title), normalize_title(title_en)]
+    if lazy_pinyin and keys[0]:
+        keys.append("".join(lazy_pinyin(keys[0])))
+        keys.append("".join(lazy_pinyin(keys[0], style=Style.FIRST_LETTER)))
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def snapshot_item(resource_id, title, title_en, resource_type, poster_image, images):
+    return {
+        "id": resource_id,
+        "title": title,
+        "title_en": title_en,
+        "resource_type": resource_type,
+        "keys": search_keys(title, title_en),
+        "poster": poster_image or (images[0] if images else None),
+    }
+
+
+def _approved_items(db, resource_ids=None):
+    query = db.query(
+        Resource.id, Resource.title, Resource.title_en, Resource.resource_type,
+        Resource.poster_image, Resource.images
+    ).filter(Resource.status == ResourceStatus.APPROVED)
+    if resource_ids is not None:
+        query = query.filter(Resource.id.in_(resource_ids))
+    return {row[0]: snapshot_item(*row) for row in query.all()}
+
+
+def _lock(db):
+    # 先执行一条写语句取得数据库写锁，多个进程同时比较时只有一个会写入同一批变化
+    db.query(SearchSnapshotItem).filter(SearchSnapshotItem.resource_id == -1).delete(synchronize_session=False)
+
+
+def _write_changes(db, changes):
+    """
+    Store {resource_id: item or None} under one new version. Runs after
+    _lock, so the maximum read here cannot change before the commit. The
+    caller commits.
+    """
+    if not changes:
+        return
+    version = (db.query(func.max(SearchSnapshotItem.version)).scalar() or 0) + 1
+    for resource_id, item in changes.items():
+        statement = dialect_insert(db, SearchSnapshotItem).values(resource_id=resource_id, version=version, item=item)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[SearchSnapshotItem.resource_id],
+            set_={"version": version, "item": statement.excluded.item}
+        ))
+
+
+def _diff(db, resource_ids=None):
+    items = _approved_items(db, resource_ids)
+    stored = db.query(SearchSnapshotItem.resource_id, SearchSnapshotItem.item)
+    if resource_ids is not None:
+        stored = stored.filter(SearchSnapshotItem.resource_id.in_(resource_ids))
+    stored = dict(stored.all())
+    return {
+        resource_id: items.get(resource_id)
+        for resource_id in set(items) | set(stored)
+        if items.get(resource_id) != stored.get(resource_id)
+    }
+
+
+class SearchSnapshot:
+    """
+    Compact search catalog of approved resources for the client-side
+    search box, kept in the search_snapshot_items table. Every batch of
+    changed or removed resources gets a new version number there, so a
+    client holding version N only needs the rows changed after N, and
+    every worker process computes the same versions, content hashes and
+    deltas. Each process encodes and precompresses the full snapshot once
+    per version and serves it under its content hash.
+
+    Changes are recorded in the same transaction as the resource change;
+    the periodic search_snapshot_reconcile job compares the table with the
+    resources table and picks up anything changed elsewhere. Reading the
+    snapshot never writes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._body = None  # (version, content_hash, CachedBody)
+
+    def record_resource(self, db, resource):
+        """
+        Record the resource's current snapshot item (or its removal when it
+        is not approved). The caller commits.
+        """
+        self._record(db, [resource.id])
+
+    def record_removed(self, db, resource_id):
+        """
+        Record that the resource is being deleted. The caller commits.
+        """
+        stored = db.query(SearchSnapshotItem.item).filter(SearchSnapshotItem.resource_id == resource_id).scalar()
+        if stored is not None:
+            _lock(db)
+            _write_changes(db, {resource_id: None})
+
+    def _record(self, db, resource_ids):
+        db.flush()
+        if not _diff(db, resource_ids):
+            return
+        _lock(db)
+        _write_changes(db, _diff(db, resource_ids))
+
+    def rebuild(self, db):
+        """
+        Compare the stored snapshot with the resources table, store the
+        differences as a new version and commit. Returns the number of
+        changed resources.
+        """
+        if not _diff(db):
+            return 0
+        _lock(db)
+        changes = _diff(db)
+        _write_changes(db, changes)
+        db.commit()
+        if changes:
+            logger.info("搜索快照已更新", extra={"changed": len(changes)})
+        return len(changes)
+
+    def manifest(self, db):
+        """
+        {"version", "generation", "hash"} of the current snapshot; the
+        snapshot itself is fetched by hash.
+        """
+        version, content_hash, _ = self._encoded(db)
+        return {"version": version, "generation": SNAPSHOT_GENERATION, "hash": content_hash}
+
+    def body(self, db, content_hash):
+        """
+        CachedBody of the snapshot with content_hash. The snapshot this
+        process encoded last is served even if a newer version exists (the
+        content matches its hash, and the client catches up with a delta);
+        otherwise the current one is encoded. None when neither matches.
+        """
+        cached = self._body
+        if cached is None or cached[1] != content_hash:
+            cached = self._encoded(db)
+        return cached[2] if content_hash == cached[1] else None
+
+    def _encoded(self, db):
+        version = db.query(func.max(SearchSnapshotItem.version)).scalar() or 0
+        with self._lock:
+            if self._body is None or self._body[0] != version:
+                # 版本和条目来自同一次查询，内容相同的快照在所有进程中编码结果相同
+                rows = db.query(SearchSnapshotItem.version, SearchSnapshotItem.item).all()
+                version = max((row[0] for row in rows), default=0)
+                items = sorted((row[1] for row in rows if row[1] is not None), key=lambda item: item["id"])
+                data = dumps({"version": version, "generation": SNAPSHOT_GENERATION, "items": items})
+                self._body = (version, hashlib.sha256(data).hexdigest()[:16], CachedBody(data))
+            return self._body
+
+    def delta(self, db, since, generation):
+        """
+        Items changed and ids removed after version since. Returns
+        {"full": True, ...} when the client must download the full snapshot
+        instead (other generation, or a version this database never had).
+        """
+        current = db.query(func.max(SearchSnapshotItem.version)).scalar() or 0
+        result = {"version": current, "generation": SNAPSHOT_GENERATION}
+        if generation != SNAPSHOT_GENERATION or since > current or since < 0:
+            return {**result, "full": True}
+        rows = db.query(SearchSnapshotItem.resource_id, SearchSnapshotItem.version, SearchSnapshotItem.item)\
+            .filter(SearchSnapshotItem.version > since).all()
+        upserts = [item for _, _, item in rows if item is not None]
+        removed = [resource_id for resource_id, _, item in rows if item is None]
+        result["version"] = max([current] + [version for _, version, _ in rows])
+        return {**result, "full": False, "upserts": upserts, "removed": removed}
+
+
+search_snapshot = SearchSnapshot()
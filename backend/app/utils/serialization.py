@@ -0,0 +1,233 @@
+import gzip
+import json
+import threading
+import time
+from datetime import date, datetime
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from .cache_versions import VersionWatch, PUBLIC_LIST_VERSION
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库 json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只支持 gzip
+    brotli = None
+
+# 小于该大小的响应不压缩，压缩收益抵不过开销
+COMPRESS_MIN_SIZE = 1024
+# 实时压缩使用较快的级别，缓存的响应只压缩一次，使用较高的级别
+GZIP_LEVEL = 6
+GZIP_CACHED_LEVEL = 9
+BROTLI_QUALITY = 4
+BROTLI_CACHED_QUALITY = 9
+# 公开列表缓存的有效期（秒）和最多缓存的查询数，资源变更时整体失效
+LIST_CACHE_TTL = 30
+LIST_CACHE_MAX_ENTRIES = 256
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript", "image/svg+xml")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化类型 {type(value).__name__}")
+
+
+def dumps(data):
+    """
+    Encode data as UTF-8 JSON bytes, with orjson when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def resource_to_dict(resource, links, poster_placeholder=None, skipped_links=()):
+    """
+    Plain dict with the fields of schemas.Resource, built straight from the
+    ORM row so endpoints skip building and re-validating pydantic models.
+    """
+    return {
+        "id": resource.id,
+        "title": resource.title,
+        "title_en": resource.title_en,
+        "description": resource.description,
+        "resource_type": resource.resource_type,
+        "images": resource.images,
+        "poster_image": resource.poster_image,
+        "links": links,
+        "status": resource.status.value if resource.status is not None else None,
+        "supplement": resource.supplement,
+        "original_resource_id": resource.original_resource_id,
+        "likes_count": resource.likes_count,
+        "hot_score": resource.hot_score,
+        "skipped_links": list(skipped_links),
+        "poster_placeholder": poster_placeholder,
+        "created_at": resource.created_at,
+        "updated_at": resource.updated_at,
+    }
+
+
+def choose_encoding(accept_encoding):
+    """
+    Pick "br" or "gzip" from an Accept-Encoding header, preferring brotli
+    when both are acceptable. Returns None when neither is.
+    """
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding, cached=False):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_CACHED_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+class JSONBytesResponse(Response):
+    """
+    JSON response rendered with dumps(); FastAPI does not re-validate a
+    returned Response, so the content is encoded exactly once.
+    """
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+class CachedBody:
+    """
+    Encoded JSON body plus its gzip/brotli variants, compressed once when
+    the entry is created and served as-is afterwards.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.variants = {}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            self.variants["gzip"] = compress(body, "gzip", cached=True)
+            if brotli is not None:
+                self.variants["br"] = compress(body, "br", cached=True)
+
+    def response(self, request):
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding in self.variants:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.variants[encoding], media_type="application/json", headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    Small TTL cache of CachedBody entries keyed by query parameters.
+    invalidate() drops everything, and is called whenever approved
+    resources change in this process; with a version name, refresh() also
+    drops everything once another process has bumped that version. The
+    TTL bounds staleness of like counts.
+    """
+
+    def __init__(self, ttl=LIST_CACHE_TTL, max_entries=LIST_CACHE_MAX_ENTRIES, version=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._version = VersionWatch(version) if version else None
+
+    def refresh(self, db):
+        if self._version is not None and self._version.changed(db):
+            self.invalidate()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                    del self._entries[oldest]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = {}
+
+
+class CompressionMiddleware:
+    """
+    Compress complete (non-streaming) responses with the best encoding the
+    client accepts. Small bodies, already encoded responses, streams such as
+    SSE and file downloads, and non-text content types are passed through.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "").lower()
+            if (message.get("more_body") or len(body) < self.minimum_size or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+public_list_cache = ResponseCache(version=PUBLIC_LIST_VERSION)
@@ -0,0 +1,306 @@
+import errno
+import mimetypes
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # 未安装 boto3 时只能使用本地存储
+    boto3 = None
+
+# 图片存储后端："local" 为项目根目录下的 assets 目录；
+# "s3" 为 S3 兼容的对象存储（AWS S3、MinIO 等），多台服务器可共享同一份图片
+STORAGE_BACKEND = "local"
+# 本地存储的根目录
+LOCAL_STORAGE_ROOT = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))), "assets")
+# 上传过程中的暂存目录，不在 assets 下，避免未校验完的文件被静态文件服务暴露；
+# 最好与本地存储根目录在同一文件系统上，保存时可以直接原子移动
+LOCAL_STAGING_DIR = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "upload_staging")
+
+# S3 兼容存储的配置，MinIO 等自建服务需要填写 endpoint，如 http://127.0.0.1:9000
+S3_ENDPOINT_URL = None
+S3_BUCKET = "comicmosaic-assets"
+S3_REGION = None
+# 为空时使用 boto3 默认的凭据来源（环境变量、~/.aws/credentials、实例角色）
+S3_ACCESS_KEY = None
+S3_SECRET_KEY = None
+# 桶可公开读取（或前面有CDN）时填写访问地址，图片URL直接指向它；为空时生成预签名URL
+S3_PUBLIC_BASE_URL = None
+S3_PRESIGN_EXPIRES = 3600
+# 超过该大小的文件分片上传/复制，每个分片的大小
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+ASSET_URL_PREFIX = "/assets/"
+
+
+def asset_key(path):
+    """
+    Convert an /assets/... URL path (as stored in the database) into a
+    storage key such as uploads/20240101/<hash>.jpg
+    """
+    return path[len(ASSET_URL_PREFIX):] if path.startswith(ASSET_URL_PREFIX) else path.lstrip("/")
+
+
+def asset_path(key):
+    return f"{ASSET_URL_PREFIX}{key}"
+
+
+class LocalStorage:
+    """
+    Files under a local directory, served by StaticFiles or nginx.
+    """
+
+    is_local = True
+
+    def __init__(self, root, staging_dir=LOCAL_STAGING_DIR):
+        self.root = root
+        self.staging_dir = staging_dir
+        # 旧版本的暂存目录，残留文件由上传会话清理任务删除
+        self.legacy_staging_dirs = [os.path.join(root, "uploads", ".incoming")]
+
+    def local_path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def stat(self, key):
+        """
+        (size, mtime) of a stored file, or None when it does not exist.
+        """
+        try:
+            stat = os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    def touch(self, key):
+        """
+        Refresh the modification time so the GC grace period starts over.
+        Returns False when the file does not exist.
+        """
+        try:
+            os.utime(self.local_path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_file(self, key, source_path, content_type=None):
+        """
+        Move a finished file from the staging directory to key.
+        """
+        dest_path = self.local_path(key)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        try:
+            os.replace(source_path, dest_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # 暂存目录在其他文件系统上：先复制到目标目录下的临时文件再改名，不会出现写了一半的图片
+            file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix=".part")
+            os.close(file_descriptor)
+            try:
+                shutil.copy2(source_path, temp_path)
+                os.replace(temp_path, dest_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            os.remove(source_path)
+
+    def copy(self, source_key, dest_key):
+        """
+        Copy a stored file. Returns False when the source does not exist.
+        """
+        source_path = self.local_path(source_key)
+        if not os.path.isfile(source_path):
+            return False
+        dest_path = self.local_path(dest_key)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copy2(source_path, dest_path)
+        return True
+
+    def delete(self, key):
+        """
+        Delete a stored file and its directory once empty. Returns False
+        when the file did not exist.
+        """
+        file_path = self.local_path(key)
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            return False
+        parent = os.path.dirname(file_path)
+        if parent != self.root and not os.listdir(parent):
+            os.rmdir(parent)
+        return True
+
+    def list(self, prefix):
+        """
+        Yield (key, size, mtime) for every file whose key starts with prefix
+        (a directory such as "uploads/").
+        """
+        top_dir = self.local_path(prefix.rstrip("/"))
+        for directory, _, file_names in os.walk(top_dir):
+            for file_name in file_names:
+                file_path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(file_path, self.root).replace(os.sep, "/")
+                yield key, stat.st_size, stat.st_mtime
+
+    @contextmanager
+    def open_local(self, key):
+        """
+        Yield a local file path with the content of key (None when missing),
+        for code that needs a real file such as Pillow.
+        """
+        file_path = self.local_path(key)
+        yield file_path if os.path.isfile(file_path) else None
+
+    def url(self, key):
+        return asset_path(key)
+
+
+class S3Storage:
+    """
+    Objects in an S3-compatible bucket. Uploads are streamed from the
+    staging file with multipart transfers, approvals copy objects on the
+    server side, and clients fetch images straight from the bucket (public
+    base URL or presigned URL), never through the API workers.
+    """
+
+    is_local = False
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 public_base_url=None, presign_expires=S3_PRESIGN_EXPIRES):
+        if boto3 is None:
+            raise RuntimeError("使用 S3 存储需要安装 boto3")
+        self.bucket = bucket
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+        )
+        self.staging_dir = os.path.join(tempfile.gettempdir(), "comicmosaic-uploads")
+        self.legacy_staging_dirs = []
+
+    @staticmethod
+    def _is_missing(error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def exists(self, key):
+        return self.stat(key) is not None
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def touch(self, key):
+        # 对象不能修改时间，原地复制一次以刷新 LastModified
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket, Key=key,
+                CopySource={"Bucket": self.bucket, "Key": key},
+                MetadataDirective="REPLACE",
+                ContentType=mimetypes.guess_type(key)[0] or "application/octet-stream",
+            )
+        except ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def put_file(self, key, source_path, content_type=None):
+        try:
+            self.client.upload_file(
+                source_path, self.bucket, key,
+                ExtraArgs={"ContentType": content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"},
+                Config=self.transfer_config,
+            )
+        finally:
+            os.remove(source_path)
+
+    def copy(self, source_key, dest_key):
+        try:
+            self.client.copy(
+                {"Bucket": self.bucket, "Key": source_key}, self.bucket, dest_key,
+                Config=self.transfer_config,
+            )
+        except ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def delete(self, key):
+        if not self.exists(key):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        return True
+
+    def list(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"], item["Size"], item["LastModified"].timestamp()
+
+    @contextmanager
+    def open_local(self, key):
+        os.makedirs(self.staging_dir, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.staging_dir, suffix=os.path.splitext(key)[1])
+        os.close(file_descriptor)
+        try:
+            try:
+                self.client.download_file(self.bucket, key, temp_path, Config=self.transfer_config)
+            except ClientError as e:
+                if not self._is_missing(e):
+                    raise
+                yield None
+            else:
+                yield temp_path
+        finally:
+            os.remove(temp_path)
+
+    def url(self, key):
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=self.presign_expires
+        )
+
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(
+            S3_BUCKET,
+            endpoint_url=S3_ENDPOINT_URL,
+            region=S3_REGION,
+            access_key=S3_ACCESS_KEY,
+            secret_key=S3_SECRET_KEY,
+            public_base_url=S3_PUBLIC_BASE_URL,
+        )
+    return LocalStorage(LOCAL_STORAGE_ROOT)
+
+
+storage = create_storage()
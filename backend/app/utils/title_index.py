@@ -0,0 +1,150 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from ..models.models import Resource, ResourceStatus
+from .cache_versions import VersionWatch, SEARCH_INDEX_VERSION
+
+# 相似度达到该值时，提交新资源会被视为重复
+DUPLICATE_SCORE = 0.8
+# 相似资源建议的默认最低相似度
+SUGGEST_MIN_SCORE = 0.3
+
+# 标题中需要去除的标点和空白
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_title(text):
+    """
+    Normalize a title for matching: NFKC (full-width to half-width),
+    lower case, punctuation and whitespace removed.
+    """
+    if not text:
+        return ""
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def title_trigrams(text):
+    """
+    Character trigrams of the normalized title, padded with boundary markers
+    so that short (e.g. two-character Chinese) titles still produce grams.
+    """
+    normalized = normalize_title(text)
+    if not normalized:
+        return frozenset()
+    padded = f"^^{normalized}$"
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TitleIndex:
+    """
+    In-memory trigram index over title/title_en of approved resources.
+    Candidates are found through the inverted index and ranked by the
+    Jaccard similarity of their trigram sets. The process that changes a
+    resource updates its index in place; the others rebuild theirs when
+    the search_index version moves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = VersionWatch(SEARCH_INDEX_VERSION)
+        self._postings = {}  # trigram -> {(resource_id, 0 for title / 1 for title_en)}
+        self._documents = {}  # resource_id -> (title, title_en, (title trigrams, title_en trigrams))
+        self._built_at = None
+
+    def _add(self, resource_id, title, title_en):
+        gram_sets = (title_trigrams(title), title_trigrams(title_en))
+        self._documents[resource_id] = (title, title_en, gram_sets)
+        for field, grams in enumerate(gram_sets):
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add((resource_id, field))
+
+    def _remove(self, resource_id):
+        document = self._documents.pop(resource_id, None)
+        if not document:
+            return
+        for field, grams in enumerate(document[2]):
+            for gram in grams:
+                entries = self._postings.get(gram)
+                if entries:
+                    entries.discard((resource_id, field))
+                    if not entries:
+                        del self._postings[gram]
+
+    def rebuild(self, db):
+        rows = db.query(Resource.id, Resource.title, Resource.title_en).filter(
+            Resource.status == ResourceStatus.APPROVED
+        ).all()
+        with self._lock:
+            self._postings = {}
+            self._documents = {}
+            for resource_id, title, title_en in rows:
+                self._add(resource_id, title, title_en)
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self, db):
+        # 先读版本号再读数据，重建期间提交的修改会在下次检查时发现
+        if self._version.changed(db) or self._built_at is None:
+            self.rebuild(db)
+
+    def sync_resource(self, resource):
+        """
+        Apply one resource's current state: approved public resources are
+        (re)indexed, anything else is removed.
+        """
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(resource.id)
+            if resource.status == ResourceStatus.APPROVED:
+                self._add(resource.id, resource.title, resource.title_en)
+
+    def remove_resource(self, resource_id):
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(resource_id)
+
+    def search(self, db, title, title_en=None, limit=10, min_score=SUGGEST_MIN_SCORE, exclude_id=None):
+        """
+        Return approved resources whose Chinese or English title is similar
+        to title/title_en, as [{"id", "title", "title_en", "score"}] sorted
+        by descending score.
+        """
+        self.ensure_fresh(db)
+        queries = [grams for grams in (title_trigrams(title), title_trigrams(title_en)) if grams]
+        if not queries:
+            return []
+
+        best = {}
+        with self._lock:
+            for query in queries:
+                # 统计每个候选标题与查询共享的三元组数量，即两个三元组集合交集的大小
+                shared = Counter()
+                for gram in query:
+                    for entry in self._postings.get(gram, ()):
+                        shared[entry] += 1
+                for (resource_id, field), common in shared.items():
+                    if resource_id == exclude_id:
+                        continue
+                    grams = self._documents[resource_id][2][field]
+                    score = common / (len(query) + len(grams) - common)
+                    if score > best.get(resource_id, 0):
+                        best[resource_id] = score
+
+            ranked = sorted(
+                ((score, resource_id) for resource_id, score in best.items() if score >= min_score),
+                reverse=True
+            )[:limit]
+            return [
+                {
+                    "id": resource_id,
+                    "title": self._documents[resource_id][0],
+                    "title_en": self._documents[resource_id][1],
+                    "score": round(score, 3),
+                }
+                for score, resource_id in ranked
+            ]
+
+
+title_index = TitleIndex()
@@ -0,0 +1,180 @@
+import os
+import time
+from datetime import datetime, timedelta
+from ..models.database import dialect_insert
+from ..models.models import Resource, ResourceStatus, ImageAsset, StatCounter
+from .storage import storage, asset_path
+from .admin_stats import adjust_stats, STAT_STORAGE_BYTES
+
+# 未被引用的文件至少保留这么久才会被清理，给“已上传但尚未提交资源”的图片留出时间
+GC_GRACE_PERIOD = timedelta(hours=24)
+# 单次清理最多删除的文件数，避免一次清理占用过多I/O
+GC_BATCH_SIZE = 500
+# 报告中最多列出的文件数
+GC_REPORT_SAMPLE_SIZE = 100
+# 参与清理的目录：uploads/YYYYMMDD/ 和 imgs/<resource_id>/
+GC_DIRECTORIES = ("uploads", "imgs")
+
+# 清理统计保存在 stat_counters 表中，所有工作进程和后台任务的清理结果累计在一起
+GC_METRIC_RUNS = "gc_runs"
+GC_METRIC_FILES_DELETED = "gc_files_deleted"
+GC_METRIC_BYTES_RECLAIMED = "gc_bytes_reclaimed"
+GC_METRIC_LAST_DELETED = "gc_last_deleted"
+GC_METRIC_LAST_BYTES_RECLAIMED = "gc_last_bytes_reclaimed"
+GC_METRICS = (
+    GC_METRIC_RUNS, GC_METRIC_FILES_DELETED, GC_METRIC_BYTES_RECLAIMED,
+    GC_METRIC_LAST_DELETED, GC_METRIC_LAST_BYTES_RECLAIMED,
+)
+
+
+def collect_referenced_paths(db):
+    """
+    Build the set of asset paths referenced by any resource through
+    images, poster_image or supplement.images. Rejected resources do not
+    keep their images alive.
+    """
+    referenced = set()
+    rows = db.query(Resource.images, Resource.poster_image, Resource.supplement)\
+        .filter(Resource.status != ResourceStatus.REJECTED).yield_per(1000)
+    for images, poster_image, supplement in rows:
+        if images:
+            referenced.update(img for img in images if isinstance(img, str))
+        if poster_image:
+            referenced.add(poster_image)
+        if isinstance(supplement, dict) and supplement.get("images"):
+            referenced.update(img for img in supplement["images"] if isinstance(img, str))
+    return referenced
+
+
+def iter_asset_files():
+    """
+    Yield (asset_path, key, size, mtime) for every stored image in the
+    GC directories. Hidden files such as in-progress uploads are skipped.
+    """
+    for top in GC_DIRECTORIES:
+        for key, size, mtime in storage.list(f"{top}/"):
+            parts = key.split("/")
+            # 只处理子目录中的文件，顶层的示例文件不参与清理
+            if len(parts) != 3 or any(part.startswith(".") for part in parts):
+                continue
+            yield asset_path(key), key, size, mtime
+
+
+def _forget_deleted_files(db, deleted_paths, stored_by_hash):
+    """
+    Drop the image_assets rows of deleted files. When the row is the only
+    record of its content but another stored copy exists (for example the
+    imgs/ copy of an approved upload), the row is moved to that copy so the
+    hash, placeholder and perceptual hash stay available.
+    """
+    deleted = set(deleted_paths)
+    assets = db.query(ImageAsset).filter(ImageAsset.path.in_(deleted_paths)).all()
+    hashes = {asset.file_hash for asset in assets if asset.file_hash}
+    # 仍有其他登记记录的内容，直接删除本行即可
+    recorded = {file_hash for (file_hash,) in db.query(ImageAsset.file_hash).filter(
+        ImageAsset.file_hash.in_(hashes), ImageAsset.path.notin_(deleted_paths)
+    ).distinct()} if hashes else set()
+
+    released_bytes = 0
+    for asset in assets:
+        if asset.file_hash and asset.file_hash not in recorded:
+            remaining = [path for path in stored_by_hash.get(asset.file_hash, []) if path not in deleted]
+            if remaining:
+                asset.path = remaining[0]
+                recorded.add(asset.file_hash)
+                continue
+        released_bytes += asset.file_size or 0
+        db.delete(asset)
+    adjust_stats(db, {STAT_STORAGE_BYTES: -released_bytes})
+
+
+def _record_gc_run(db, deleted, bytes_reclaimed):
+    """
+    Add one sweep to the GC counters in the caller's transaction. The
+    caller commits.
+    """
+    now = datetime.now()
+    for name, value, accumulate in (
+        (GC_METRIC_RUNS, 1, True),
+        (GC_METRIC_FILES_DELETED, deleted, True),
+        (GC_METRIC_BYTES_RECLAIMED, bytes_reclaimed, True),
+        (GC_METRIC_LAST_DELETED, deleted, False),
+        (GC_METRIC_LAST_BYTES_RECLAIMED, bytes_reclaimed, False),
+    ):
+        statement = dialect_insert(db, StatCounter).values(name=name, value=value, updated_at=now)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[StatCounter.name],
+            set_={"value": StatCounter.value + value if accumulate else value, "updated_at": now}
+        ))
+
+
+def sweep_orphaned_uploads(db, dry_run=True, grace_period=GC_GRACE_PERIOD, batch_size=GC_BATCH_SIZE):
+    """
+    Delete stored images that no resource references and that are older than
+    grace_period, at most batch_size files per call. With dry_run nothing is
+    deleted and the report lists what would be removed.
+    """
+    referenced = collect_referenced_paths(db)
+    cutoff = time.time() - grace_period.total_seconds()
+
+    scanned = 0
+    orphaned = []
+    orphaned_bytes = 0
+    has_more = False
+    stored_by_hash = {}
+    for path, key, size, mtime in iter_asset_files():
+        scanned += 1
+        # 文件以内容哈希命名，记录每个内容的所有副本
+        stored_by_hash.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+        if path in referenced or mtime > cutoff:
+            continue
+        if len(orphaned) >= batch_size:
+            has_more = True
+            continue
+        orphaned.append((path, key, size))
+        orphaned_bytes += size
+
+    deleted = 0
+    bytes_reclaimed = 0
+    if not dry_run:
+        deleted_paths = []
+        for path, key, size in orphaned:
+            # 本地存储会同时删除空的日期目录或资源目录
+            if not storage.delete(key):
+                continue
+            deleted += 1
+            bytes_reclaimed += size
+            deleted_paths.append(path)
+
+        if deleted_paths:
+            _forget_deleted_files(db, deleted_paths, stored_by_hash)
+        _record_gc_run(db, deleted, bytes_reclaimed)
+        db.commit()
+
+    return {
+        "dry_run": dry_run,
+        "scanned": scanned,
+        "referenced": len(referenced),
+        "orphaned": len(orphaned),
+        "orphaned_bytes": orphaned_bytes,
+        "deleted": deleted,
+        "bytes_reclaimed": bytes_reclaimed,
+        "has_more": has_more,
+        "files": [path for path, _, _ in orphaned[:GC_REPORT_SAMPLE_SIZE]],
+    }
+
+
+def get_gc_metrics(db):
+    counters = {
+        counter.name: counter
+        for counter in db.query(StatCounter).filter(StatCounter.name.in_(GC_METRICS))
+    }
+    runs = counters.get(GC_METRIC_RUNS)
+    return {
+        "runs": runs.value if runs else 0,
+        "files_deleted": counters[GC_METRIC_FILES_DELETED].value if GC_METRIC_FILES_DELETED in counters else 0,
+        "bytes_reclaimed": counters[GC_METRIC_BYTES_RECLAIMED].value if GC_METRIC_BYTES_RECLAIMED in counters else 0,
+        "last_run_at": runs.updated_at.isoformat() if runs and runs.updated_at else None,
+        "last_deleted": counters[GC_METRIC_LAST_DELETED].value if GC_METRIC_LAST_DELETED in counters else 0,
+        "last_bytes_reclaimed": counters[GC_METRIC_LAST_BYTES_RECLAIMED].value if GC_METRIC_LAST_BYTES_RECLAIMED in counters else 0,
+    }
@@ -0,0 +1,455 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from ..models.models import ImageAsset, UploadSession
+from .image_utils import calculate_file_hash
+from .storage import storage, asset_key, asset_path
+from .perceptual_hash import compute_dhash
+from .admin_stats import adjust_stats, STAT_STORAGE_BYTES
+
+# 单张图片的最大字节数
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+# 每次从上传流中读取的块大小
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# 用于识别图片尺寸的头部字节数，JPEG 的 SOF 段可能位于较大的 EXIF 之后
+IMAGE_HEADER_BYTES = 256 * 1024
+# multipart 表单本身的额外开销（边界、字段头等）
+MULTIPART_OVERHEAD = 64 * 1024
+# 分片上传时单个分片的最大字节数
+MAX_CHUNK_SIZE = 2 * 1024 * 1024
+# 分片上传会话在最后一次活动后的保留时长
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+# 清理过期上传会话和残留分片文件的间隔（秒）
+UPLOAD_SESSION_CLEANUP_SECONDS = 3600
+# 上传暂存文件只在单次请求中使用，超过该时长仍存在的是进程异常退出后的残留，清理时删除
+STAGING_FILE_TTL = timedelta(hours=1)
+# 分片上传的临时文件目录（不在 assets 下，避免被静态文件服务暴露）
+UPLOAD_SESSION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "upload_sessions")
+# 批量上传单次最多包含的文件数
+MAX_BATCH_FILES = 20
+# 批量上传时同时处理的文件数
+BATCH_UPLOAD_CONCURRENCY = 4
+# 上传前哈希预检单次最多查询的哈希数
+MAX_HASH_CHECK = 100
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# 允许上传的图片格式：文件魔数 -> (扩展名, MIME类型)
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", ".png", "image/png"),
+    (b"GIF87a", ".gif", "image/gif"),
+    (b"GIF89a", ".gif", "image/gif"),
+    (b"BM", ".bmp", "image/bmp"),
+]
+
+
+def sniff_image_type(head):
+    """
+    Detect the image format from its magic bytes.
+    Returns (extension, mime_type) or None when the data is not a supported image.
+    """
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp", "image/webp"
+    for signature, extension, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension, mime_type
+    return None
+
+
+def read_image_size(head, extension):
+    """
+    Read (width, height) from the image header without decoding pixels.
+    Returns None when the header does not contain the dimensions.
+    """
+    try:
+        if extension == ".png" and len(head) >= 24:
+            return struct.unpack(">II", head[16:24])
+        if extension == ".gif" and len(head) >= 10:
+            return struct.unpack("<HH", head[6:10])
+        if extension == ".bmp" and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if extension == ".webp" and len(head) >= 30:
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                width = int.from_bytes(head[24:27], "little") + 1
+                height = int.from_bytes(head[27:30], "little") + 1
+                return width, height
+        if extension == ".jpg":
+            return _read_jpeg_size(head)
+    except struct.error:
+        return None
+    return None
+
+
+def _read_jpeg_size(head):
+    # 跳过 SOI，逐段查找 SOF 标记
+    offset = 2
+    while offset + 9 < len(head):
+        if head[offset] != 0xFF:
+            offset += 1
+            continue
+        marker = head[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+        if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + segment_length
+    return None
+
+
+def save_upload_stream(source, upload_prefix, max_size=MAX_IMAGE_SIZE):
+    """
+    Stream an uploaded file into storage under upload_prefix, named by its
+    SHA-256 hash.
+
+    The file is staged locally while it is read: the first chunk is sniffed
+    for image magic bytes and the copy is aborted as soon as max_size is
+    crossed, so non-images and oversized files never reach storage. Returns
+    a dict describing the stored file.
+    """
+    os.makedirs(storage.staging_dir, exist_ok=True)
+    temp_path = os.path.join(storage.staging_dir, f".{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256()
+    head = b""
+    image_type = None
+    size = 0
+
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f"图片大小不能超过 {max_size // (1024 * 1024)}MB")
+                if len(head) < IMAGE_HEADER_BYTES:
+                    head += chunk[:IMAGE_HEADER_BYTES - len(head)]
+                if image_type is None:
+                    image_type = sniff_image_type(head)
+                    if image_type is None and len(head) >= 12:
+                        raise HTTPException(status_code=415, detail="仅支持上传 JPG、PNG、GIF、WEBP、BMP 格式的图片")
+                hasher.update(chunk)
+                buffer.write(chunk)
+
+        if image_type is None:
+            raise HTTPException(status_code=415, detail="仅支持上传 JPG、PNG、GIF、WEBP、BMP 格式的图片")
+
+        extension, mime_type = image_type
+        file_hash = hasher.hexdigest()
+        file_name = f"{file_hash}{extension}"
+        # 感知哈希用于发现重新编码或缩放过的重复图片，在文件仍在本地时计算
+        phash = compute_dhash(temp_path)
+        key = f"{upload_prefix}/{file_name}"
+        storage.put_file(key, temp_path, content_type=mime_type)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    dimensions = read_image_size(head, extension)
+    return {
+        "file_hash": file_hash,
+        "file_name": file_name,
+        "path": asset_path(key),
+        "mime_type": mime_type,
+        "file_size": size,
+        "width": dimensions[0] if dimensions else None,
+        "height": dimensions[1] if dimensions else None,
+        "phash": phash,
+    }
+
+
+def describe_image_file(file_path, path):
+    """
+    Build the same metadata dict as save_upload_stream for a file that is
+    already stored at path (file_path is a local copy of it). Returns None
+    when the file is not a supported image.
+    """
+    with open(file_path, "rb") as source:
+        head = source.read(IMAGE_HEADER_BYTES)
+        image_type = sniff_image_type(head)
+        if image_type is None:
+            return None
+        source.seek(0)
+        file_hash = calculate_file_hash(source)
+    extension, mime_type = image_type
+    dimensions = read_image_size(head, extension)
+    return {
+        "file_hash": file_hash,
+        "file_name": os.path.basename(path),
+        "path": path,
+        "mime_type": mime_type,
+        "file_size": os.path.getsize(file_path),
+        "width": dimensions[0] if dimensions else None,
+        "height": dimensions[1] if dimensions else None,
+        "phash": compute_dhash(file_path),
+    }
+
+
+def get_daily_upload_prefix():
+    """
+    Storage key prefix for today's uploads, uploads/YYYYMMDD
+    """
+    return f"uploads/{datetime.now().strftime('%Y%m%d')}"
+
+
+def register_upload(db, info):
+    """
+    Register a file saved by save_upload_stream. If the server already has an
+    image with the same content, the existing file is reused and the fresh
+    copy is removed. Returns (path, reused_existing).
+    """
+    file_path = info["path"]
+    existing = find_existing_asset(db, info["file_hash"])
+    if existing and existing.path != file_path:
+        storage.delete(asset_key(file_path))
+        return existing.path, True
+
+    # 记录图片元数据（哈希、大小、尺寸），后续处理无需再解码整张图片
+    register_image_asset(db, file_path, info)
+    return file_path, False
+
+
+def get_upload_session_file(upload_id):
+    return os.path.join(UPLOAD_SESSION_DIR, f"{upload_id}.part")
+
+
+def expire_upload_sessions(db):
+    """
+    Delete upload sessions that have been inactive past their expiry,
+    together with their partial files, and partial files older than the
+    session TTL that no session refers to (left by a crash). Staging files
+    older than STAGING_FILE_TTL are removed as well. Returns the number of
+    sessions removed.
+    """
+    now = datetime.now()
+    expired_ids = [upload_id for (upload_id,) in
+                   db.query(UploadSession.id).filter(UploadSession.expires_at < now).all()]
+    for upload_id in expired_ids:
+        _remove_file(get_upload_session_file(upload_id))
+    if expired_ids:
+        # 多个进程可能同时清理，按ID批量删除，已被删除的行直接跳过
+        db.query(UploadSession).filter(UploadSession.id.in_(expired_ids))\
+            .delete(synchronize_session=False)
+        db.commit()
+
+    if os.path.isdir(UPLOAD_SESSION_DIR):
+        active = {upload_id for (upload_id,) in db.query(UploadSession.id).all()}
+        cutoff = time.time() - UPLOAD_SESSION_TTL.total_seconds()
+        for entry in os.scandir(UPLOAD_SESSION_DIR):
+            if not entry.name.endswith(".part") or entry.name[:-len(".part")] in active:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    _remove_file(entry.path)
+            except FileNotFoundError:
+                pass
+
+    _sweep_staging_files(time.time() - STAGING_FILE_TTL.total_seconds())
+    return len(expired_ids)
+
+
+def _sweep_staging_files(cutoff):
+    for directory in (storage.staging_dir, *storage.legacy_staging_dirs):
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    _remove_file(entry.path)
+            except FileNotFoundError:
+                pass
+    for directory in storage.legacy_staging_dirs:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def register_image_asset(db, path, info):
+    """
+    Record (or refresh) the image_assets row for a stored file so later
+    pipelines can read its hash, size and dimensions without touching the file.
+    """
+    asset = db.query(ImageAsset).filter(ImageAsset.path == path).first()
+    if asset is None:
+        asset = ImageAsset(path=path)
+        db.add(asset)
+    adjust_stats(db, {STAT_STORAGE_BYTES: info["file_size"] - (asset.file_size or 0)})
+    asset.file_hash = info["file_hash"]
+    asset.mime_type = info["mime_type"]
+    asset.file_size = info["file_size"]
+    asset.width = info["width"]
+    asset.height = info["height"]
+    asset.phash = info.get("phash")
+    db.commit()
+    return asset
+
+
+def register_asset_copy(db, source_path, path):
+    """
+    Record a copy of an already registered image (e.g. the imgs/ copy made
+    on approval) with the same hash, size, dimensions and placeholders, so
+    the content stays registered after the original is reclaimed. The
+    caller commits.
+    """
+    if db.query(ImageAsset.id).filter(ImageAsset.path == path).first():
+        return
+    file_hash = os.path.splitext(os.path.basename(source_path))[0]
+    source = db.query(ImageAsset).filter(ImageAsset.path == source_path).first() or \
+        db.query(ImageAsset).filter(ImageAsset.file_hash == file_hash).order_by(ImageAsset.id.asc()).first()
+    if source is None:
+        return
+    db.add(ImageAsset(
+        path=path, file_hash=source.file_hash, mime_type=source.mime_type, file_size=source.file_size,
+        width=source.width, height=source.height, phash=source.phash,
+        blurhash=source.blurhash, dominant_color=source.dominant_color,
+    ))
+    adjust_stats(db, {STAT_STORAGE_BYTES: source.file_size or 0})
+
+
+def find_existing_asset(db, file_hash):
+    """
+    Return the oldest ImageAsset whose file with the given content hash is
+    still in storage, or None. Reusing it adds a reference that is only
+    saved later with the resource, so the file's mtime is refreshed to
+    restart upload_gc's GC_GRACE_PERIOD in the meantime.
+    """
+    assets = db.query(ImageAsset).filter(ImageAsset.file_hash == file_hash)\
+        .order_by(ImageAsset.id.asc()).all()
+    for asset in assets:
+        if storage.touch(asset_key(asset.path)):
+            return asset
+    return None
+
+
+def find_existing_assets(db, file_hashes):
+    """
+    Batch form of find_existing_asset: map every hash the server already
+    has a stored file for to its oldest ImageAsset, using one query on the
+    file_hash index. Hashes without a file on disk are left out.
+    """
+    found = {}
+    if not file_hashes:
+        return found
+    assets = db.query(ImageAsset).filter(ImageAsset.file_hash.in_(file_hashes))\
+        .order_by(ImageAsset.id.asc()).all()
+    for asset in assets:
+        if asset.file_hash in found:
+            continue
+        if storage.touch(asset_key(asset.path)):
+            found[asset.file_hash] = asset
+    return found
+
+
+class RequestTooLarge(HTTPException):
+    def __init__(self, limit):
+        super().__init__(status_code=413, detail=f"请求体不能超过 {limit // (1024 * 1024)}MB")
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects oversized upload requests before and while
+    the body is streamed, instead of after it has been spooled to disk.
+
+    limits maps a path prefix to the maximum request body size in bytes.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, path):
+        # 取最长匹配的前缀，使更具体的路径可以覆盖通用限制
+        matched = None
+        for prefix, limit in self.limits.items():
+            if path.startswith(prefix) and (matched is None or len(prefix) > len(matched[0])):
+                matched = (prefix, limit)
+        return matched[1] if matched else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        # 先检查 Content-Length，超出限制时直接拒绝，不读取请求体
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    await self._reject(send, 400, "无效的 Content-Length")
+                    return
+                if content_length > limit:
+                    await self._reject(send, 413, RequestTooLarge(limit).detail)
+                    return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestTooLarge(limit)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestTooLarge as exc:
+            # 请求体在传输途中超出限制，中止读取
+            if not response_started:
+                await self._reject(send, 413, exc.detail)
+
+    async def _reject(self, send, status_code, detail):
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,68 @@
+"""
+生产环境启动脚本：gunicorn 主进程预加载应用（启动时的建表、初始化只执行一次），
+再 fork 出多个 uvicorn 工作进程。开发环境请继续使用 run.py。
+
+平滑重启（处理中的请求不会中断）：
+    kill -HUP  $(cat serve.pid)         # 逐个替换工作进程，用于回收内存、重新打开日志
+    kill -USR2 $(cat serve.pid)         # 更新代码后启动新的主进程，新进程就绪后再
+    kill -QUIT $(cat serve.pid.oldbin)  # 让旧主进程处理完请求后退出
+"""
+import argparse
+import multiprocessing
+import os
+from gunicorn.app.base import BaseApplication
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 默认监听地址
+BIND = "0.0.0.0:8000"
+# 工作进程数，默认每个 CPU 一个。
+# 实时事件、图片清理统计保存在数据库中；标题和前缀索引、公开列表缓存按 cache_versions 表的版本号失效，
+# 其他进程最多约1秒后反映审批和修改。定期后台任务只在其中一个进程中运行
+WORKERS = multiprocessing.cpu_count()
+# 平滑重启或停止时，等待处理中请求完成的最长秒数
+GRACEFUL_TIMEOUT = 30
+# 工作进程无响应超过该秒数会被重启
+WORKER_TIMEOUT = 120
+KEEPALIVE = 5
+PID_FILE = os.path.join(BACKEND_DIR, "serve.pid")
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="资源共建平台生产环境启动脚本")
+    parser.add_argument("--bind", default=BIND, help=f"监听地址，默认 {BIND}")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"工作进程数，默认 {WORKERS}（CPU 数）")
+    args = parser.parse_args()
+
+    os.chdir(BACKEND_DIR)
+    ProductionServer({
+        "bind": args.bind,
+        "workers": max(1, args.workers),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        # 主进程导入应用一次，工作进程通过 fork 共享，启动工作只执行一次
+        "preload_app": True,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": WORKER_TIMEOUT,
+        "keepalive": KEEPALIVE,
+        "pidfile": PID_FILE,
+        # 由 nginx 转发的 X-Forwarded-* 头可信
+        "forwarded_allow_ips": "127.0.0.1",
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
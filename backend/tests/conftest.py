@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# 测试从 backend 目录导入 app 包，与 run.py、serve.py 相同
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path):
+    # 每个测试使用独立的临时数据库，不影响 backend 目录中的 resource_hub.db
+    from sqlalchemy import create_engine
+    from app.models.database import Base, SessionLocal
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    session = SessionLocal(bind=engine)
+    yield session
+    session.close()
+    engine.dispose()
@@ -0,0 +1,33 @@
+from app.utils import cache_versions
+from app.utils.cache_versions import VersionWatch, bump_versions
+from app.utils.upload_gc import _record_gc_run, get_gc_metrics
+
+
+def test_watch_reports_versions_bumped_by_other_processes(db, monkeypatch):
+    monkeypatch.setattr(cache_versions, "VERSION_CHECK_SECONDS", 0)
+    watch = VersionWatch("public_list")
+    assert watch.changed(db) is False
+    bump_versions(db, "public_list")
+    db.commit()
+    assert watch.changed(db) is True
+    assert watch.changed(db) is False
+
+
+def test_watch_checks_at_most_once_per_interval(db, monkeypatch):
+    monkeypatch.setattr(cache_versions, "VERSION_CHECK_SECONDS", 3600)
+    watch = VersionWatch("search_index")
+    watch.changed(db)
+    bump_versions(db, "search_index")
+    db.commit()
+    assert watch.changed(db) is False
+
+
+def test_gc_metrics_accumulate_in_stat_counters(db):
+    assert get_gc_metrics(db)["runs"] == 0
+    _record_gc_run(db, 3, 300)
+    _record_gc_run(db, 1, 50)
+    db.commit()
+    metrics = get_gc_metrics(db)
+    assert (metrics["runs"], metrics["files_deleted"], metrics["bytes_reclaimed"]) == (2, 4, 350)
+    assert (metrics["last_deleted"], metrics["last_bytes_reclaimed"]) == (1, 50)
+    assert metrics["last_run_at"] is not None
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("jose")
+
+from app.models.models import Event, User
+from app.utils.auth import EVENT_TICKET_PURPOSE, create_access_token, create_event_ticket, get_user_from_token
+from app.utils.event_bus import EventBus
+
+
+@pytest.fixture
+def admin(db):
+    user = User(username="admin", hashed_password="x", is_admin=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_ticket_only_opens_the_event_stream(db, admin):
+    ticket = create_event_ticket(admin)
+    assert get_user_from_token(db, ticket, purpose=EVENT_TICKET_PURPOSE).id == admin.id
+    # 票据不能当作登录令牌使用
+    assert get_user_from_token(db, ticket) is None
+
+
+def test_login_token_is_not_a_ticket(db, admin):
+    token = create_access_token({"sub": admin.username})
+    assert get_user_from_token(db, token).id == admin.id
+    assert get_user_from_token(db, token, purpose=EVENT_TICKET_PURPOSE) is None
+
+
+def test_publish_is_part_of_the_callers_transaction(db):
+    bus = EventBus()
+    bus.publish(db, "likes", "likes_changed", resource_id=1, likes_count=2)
+    db.rollback()
+    assert db.query(Event).count() == 0
+
+    bus.publish(db, "likes", "likes_changed", resource_id=1, likes_count=2)
+    db.commit()
+    event = db.query(Event).one()
+    assert event.channel == "likes"
+    assert event.payload["type"] == "likes_changed" and event.payload["likes_count"] == 2
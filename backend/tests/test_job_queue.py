@@ -0,0 +1,48 @@
+import pytest
+
+from app.models.models import Job, User
+from app.utils import job_queue
+from app.utils.job_queue import JOB_FAILED, JOB_QUEUED, enqueue_job
+
+
+@pytest.fixture
+def wakes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(job_queue.job_workers, "wake", lambda: calls.append(True))
+    return calls
+
+
+def test_job_is_committed_by_the_caller(db, wakes):
+    job = enqueue_job(db, "noop", {"value": 1}, idempotency_key="noop:1")
+    assert job.id is not None and wakes == []
+    db.rollback()
+    assert db.query(Job).count() == 0 and wakes == []
+
+    enqueue_job(db, "noop", {"value": 1}, idempotency_key="noop:1")
+    db.commit()
+    assert db.query(Job).count() == 1 and wakes == [True]
+
+
+def test_existing_key_keeps_the_callers_pending_changes(db, wakes):
+    enqueue_job(db, "noop", idempotency_key="noop:1")
+    db.commit()
+
+    db.add(User(username="admin", hashed_password="x"))
+    db.flush()
+    first = db.query(Job).one()
+    assert enqueue_job(db, "noop", idempotency_key="noop:1").id == first.id
+    db.commit()
+    assert db.query(User).count() == 1
+    assert db.query(Job).count() == 1
+
+
+def test_failed_job_is_requeued(db, wakes):
+    job = enqueue_job(db, "noop", idempotency_key="noop:1")
+    job.status = JOB_FAILED
+    job.attempts = job.max_attempts
+    db.commit()
+
+    again = enqueue_job(db, "noop", idempotency_key="noop:1")
+    db.commit()
+    assert again.id == job.id
+    assert (again.status, again.attempts, again.finished_at) == (JOB_QUEUED, 0, None)
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app.utils import link_checker
+from app.utils.link_checker import HostRateLimiter, check_url, create_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # 路径 -> (状态码, 响应头, 响应体)
+    routes = {
+        "/ok": (200, {}, "<html>分享的文件</html>"),
+        "/missing": (404, {}, "not found"),
+        "/gone": (410, {}, "gone"),
+        "/expired": (200, {}, "<html>啊哦，你所访问的页面不存在了</html>"),
+        "/server-error": (500, {}, "error"),
+        "/to-missing": (302, {"Location": "/missing"}, ""),
+        "/to-ok": (301, {"Location": "/ok"}, ""),
+        "/loop": (302, {"Location": "/loop"}, ""),
+    }
+
+    def do_GET(self):
+        status, headers, body = self.routes.get(self.path, (404, {}, ""))
+        data = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def allow_stub(monkeypatch):
+    monkeypatch.setattr(link_checker, "LINK_CHECK_ALLOWED_HOSTS", {"127.0.0.1"})
+
+
+def check(url):
+    async def run():
+        async with create_client() as client:
+            return await check_url(client, HostRateLimiter(interval=0), url)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/ok", ("ok", 200)),
+    ("/missing", ("dead", 404)),
+    ("/gone", ("dead", 410)),
+    ("/expired", ("dead", 200)),
+    ("/server-error", ("error", 500)),
+    ("/to-missing", ("dead", 404)),
+    ("/to-ok", ("ok", 200)),
+    ("/loop", ("error", None)),
+])
+def test_check_url_classifies_stub_responses(stub_server, allow_stub, path, expected):
+    assert check(stub_server + path) == expected
+
+
+def test_non_public_hosts_are_refused_by_default(stub_server):
+    assert check(stub_server + "/ok") == ("error", None)
+
+
+def test_allow_list_is_matched_per_hop(stub_server, allow_stub, monkeypatch):
+    # localhost 同样指向本机，但不在允许列表中，重定向过去时被拒绝
+    port = stub_server.rsplit(":", 1)[1]
+    monkeypatch.setitem(StubHandler.routes, "/to-localhost", (302, {"Location": f"http://localhost:{port}/ok"}, ""))
+    assert check(stub_server + "/to-localhost") == ("error", None)
+
+
+def test_rate_limiter_prunes_past_slots(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(link_checker.time, "monotonic", lambda: now[0])
+    limiter = HostRateLimiter(interval=1.0)
+    for index in range(50):
+        asyncio.run(limiter.wait(f"host{index}.example"))
+    assert len(limiter._next_slot) == 50
+    now[0] += 5
+    asyncio.run(limiter.wait("other.example"))
+    assert list(limiter._next_slot) == ["other.example"]
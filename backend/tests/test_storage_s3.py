@@ -0,0 +1,91 @@
+import os
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from app.utils import storage as storage_module
+from app.utils.storage import S3Storage
+
+BUCKET = "comicmosaic-test"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    # moto 在进程内模拟 S3，不访问网络
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    # 缩小分片阈值，让大文件走分片上传和分片复制
+    monkeypatch.setattr(storage_module, "S3_MULTIPART_THRESHOLD", 5 * 1024 * 1024)
+    monkeypatch.setattr(storage_module, "S3_MULTIPART_CHUNK_SIZE", 5 * 1024 * 1024)
+    with moto.mock_aws():
+        backend = S3Storage(BUCKET, region="us-east-1")
+        backend.client.create_bucket(Bucket=BUCKET)
+        yield backend
+
+
+def staged(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_put_stat_and_open_local(s3, tmp_path):
+    source = staged(tmp_path, "a.jpg", b"jpeg-bytes")
+    s3.put_file("uploads/20240101/a.jpg", source)
+
+    assert not os.path.exists(source)
+    assert s3.stat("uploads/20240101/a.jpg")[0] == len(b"jpeg-bytes")
+    head = s3.client.head_object(Bucket=BUCKET, Key="uploads/20240101/a.jpg")
+    assert head["ContentType"] == "image/jpeg"
+    with s3.open_local("uploads/20240101/a.jpg") as path:
+        assert open(path, "rb").read() == b"jpeg-bytes"
+    assert not os.path.exists(path)
+
+
+def test_missing_objects(s3):
+    assert s3.stat("uploads/missing.jpg") is None
+    assert s3.exists("uploads/missing.jpg") is False
+    assert s3.copy("uploads/missing.jpg", "imgs/1/missing.jpg") is False
+    assert s3.delete("uploads/missing.jpg") is False
+    assert s3.touch("uploads/missing.jpg") is False
+    with s3.open_local("uploads/missing.jpg") as path:
+        assert path is None
+
+
+def test_multipart_put_and_copy(s3, tmp_path):
+    data = os.urandom(6 * 1024 * 1024)
+    s3.put_file("uploads/20240101/big.png", staged(tmp_path, "big.png", data))
+
+    assert s3.copy("uploads/20240101/big.png", "imgs/7/big.png") is True
+    body = s3.client.get_object(Bucket=BUCKET, Key="imgs/7/big.png")["Body"].read()
+    assert body == data
+
+
+def test_list_and_delete(s3, tmp_path):
+    for name in ("a.jpg", "b.jpg"):
+        s3.put_file(f"uploads/20240101/{name}", staged(tmp_path, name, b"x" * 3))
+    s3.put_file("imgs/1/c.jpg", staged(tmp_path, "c.jpg", b"y"))
+
+    listed = sorted((key, size) for key, size, _ in s3.list("uploads/"))
+    assert listed == [("uploads/20240101/a.jpg", 3), ("uploads/20240101/b.jpg", 3)]
+
+    assert s3.delete("uploads/20240101/a.jpg") is True
+    assert [key for key, _, _ in s3.list("uploads/")] == ["uploads/20240101/b.jpg"]
+
+
+def test_presigned_and_public_urls(s3, tmp_path):
+    s3.put_file("imgs/1/a.jpg", staged(tmp_path, "a.jpg", b"z"))
+
+    url = urlparse(s3.url("imgs/1/a.jpg"))
+    query = parse_qs(url.query)
+    assert (url.netloc.split(".")[0], url.path) == (BUCKET, "/imgs/1/a.jpg")
+    assert "Signature" in query
+    assert abs(int(query["Expires"][0]) - time.time() - s3.presign_expires) < 60
+
+    s3.public_base_url = "https://cdn.example.com/assets"
+    assert s3.url("imgs/1/a.jpg") == "https://cdn.example.com/assets/imgs/1/a.jpg"
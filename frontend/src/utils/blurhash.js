@@ -0,0 +1,98 @@
+// BlurHash 解码，与后端 app/utils/image_placeholder.py 的编码对应（算法见 github.com/woltapp/blurhash）
+const BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+const decode83 = (text) => {
+  let value = 0
+  for (const char of text) {
+    value = value * 83 + BASE83.indexOf(char)
+  }
+  return value
+}
+
+const sRGBToLinear = (value) => {
+  const v = value / 255
+  return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4)
+}
+
+const linearToSRGB = (value) => {
+  const v = Math.max(0, Math.min(1, value))
+  return v <= 0.0031308
+    ? Math.trunc(v * 12.92 * 255 + 0.5)
+    : Math.trunc((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255 + 0.5)
+}
+
+const signPow = (value, exponent) => Math.sign(value) * Math.pow(Math.abs(value), exponent)
+
+// 解码为 width x height 的 RGBA 像素
+export const decodeBlurHash = (hash, width, height) => {
+  const sizeFlag = decode83(hash[0])
+  const numY = Math.floor(sizeFlag / 9) + 1
+  const numX = (sizeFlag % 9) + 1
+  if (hash.length !== 4 + 2 * numX * numY) {
+    throw new Error('无效的 BlurHash')
+  }
+
+  const maximumValue = (decode83(hash[1]) + 1) / 166
+  const colors = []
+  const dc = decode83(hash.substring(2, 6))
+  colors.push([sRGBToLinear(dc >> 16), sRGBToLinear((dc >> 8) & 255), sRGBToLinear(dc & 255)])
+  for (let i = 1; i < numX * numY; i++) {
+    const value = decode83(hash.substring(4 + i * 2, 6 + i * 2))
+    colors.push([
+      signPow((Math.floor(value / 361) - 9) / 9, 2) * maximumValue,
+      signPow(((Math.floor(value / 19) % 19) - 9) / 9, 2) * maximumValue,
+      signPow(((value % 19) - 9) / 9, 2) * maximumValue
+    ])
+  }
+
+  const pixels = new Uint8ClampedArray(width * height * 4)
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x++) {
+      let r = 0
+      let g = 0
+      let b = 0
+      for (let j = 0; j < numY; j++) {
+        const basisY = Math.cos((Math.PI * y * j) / height)
+        for (let i = 0; i < numX; i++) {
+          const basis = Math.cos((Math.PI * x * i) / width) * basisY
+          const color = colors[i + j * numX]
+          r += color[0] * basis
+          g += color[1] * basis
+          b += color[2] * basis
+        }
+      }
+      const offset = 4 * (x + y * width)
+      pixels[offset] = linearToSRGB(r)
+      pixels[offset + 1] = linearToSRGB(g)
+      pixels[offset + 2] = linearToSRGB(b)
+      pixels[offset + 3] = 255
+    }
+  }
+  return pixels
+}
+
+const dataURLCache = new Map()
+
+// 解码为可用作背景图的 data URL，按宽高比生成最长边为 32 像素的小图（浏览器放大后自然模糊）
+export const blurHashToDataURL = (hash, aspectRatio = 1) => {
+  const key = `${hash}:${aspectRatio.toFixed(2)}`
+  if (dataURLCache.has(key)) return dataURLCache.get(key)
+
+  let url = null
+  try {
+    const width = aspectRatio >= 1 ? 32 : Math.max(1, Math.round(32 * aspectRatio))
+    const height = aspectRatio >= 1 ? Math.max(1, Math.round(32 / aspectRatio)) : 32
+    const canvas = document.createElement('canvas')
+    canvas.width = width
+    canvas.height = height
+    const context = canvas.getContext('2d')
+    const imageData = context.createImageData(width, height)
+    imageData.data.set(decodeBlurHash(hash, width, height))
+    context.putImageData(imageData, 0, 0)
+    url = canvas.toDataURL()
+  } catch (e) {
+    console.error('解码占位图失败:', e)
+  }
+  dataURLCache.set(key, url)
+  return url
+}
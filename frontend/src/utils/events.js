@@ -0,0 +1,71 @@
+import axios from 'axios'
+
+// 连接被拒绝（如票据已过期）后重新获取票据再连接的等待时间（毫秒）
+const TICKET_RETRY_DELAY = 5000
+
+// 管理员订阅 review 频道前获取事件流票据（只能用于订阅事件流，60秒后过期），不在地址中暴露登录令牌
+export const getEventTicket = async () => {
+  const response = await axios.post('/api/events/ticket')
+  return response.data.ticket
+}
+
+// 订阅服务器推送的实时事件（Server-Sent Events）
+// channels: 频道列表，如 ['likes']；订阅 review 频道时传入 getTicket，每次连接前获取新票据
+// handlers: { 事件类型: 回调函数 }，回调参数为事件数据
+// 返回带 close() 的订阅对象
+export const subscribeEvents = ({ channels, resourceId = null, getTicket = null }, handlers) => {
+  if (typeof EventSource === 'undefined') {
+    return null
+  }
+
+  let source = null
+  let closed = false
+  let retryTimer = null
+
+  const retry = () => {
+    if (!closed) {
+      retryTimer = setTimeout(connect, TICKET_RETRY_DELAY)
+    }
+  }
+
+  const connect = async () => {
+    const params = new URLSearchParams({ channels: channels.join(',') })
+    if (resourceId) params.append('resource_id', resourceId)
+    if (getTicket) {
+      try {
+        params.append('ticket', await getTicket())
+      } catch (e) {
+        console.error('获取事件流票据失败:', e)
+        retry()
+        return
+      }
+    }
+    if (closed) return
+
+    source = new EventSource(`${axios.defaults.baseURL}/api/events/stream?${params}`)
+    Object.entries(handlers).forEach(([type, handler]) => {
+      source.addEventListener(type, (event) => {
+        try {
+          handler(JSON.parse(event.data))
+        } catch (e) {
+          console.error('处理推送事件失败:', e)
+        }
+      })
+    })
+    // 连接断开时浏览器会自动重连；票据过期后重连会被拒绝，连接关闭，此时换新票据重新连接
+    source.onerror = () => {
+      if (getTicket && source.readyState === EventSource.CLOSED) {
+        retry()
+      }
+    }
+  }
+
+  connect()
+  return {
+    close: () => {
+      closed = true
+      clearTimeout(retryTimer)
+      if (source) source.close()
+    }
+  }
+}
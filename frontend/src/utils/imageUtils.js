@@ -1,3 +1,5 @@
+import axios from 'axios';
+
 /**
  * Image hash utilities for frontend
  */
@@ -43,4 +45,22 @@ export const calculateFileHash = async (file) => {
  */
 export const getFileExtension = (filename) => {
   return filename.substring(filename.lastIndexOf('.'));
-}; 
\ No newline at end of file
+};
+
+/**
+ * Ask the server which of the given files it already stores
+ * @param {File[]} files - The files to check
+ * @returns {Promise<Array<Object|null>>} - For each file, the stored image
+ *   (filename, hash, size, width, height) or null when it must be uploaded
+ */
+export const findKnownImages = async (files) => {
+  const hashes = await Promise.all(files.map(file => calculateFileHash(file)));
+  try {
+    const response = await axios.post('/api/resources/upload-images/check', { hashes });
+    return hashes.map(hash => response.data.known[hash] || null);
+  } catch (error) {
+    // 预检失败时按全部未知处理，照常上传
+    console.error('图片哈希预检失败:', error);
+    return hashes.map(() => null);
+  }
+};
@@ -0,0 +1,76 @@
+import axios from 'axios'
+
+const STORAGE_KEY = 'searchSnapshot'
+
+const readStored = () => {
+  try {
+    return JSON.parse(localStorage.getItem(STORAGE_KEY))
+  } catch (e) {
+    return null
+  }
+}
+
+const store = (snapshot) => {
+  try {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(snapshot))
+  } catch (e) {
+    // 存储空间不足时只在内存中使用
+  }
+}
+
+// 获取版本号和下载快照之间快照可能已更新（哈希返回404），此时重新获取版本号
+const FETCH_FULL_ATTEMPTS = 3
+
+// 下载完整快照：先获取当前版本的内容哈希，再按哈希下载（可被浏览器长期缓存）
+const fetchFull = async () => {
+  for (let attempt = 1; ; attempt++) {
+    const manifest = await axios.get('/api/resources/search-snapshot')
+    try {
+      const response = await axios.get(`/api/resources/search-snapshot/${manifest.data.hash}`)
+      return response.data
+    } catch (err) {
+      if (err.response?.status !== 404 || attempt >= FETCH_FULL_ATTEMPTS) throw err
+    }
+  }
+}
+
+// 已有本地快照时只获取之后的变更
+const applyDelta = async (snapshot) => {
+  const response = await axios.get('/api/resources/search-snapshot/delta', {
+    params: { since: snapshot.version, generation: snapshot.generation }
+  })
+  const delta = response.data
+  if (delta.full) return null
+  if (delta.upserts.length === 0 && delta.removed.length === 0) return snapshot
+
+  const items = new Map(snapshot.items.map(item => [item.id, item]))
+  delta.removed.forEach(id => items.delete(id))
+  delta.upserts.forEach(item => items.set(item.id, item))
+  return { version: delta.version, generation: delta.generation, items: [...items.values()] }
+}
+
+// 加载本地搜索使用的资源快照，每项包含 id、标题、匹配键（规范化标题和拼音）、资源类型和海报
+export const loadSearchSnapshot = async () => {
+  const stored = readStored()
+  let snapshot = null
+  if (stored && stored.items) {
+    try {
+      snapshot = await applyDelta(stored)
+    } catch (e) {
+      console.error('获取搜索快照增量失败:', e)
+      return stored.items
+    }
+  }
+  if (!snapshot) {
+    snapshot = await fetchFull()
+  }
+  if (snapshot !== stored) {
+    store(snapshot)
+  }
+  return snapshot.items
+}
+
+// 与服务器的 normalize_title 一致：全角转半角、小写、去除标点和空白
+export const normalizeSearchText = (text) => {
+  return (text || '').normalize('NFKC').toLowerCase().replace(/[^\p{L}\p{N}]+/gu, '')
+}
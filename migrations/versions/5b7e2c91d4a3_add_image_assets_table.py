@@ -0,0 +1,45 @@
+"""add image_assets table
+
+Revision ID: 5b7e2c91d4a3
+Revises: 040a3dad5962
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c91d4a3'
+down_revision = '040a3dad5962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 记录上传图片的哈希、大小和尺寸，避免后续处理重复解码文件
+    # 应用启动时 create_all 可能已经创建了该表
+    if sa.inspect(op.get_bind()).has_table('image_assets'):
+        return
+    op.create_table(
+        'image_assets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_hash', sa.String(length=64), nullable=True),
+        sa.Column('path', sa.String(), nullable=True),
+        sa.Column('mime_type', sa.String(), nullable=True),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('width', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_image_assets_id', 'image_assets', ['id'], unique=False)
+    op.create_index('ix_image_assets_file_hash', 'image_assets', ['file_hash'], unique=False)
+    op.create_index('ix_image_assets_path', 'image_assets', ['path'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_image_assets_path', table_name='image_assets')
+    op.drop_index('ix_image_assets_file_hash', table_name='image_assets')
+    op.drop_index('ix_image_assets_id', table_name='image_assets')
+    op.drop_table('image_assets')
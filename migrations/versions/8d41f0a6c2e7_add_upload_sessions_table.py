@@ -0,0 +1,41 @@
+"""add upload_sessions table
+
+Revision ID: 8d41f0a6c2e7
+Revises: 5b7e2c91d4a3
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0a6c2e7'
+down_revision = '5b7e2c91d4a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 断点续传的上传会话
+    # 应用启动时 create_all 可能已经创建了该表
+    if sa.inspect(op.get_bind()).has_table('upload_sessions'):
+        return
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('total_size', sa.Integer(), nullable=False),
+        sa.Column('file_hash', sa.String(length=64), nullable=False),
+        sa.Column('received_size', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_expires_at', 'upload_sessions', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_upload_sessions_expires_at', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -0,0 +1,33 @@
+"""add updated_at to image_assets
+
+Revision ID: a4c8e2f6b913
+Revises: f3d9a6b2c871
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e2f6b913'
+down_revision = 'f3d9a6b2c871'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 最近修改时间，内存中的感知哈希索引按此读取补算的哈希和路径变化
+    # 应用启动时 create_all 可能已经创建了包含该列的表
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('image_assets')}
+    if 'updated_at' in columns:
+        return
+    op.add_column('image_assets', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE image_assets SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+    op.create_index('ix_image_assets_updated_at', 'image_assets', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_image_assets_updated_at', table_name='image_assets')
+    with op.batch_alter_table('image_assets') as batch_op:
+        batch_op.drop_column('updated_at')
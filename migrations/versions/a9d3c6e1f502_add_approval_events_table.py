@@ -0,0 +1,208 @@
+"""add approval_events table
+
+Revision ID: a9d3c6e1f502
+Revises: f47a0c3d9b18
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+import json
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3c6e1f502'
+down_revision = 'f47a0c3d9b18'
+branch_labels = None
+depends_on = None
+
+APPROVAL_NOTES_PATTERN = re.compile(r"管理员审批意见: (.+)$", re.S)
+STATUS_NAMES = {"pending": "PENDING", "approved": "APPROVED", "rejected": "REJECTED"}
+
+
+def _load_json(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _insert_event(bind, **values):
+    values.setdefault("notes", None)
+    values.setdefault("images", None)
+    values.setdefault("links", None)
+    values.setdefault("hidden_from_admin", False)
+    values["images"] = json.dumps(values["images"], ensure_ascii=False) if values["images"] is not None else None
+    values["links"] = json.dumps(values["links"], ensure_ascii=False) if values["links"] is not None else None
+    bind.execute(
+        sa.text(
+            "INSERT INTO approval_events (resource_id, event_type, status, title, resource_type, notes, "
+            "images, links, hidden_from_admin, created_at) VALUES (:resource_id, :event_type, :status, "
+            ":title, :resource_type, :notes, :images, :links, :hidden_from_admin, :created_at)"
+        ),
+        values
+    )
+
+
+def _migrate_records(bind, columns):
+    # 已审批/已拒绝的普通资源补一条初始审批记录，审批备注从描述末尾提取
+    supplement_filter = ""
+    if "is_supplement_approval" in columns:
+        supplement_filter = " AND (is_supplement_approval IS NULL OR is_supplement_approval = 0)"
+    rows = bind.execute(sa.text(
+        "SELECT id, title, title_en, resource_type, status, description, images, hidden_from_admin, updated_at "
+        "FROM resources WHERE status IN ('APPROVED', 'REJECTED')" + supplement_filter + " ORDER BY id"
+    )).fetchall()
+    for resource_id, title, title_en, resource_type, status, description, images, hidden, updated_at in rows:
+        match = APPROVAL_NOTES_PATTERN.search(description or "")
+        _insert_event(
+            bind,
+            resource_id=resource_id,
+            event_type="initial",
+            status=status,
+            title=title or title_en,
+            resource_type=resource_type,
+            notes=match.group(1) if match else None,
+            images=_load_json(images),
+            hidden_from_admin=bool(hidden),
+            created_at=updated_at
+        )
+
+    # 旧的 approval_history JSON 中的每一项转为一条补充审批记录
+    if "approval_history" in columns:
+        rows = bind.execute(sa.text(
+            "SELECT id, title, title_en, resource_type, approval_history FROM resources "
+            "WHERE approval_history IS NOT NULL"
+        )).fetchall()
+        for resource_id, title, title_en, resource_type, history in rows:
+            history = _load_json(history)
+            if not isinstance(history, list):
+                continue
+            for entry in history:
+                if not isinstance(entry, dict):
+                    continue
+                status = str(entry.get("status") or "approved")
+                try:
+                    created_at = datetime.fromisoformat(str(entry.get("date") or entry.get("created_at")))
+                except ValueError:
+                    created_at = datetime.now()
+                _insert_event(
+                    bind,
+                    resource_id=resource_id,
+                    event_type="supplement",
+                    status=STATUS_NAMES.get(status.lower(), status.upper()),
+                    title=title or title_en,
+                    resource_type=resource_type,
+                    notes=entry.get("notes") or entry.get("approval_notes"),
+                    images=entry.get("images"),
+                    links=entry.get("links"),
+                    created_at=created_at
+                )
+
+
+def _move_supplement_records(bind):
+    # 补充审批记录行转为补充审批事件，随后从资源表删除
+    rows = bind.execute(sa.text(
+        "SELECT id, original_resource_id, title, title_en, resource_type, status, description, images, links, "
+        "hidden_from_admin, created_at FROM resources WHERE is_supplement_approval = 1 ORDER BY id"
+    )).fetchall()
+    for (record_id, original_id, title, title_en, resource_type, status, description,
+         images, links, hidden, created_at) in rows:
+        notes = re.sub(r"^补充内容审批( - )?", "", description or "").strip()
+        _insert_event(
+            bind,
+            resource_id=original_id or record_id,
+            event_type="supplement",
+            status=status,
+            title=title or title_en,
+            resource_type=resource_type,
+            notes=notes or None,
+            images=_load_json(images),
+            links=_load_json(links),
+            hidden_from_admin=bool(hidden),
+            created_at=created_at
+        )
+    if rows:
+        ids = ",".join(str(row[0]) for row in rows)
+        bind.execute(sa.text(f"DELETE FROM resource_links WHERE resource_id IN ({ids})"))
+        bind.execute(sa.text(f"DELETE FROM resource_type_links WHERE resource_id IN ({ids})"))
+        bind.execute(sa.text(f"DELETE FROM resources WHERE id IN ({ids})"))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 应用启动时 create_all 可能已经创建了该表，此时只需迁移数据
+    if not sa.inspect(bind).has_table('approval_events'):
+        op.create_table(
+            'approval_events',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('resource_id', sa.Integer(), nullable=False),
+            sa.Column('event_type', sa.String(), nullable=False),
+            sa.Column('status', sa.Enum('PENDING', 'APPROVED', 'REJECTED', name='resourcestatus'), nullable=False),
+            sa.Column('title', sa.String(), nullable=True),
+            sa.Column('resource_type', sa.String(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('images', sa.JSON(), nullable=True),
+            sa.Column('links', sa.JSON(), nullable=True),
+            sa.Column('admin_id', sa.Integer(), nullable=True),
+            sa.Column('hidden_from_admin', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_approval_events_id', 'approval_events', ['id'], unique=False)
+        op.create_index('ix_approval_events_created_at', 'approval_events', ['created_at'], unique=False)
+        op.create_index('ix_approval_events_resource_created', 'approval_events', ['resource_id', 'created_at'], unique=False)
+
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('resources')}
+    if not bind.execute(sa.text("SELECT COUNT(*) FROM approval_events")).scalar():
+        _migrate_records(bind, columns)
+    if 'is_supplement_approval' in columns:
+        _move_supplement_records(bind)
+
+    with op.batch_alter_table('resources') as batch_op:
+        if 'approval_history' in columns:
+            batch_op.drop_column('approval_history')
+        if 'is_supplement_approval' in columns:
+            batch_op.drop_column('is_supplement_approval')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('resources') as batch_op:
+        batch_op.add_column(sa.Column('approval_history', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('is_supplement_approval', sa.Boolean(), nullable=True, server_default=sa.false()))
+
+    # 补充审批事件恢复为资源表中的补充审批记录行
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT resource_id, status, title, resource_type, notes, images, links, hidden_from_admin, created_at "
+        "FROM approval_events WHERE event_type = 'supplement' ORDER BY id"
+    )).fetchall()
+    for resource_id, status, title, resource_type, notes, images, links, hidden, created_at in rows:
+        bind.execute(
+            sa.text(
+                "INSERT INTO resources (title, title_en, description, resource_type, status, images, links, "
+                "hidden_from_admin, original_resource_id, is_supplement_approval, likes_count, created_at, updated_at) "
+                "VALUES (:title, :title, :description, :resource_type, :status, :images, :links, :hidden, "
+                ":resource_id, 1, 0, :created_at, :created_at)"
+            ),
+            {
+                "title": title,
+                "description": f"补充内容审批 - {notes}" if notes else "补充内容审批",
+                "resource_type": resource_type,
+                "status": status,
+                "images": images,
+                "links": links,
+                "hidden": hidden,
+                "resource_id": resource_id,
+                "created_at": created_at,
+            }
+        )
+
+    op.drop_index('ix_approval_events_resource_created', table_name='approval_events')
+    op.drop_index('ix_approval_events_created_at', table_name='approval_events')
+    op.drop_index('ix_approval_events_id', table_name='approval_events')
+    op.drop_table('approval_events')
@@ -0,0 +1,47 @@
+"""add approved to resource_links with a partial unique index on url
+
+Revision ID: b3e7f1a9c526
+Revises: f1b4d8e2a637
+Create Date: 2026-10-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7f1a9c526'
+down_revision = 'f1b4d8e2a637'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 链接地址在已审批资源之间的唯一性改由数据库保证：记录所属资源是否已审批，并在已审批的链接上建部分唯一索引
+    # 应用启动时 create_all 可能已经创建了该列和索引，此时只同步已有链接的审批状态
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('resource_links')}
+    indexes = {index['name'] for index in inspector.get_indexes('resource_links')}
+    if 'approved' not in columns:
+        op.add_column('resource_links', sa.Column('approved', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.execute(sa.text(
+        "UPDATE resource_links SET approved = :approved WHERE resource_id IN "
+        "(SELECT id FROM resources WHERE status = 'APPROVED')"
+    ).bindparams(approved=True))
+    # 此前只由应用检查，建索引前每个地址只保留最早的一条已审批链接
+    op.execute(sa.text(
+        "DELETE FROM resource_links WHERE approved = :approved AND id NOT IN "
+        "(SELECT MIN(id) FROM resource_links WHERE approved = :approved GROUP BY url)"
+    ).bindparams(approved=True))
+    if 'ux_resource_links_url_approved' in indexes:
+        return
+    op.create_index(
+        'ux_resource_links_url_approved', 'resource_links', ['url'], unique=True,
+        sqlite_where=sa.text('approved = 1'), postgresql_where=sa.text('approved')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_resource_links_url_approved', table_name='resource_links')
+    with op.batch_alter_table('resource_links') as batch_op:
+        batch_op.drop_column('approved')
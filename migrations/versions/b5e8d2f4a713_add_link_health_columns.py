@@ -0,0 +1,41 @@
+"""add link health columns to resource_links
+
+Revision ID: b5e8d2f4a713
+Revises: a9d3c6e1f502
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8d2f4a713'
+down_revision = 'a9d3c6e1f502'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 链接检测结果，后台任务按 last_checked_at 由旧到新逐批检测
+    # 应用启动时 create_all 可能已经创建了包含这些列的表
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('resource_links')}
+    if 'status' in columns:
+        return
+    with op.batch_alter_table('resource_links') as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(), nullable=False, server_default='unknown'))
+        batch_op.add_column(sa.Column('status_code', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_checked_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('check_failures', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_resource_links_status', ['status'], unique=False)
+        batch_op.create_index('ix_resource_links_last_checked_at', ['last_checked_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('resource_links') as batch_op:
+        batch_op.drop_index('ix_resource_links_last_checked_at')
+        batch_op.drop_index('ix_resource_links_status')
+        batch_op.drop_column('check_failures')
+        batch_op.drop_column('last_checked_at')
+        batch_op.drop_column('status_code')
+        batch_op.drop_column('status')
@@ -0,0 +1,31 @@
+"""add phash to image_assets
+
+Revision ID: c3a9e5d7f215
+Revises: 8d41f0a6c2e7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e5d7f215'
+down_revision = '8d41f0a6c2e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 感知哈希，用于查找重新编码或缩放过的近似重复图片
+    # 应用启动时 create_all 可能已经创建了包含该列的表
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('image_assets')}
+    if 'phash' in columns:
+        return
+    op.add_column('image_assets', sa.Column('phash', sa.String(length=16), nullable=True))
+    op.create_index('ix_image_assets_phash', 'image_assets', ['phash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_image_assets_phash', table_name='image_assets')
+    op.drop_column('image_assets', 'phash')
@@ -0,0 +1,37 @@
+"""add events table
+
+Revision ID: c4d8a2e6f915
+Revises: b3e7f1a9c526
+Create Date: 2026-10-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8a2e6f915'
+down_revision = 'b3e7f1a9c526'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 应用启动时 create_all 可能已经创建了该表
+    if sa.inspect(bind).has_table('events'):
+        return
+    op.create_table(
+        'events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_events_created_at'), 'events', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_events_created_at'), table_name='events')
+    op.drop_table('events')
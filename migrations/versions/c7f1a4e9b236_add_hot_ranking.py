@@ -0,0 +1,52 @@
+"""add hot ranking tables and resources.hot_score
+
+Revision ID: c7f1a4e9b236
+Revises: b5e8d2f4a713
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1a4e9b236'
+down_revision = 'b5e8d2f4a713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # 应用启动时 create_all 可能已经创建了这些表和列
+    if not inspector.has_table('like_buckets'):
+        op.create_table(
+            'like_buckets',
+            sa.Column('resource_id', sa.Integer(), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('delta', sa.Integer(), nullable=False),
+            sa.Column('applied', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('resource_id', 'bucket_start')
+        )
+    if not inspector.has_table('ranking_state'):
+        op.create_table(
+            'ranking_state',
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('computed_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+    columns = {column['name'] for column in inspector.get_columns('resources')}
+    if 'hot_score' not in columns:
+        with op.batch_alter_table('resources') as batch_op:
+            batch_op.add_column(sa.Column('hot_score', sa.Float(), nullable=False, server_default='0'))
+            batch_op.create_index('ix_resources_hot_score', ['hot_score'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('resources') as batch_op:
+        batch_op.drop_index('ix_resources_hot_score')
+        batch_op.drop_column('hot_score')
+    op.drop_table('ranking_state')
+    op.drop_table('like_buckets')
@@ -0,0 +1,48 @@
+"""make resource_links.url unique only among approved resources
+
+Revision ID: c8a2f4e6d917
+Revises: a4c8e2f6b913
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8a2f4e6d917'
+down_revision = 'a4c8e2f6b913'
+branch_labels = None
+depends_on = None
+
+
+def _url_index_unique():
+    for index in sa.inspect(op.get_bind()).get_indexes('resource_links'):
+        if index['name'] == 'ix_resource_links_url':
+            return bool(index['unique'])
+    return None
+
+
+def upgrade() -> None:
+    # 链接只需在已审批资源之间唯一（由应用在提交和审批时检查），待审批和被拒绝的提交不再占用链接
+    unique = _url_index_unique()
+    if unique is False:
+        return
+    if unique:
+        op.drop_index('ix_resource_links_url', table_name='resource_links')
+    op.create_index('ix_resource_links_url', 'resource_links', ['url'], unique=False)
+    # 清理被拒绝的提交遗留的链接
+    op.execute(
+        "DELETE FROM resource_links WHERE resource_id IN "
+        "(SELECT id FROM resources WHERE status = 'REJECTED')"
+    )
+
+
+def downgrade() -> None:
+    # 恢复唯一索引前只保留每个URL最早的一条记录
+    op.execute(
+        "DELETE FROM resource_links WHERE id NOT IN "
+        "(SELECT MIN(id) FROM resource_links GROUP BY url)"
+    )
+    op.drop_index('ix_resource_links_url', table_name='resource_links')
+    op.create_index('ix_resource_links_url', 'resource_links', ['url'], unique=True)
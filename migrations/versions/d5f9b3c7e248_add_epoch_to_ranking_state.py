@@ -0,0 +1,40 @@
+"""add epoch to ranking_state
+
+Revision ID: d5f9b3c7e248
+Revises: c8a2f4e6d917
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f9b3c7e248'
+down_revision = 'c8a2f4e6d917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 热度分数改为相对基准时间存储，衰减不再改写整张资源表
+    # 应用启动时 create_all 可能已经创建了包含该列的表
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('ranking_state')}
+    if 'epoch' in columns:
+        return
+    op.add_column('ranking_state', sa.Column('epoch', sa.DateTime(), nullable=True))
+    # 已有的分数是上次计算时的衰减值，即以上次计算时间为基准
+    op.execute("UPDATE ranking_state SET epoch = computed_at")
+
+
+def downgrade() -> None:
+    # 旧版本按上次计算时间衰减，将分数换算回该时间的衰减值
+    bind = op.get_bind()
+    row = bind.execute(sa.text("SELECT epoch, computed_at FROM ranking_state WHERE name = 'hot'")).fetchone()
+    if row is not None and row[0] is not None:
+        epoch, computed_at = (datetime.fromisoformat(value) if isinstance(value, str) else value for value in row)
+        factor = 0.5 ** ((computed_at - epoch).total_seconds() / (48 * 3600))
+        bind.execute(sa.text("UPDATE resources SET hot_score = hot_score * :factor WHERE hot_score != 0"), {"factor": factor})
+    with op.batch_alter_table('ranking_state') as batch_op:
+        batch_op.drop_column('epoch')
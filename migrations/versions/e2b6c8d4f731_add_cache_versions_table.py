@@ -0,0 +1,33 @@
+"""add cache versions table
+
+Revision ID: e2b6c8d4f731
+Revises: c4d8a2e6f915
+Create Date: 2026-10-22 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6c8d4f731'
+down_revision = 'c4d8a2e6f915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 应用启动时 create_all 可能已经创建了该表；版本号在首次修改时创建
+    if sa.inspect(bind).has_table('cache_versions'):
+        return
+    op.create_table(
+        'cache_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
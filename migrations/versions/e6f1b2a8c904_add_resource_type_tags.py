@@ -0,0 +1,82 @@
+"""add resource type tag tables
+
+Revision ID: e6f1b2a8c904
+Revises: c3a9e5d7f215
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f1b2a8c904'
+down_revision = 'c3a9e5d7f215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 应用启动时 create_all 可能已经创建了这两张表，此时只需迁移数据
+    if not sa.inspect(bind).has_table('resource_types'):
+        op.create_table(
+            'resource_types',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('approved_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_resource_types_id', 'resource_types', ['id'], unique=False)
+        op.create_index('ix_resource_types_name', 'resource_types', ['name'], unique=True)
+        op.create_table(
+            'resource_type_links',
+            sa.Column('resource_id', sa.Integer(), nullable=False),
+            sa.Column('type_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['type_id'], ['resource_types.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('resource_id', 'type_id')
+        )
+        op.create_index('ix_resource_type_links_type_id', 'resource_type_links', ['type_id'], unique=False)
+
+    if bind.execute(sa.text("SELECT COUNT(*) FROM resource_type_links")).scalar():
+        return
+
+    # 从已审批资源的逗号分隔类型字符串迁移数据，并计算各类型的数量
+    rows = bind.execute(sa.text(
+        "SELECT id, resource_type FROM resources "
+        "WHERE status = 'APPROVED' AND (is_supplement_approval IS NULL OR is_supplement_approval = 0)"
+    )).fetchall()
+    type_ids = {
+        name: type_id for type_id, name in
+        bind.execute(sa.text("SELECT id, name FROM resource_types")).fetchall()
+    }
+    counts = {}
+    for resource_id, resource_type in rows:
+        names = []
+        for name in (resource_type or "").replace("，", ",").split(","):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+        for name in names:
+            if name not in type_ids:
+                result = bind.execute(sa.text("INSERT INTO resource_types (name, approved_count) VALUES (:name, 0)"), {"name": name})
+                type_ids[name] = result.lastrowid
+            bind.execute(
+                sa.text("INSERT INTO resource_type_links (resource_id, type_id) VALUES (:resource_id, :type_id)"),
+                {"resource_id": resource_id, "type_id": type_ids[name]}
+            )
+            counts[name] = counts.get(name, 0) + 1
+    for name, count in counts.items():
+        bind.execute(
+            sa.text("UPDATE resource_types SET approved_count = :count WHERE id = :type_id"),
+            {"count": count, "type_id": type_ids[name]}
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_resource_type_links_type_id', table_name='resource_type_links')
+    op.drop_table('resource_type_links')
+    op.drop_index('ix_resource_types_name', table_name='resource_types')
+    op.drop_index('ix_resource_types_id', table_name='resource_types')
+    op.drop_table('resource_types')
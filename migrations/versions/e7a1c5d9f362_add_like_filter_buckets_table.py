@@ -0,0 +1,33 @@
+"""add like_filter_buckets table
+
+Revision ID: e7a1c5d9f362
+Revises: d5f9b3c7e248
+Create Date: 2026-10-20 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a1c5d9f362'
+down_revision = 'd5f9b3c7e248'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 喜欢去重过滤器从各进程内存移到数据库，所有工作进程共用
+    # 应用启动时 create_all 可能已经创建了该表；旧的 like_filter.bin 由应用启动时导入
+    if sa.inspect(op.get_bind()).has_table('like_filter_buckets'):
+        return
+    op.create_table(
+        'like_filter_buckets',
+        sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('fingerprints', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('like_filter_buckets')
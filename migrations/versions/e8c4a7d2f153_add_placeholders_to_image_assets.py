@@ -0,0 +1,32 @@
+"""add blurhash and dominant_color to image_assets
+
+Revision ID: e8c4a7d2f153
+Revises: d2b8f5c1a694
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c4a7d2f153'
+down_revision = 'd2b8f5c1a694'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 列表中原图加载前显示的占位图和主色
+    # 应用启动时 create_all 可能已经创建了包含这些列的表
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('image_assets')}
+    if 'blurhash' not in columns:
+        op.add_column('image_assets', sa.Column('blurhash', sa.String(length=64), nullable=True))
+    if 'dominant_color' not in columns:
+        op.add_column('image_assets', sa.Column('dominant_color', sa.String(length=7), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('image_assets') as batch_op:
+        batch_op.drop_column('dominant_color')
+        batch_op.drop_column('blurhash')
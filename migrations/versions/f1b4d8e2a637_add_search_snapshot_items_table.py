@@ -0,0 +1,36 @@
+"""add search_snapshot_items table
+
+Revision ID: f1b4d8e2a637
+Revises: e7a1c5d9f362
+Create Date: 2026-10-20 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b4d8e2a637'
+down_revision = 'e7a1c5d9f362'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 搜索快照的版本从各进程内存移到数据库，内容由应用首次访问快照时从资源表生成
+    # 应用启动时 create_all 可能已经创建了该表
+    if sa.inspect(op.get_bind()).has_table('search_snapshot_items'):
+        return
+    op.create_table(
+        'search_snapshot_items',
+        sa.Column('resource_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('item', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('resource_id')
+    )
+    op.create_index('ix_search_snapshot_items_version', 'search_snapshot_items', ['version'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_search_snapshot_items_version', table_name='search_snapshot_items')
+    op.drop_table('search_snapshot_items')
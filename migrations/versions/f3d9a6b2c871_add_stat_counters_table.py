@@ -0,0 +1,34 @@
+"""add stat counters table
+
+Revision ID: f3d9a6b2c871
+Revises: e8c4a7d2f153
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3d9a6b2c871'
+down_revision = 'e8c4a7d2f153'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 应用启动时 create_all 可能已经创建了该表；统计值在应用启动时全量计算
+    if sa.inspect(bind).has_table('stat_counters'):
+        return
+    op.create_table(
+        'stat_counters',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stat_counters')
@@ -0,0 +1,98 @@
+"""add resource_links table
+
+Revision ID: f47a0c3d9b18
+Revises: e6f1b2a8c904
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = 'f47a0c3d9b18'
+down_revision = 'e6f1b2a8c904'
+branch_labels = None
+depends_on = None
+
+LINK_CATEGORIES = [
+    "magnet", "ed2k", "uc", "mobile", "tianyi", "quark",
+    "115", "aliyun", "pikpak", "baidu", "123", "online", "others"
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 应用启动时 create_all 可能已经创建了该表，此时只需迁移数据
+    if not sa.inspect(bind).has_table('resource_links'):
+        op.create_table(
+            'resource_links',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('resource_id', sa.Integer(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('url', sa.String(), nullable=False),
+            sa.Column('password', sa.String(), nullable=True),
+            sa.Column('note', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_resource_links_id', 'resource_links', ['id'], unique=False)
+        op.create_index('ix_resource_links_category', 'resource_links', ['category'], unique=False)
+        op.create_index('ix_resource_links_url', 'resource_links', ['url'], unique=True)
+        op.create_index('ix_resource_links_resource_category', 'resource_links', ['resource_id', 'category'], unique=False)
+
+    if bind.execute(sa.text("SELECT COUNT(*) FROM resource_links")).scalar():
+        return
+
+    # 将各资源 links JSON 中的链接逐条迁移为记录，重复的URL只保留最早的一条
+    # 补充审批记录的 links 是提交内容的快照，不迁移
+    rows = bind.execute(sa.text(
+        "SELECT id, links, created_at FROM resources "
+        "WHERE links IS NOT NULL AND (is_supplement_approval IS NULL OR is_supplement_approval = 0) "
+        "ORDER BY id"
+    )).fetchall()
+    seen_urls = set()
+    for resource_id, links, created_at in rows:
+        if isinstance(links, str):
+            try:
+                links = json.loads(links)
+            except ValueError:
+                continue
+        if not isinstance(links, dict):
+            continue
+        for category, category_links in links.items():
+            if category not in LINK_CATEGORIES:
+                continue
+            for link in category_links or []:
+                if isinstance(link, str):
+                    link = {"url": link}
+                if not isinstance(link, dict):
+                    continue
+                url = (link.get("url") or "").strip()
+                if not url or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                bind.execute(
+                    sa.text(
+                        "INSERT INTO resource_links (resource_id, category, url, password, note, created_at) "
+                        "VALUES (:resource_id, :category, :url, :password, :note, :created_at)"
+                    ),
+                    {
+                        "resource_id": resource_id,
+                        "category": category,
+                        "url": url,
+                        "password": link.get("password") or "",
+                        "note": link.get("note") or "",
+                        "created_at": created_at,
+                    }
+                )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_resource_links_resource_category', table_name='resource_links')
+    op.drop_index('ix_resource_links_url', table_name='resource_links')
+    op.drop_index('ix_resource_links_category', table_name='resource_links')
+    op.drop_index('ix_resource_links_id', table_name='resource_links')
+    op.drop_table('resource_links')